@@ -9,6 +9,7 @@ https://docs.djangoproject.com/en/4.2/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
+
 import os
 from datetime import timedelta
 from pathlib import Path
@@ -137,9 +138,7 @@ MEDIA_ROOT = BASE_DIR / "media"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
-    "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
-    ),
+    "DEFAULT_AUTHENTICATION_CLASSES": ("user.authentication.TokenUserAuthentication",),
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 2,
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
@@ -162,4 +161,111 @@ SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60 * 60),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
     "ROTATE_REFRESH_TOKENS": False,
+    "TOKEN_OBTAIN_SERIALIZER": "user.serializers.TokenClaimsObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "user.serializers.TokenVersionRefreshSerializer",
+    "TOKEN_VERIFY_SERIALIZER": "user.serializers.TokenVersionVerifySerializer",
+}
+
+# Requests are authenticated from the signed token claims, the token version of
+# each user is cached in-process for up to TOKEN_VERSION_CACHE_TTL seconds.
+TOKEN_VERSION_CACHE_SIZE = 10_000
+TOKEN_VERSION_CACHE_TTL = 60
+
+# Revoked token ids are screened by a process-local Bloom filter sized for
+# TOKEN_REVOCATION_CAPACITY ids at TOKEN_REVOCATION_ERROR_RATE false positives,
+# only its hits query the table. Other processes' revocations are picked up
+# every TOKEN_REVOCATION_REFRESH_SECONDS.
+TOKEN_REVOCATION_CAPACITY = 100_000
+TOKEN_REVOCATION_ERROR_RATE = 0.001
+TOKEN_REVOCATION_REFRESH_SECONDS = 5
+
+# Registration and login hash passwords on PASSWORD_HASHING_WORKERS processes
+# from async views, so hashing holds neither the event loop nor a worker thread.
+# At most PASSWORD_HASHING_MAX_PENDING hash operations run or wait at once,
+# further sign-ins get 429 with Retry-After. With 0 workers passwords are hashed
+# in the request thread.
+PASSWORD_HASHING_WORKERS = 2
+PASSWORD_HASHING_MAX_PENDING = 32
+PASSWORD_HASHING_RETRY_AFTER = 1
+
+# Home timelines are materialized on write for authors with at most
+# TIMELINE_FANOUT_LIMIT followers, posts of bigger accounts are merged at read time.
+TIMELINE_FANOUT_LIMIT = 10_000
+TIMELINE_BACKFILL_SIZE = 200
+TIMELINE_BATCH_SIZE = 1_000
+
+# Number of latest comments embedded into every post of a feed page
+POST_COMMENT_PREVIEW_SIZE = 3
+
+# Trending hashtags are counted in TRENDING_WINDOW_BUCKETS buckets of
+# TRENDING_BUCKET_SECONDS each, older buckets weigh less by the half-life.
+# The counts are shared through the TrendingBucket table and every post keeps
+# the TrendingScore of its hashtags current, each process caches the top
+# hashtags for TRENDING_REFRESH_SECONDS. Load them for existing posts with
+# `manage.py rebuild_trending_hashtags` and expire old buckets by running
+# `manage.py rebuild_trending_hashtags --prune` every few minutes.
+TRENDING_BUCKET_SECONDS = 300
+TRENDING_WINDOW_BUCKETS = 288
+TRENDING_HALF_LIFE_SECONDS = 6 * 60 * 60
+TRENDING_MAX_RESULTS = 50
+TRENDING_REFRESH_SECONDS = 10
+
+# Uploaded post images are re-encoded off the request path into the
+# Post.image_<variant> fields, each fitting a box of the given size.
+# With 0 workers images are processed on commit in the request thread.
+POST_IMAGE_WORKERS = 2
+POST_IMAGE_VARIANTS = {"thumbnail": 150, "feed": 640, "full": 1600}
+
+# Feed pages, their reader and author version keys, rebuild locks and stats
+# share the cache. Culling a version key resets it and drops every page built
+# under it, so the default 300 entries would thrash: size it for the active
+# readers' pages plus one version key per active reader and author.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "drf-social-media-api",
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.getenv("CACHE_MAX_ENTRIES", 200_000)),
+            "CULL_FREQUENCY": 10,
+        },
+    }
 }
+
+# Feed pages are cached per reader and invalidated by version bumps,
+# concurrent misses of a page wait up to FEED_CACHE_LOCK_TIMEOUT for one rebuild.
+FEED_CACHE_ALIAS = "default"
+FEED_CACHE_TIMEOUT = 5 * 60
+FEED_CACHE_LOCK_TIMEOUT = 5
+
+# Process-local follow graph index, loaded on first use by streaming the
+# follower table in chunks of FOLLOW_GRAPH_CHUNK_SIZE rows, or from the snapshot
+# written by `manage.py snapshot_follow_graph` when it still matches the table.
+FOLLOW_GRAPH_ENABLED = os.getenv("FOLLOW_GRAPH_ENABLED", "false").lower() == "true"
+FOLLOW_GRAPH_CHUNK_SIZE = 10_000
+FOLLOW_GRAPH_SNAPSHOT_PATH = os.getenv("FOLLOW_GRAPH_SNAPSHOT_PATH")
+# Follows of other processes are caught up from the follower id watermark
+# every FOLLOW_GRAPH_REFRESH_SECONDS. Their unfollows and followee changes
+# need a reload: one happens when the row count disagrees and at the latest
+# after FOLLOW_GRAPH_MAX_AGE seconds.
+FOLLOW_GRAPH_REFRESH_SECONDS = 30
+FOLLOW_GRAPH_MAX_AGE = 60 * 60
+
+# Friend-of-friend suggestions are stored per user and recomputed when older
+# than FOLLOW_SUGGESTIONS_TTL seconds or when the user's neighborhood changed.
+FOLLOW_SUGGESTIONS_SIZE = 50
+FOLLOW_SUGGESTIONS_TTL = 24 * 60 * 60
+
+# Maximum number of user ids accepted by the bulk follow/unfollow endpoints
+FOLLOW_BULK_MAX_USERS = 500
+
+# Maximum number of user ids resolved by one relationships lookup
+FOLLOW_RELATIONSHIPS_MAX_IDS = 300
+
+# Number of latest follows listed by ?expand=following,followers on a user
+USER_FOLLOW_PREVIEW_SIZE = 5
+
+# Home feed pages of users following at least FEED_MERGE_MIN_FOLLOWING accounts
+# are merged from per-source index scans instead of one sorted query, unless
+# they follow more than FEED_MERGE_MAX_PULLED pulled authors.
+FEED_MERGE_MIN_FOLLOWING = 500
+FEED_MERGE_MAX_PULLED = 100
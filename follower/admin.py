@@ -5,3 +5,9 @@ from .models import Follower
 @admin.register(Follower)
 class FollowerAdmin(admin.ModelAdmin):
     list_display = ("user", "followee", "followed_at")
+
+    def get_readonly_fields(self, request, obj=None):
+        # Timelines are only rebuilt on follow and unfollow, not on a changed pair
+        if obj is not None:
+            return ("user", "followee")
+        return ()
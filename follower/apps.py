@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class FollowerConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "follower"
+
+    def ready(self) -> None:
+        from . import signals  # noqa: F401
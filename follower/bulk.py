@@ -0,0 +1,102 @@
+from typing import Dict, Iterable, List
+
+from django.contrib.auth import get_user_model
+from django.db import connections, router, transaction
+from django.db.models import Exists, OuterRef
+
+from .models import Follower
+from .signals import follows_created, follows_deleted
+
+FOLLOWED = "followed"
+UNFOLLOWED = "unfollowed"
+ALREADY_FOLLOWING = "already_following"
+NOT_FOLLOWING = "not_following"
+NOT_FOUND = "not_found"
+SELF = "self"
+
+
+def _following_by_id(user_id: int, followee_ids: Iterable[int]) -> Dict[int, bool]:
+    """Validate the ids and tell which of them the user follows in one query"""
+    return dict(
+        get_user_model()
+        .objects.filter(pk__in=followee_ids)
+        .annotate(
+            is_followed=Exists(
+                Follower.objects.filter(user_id=user_id, followee_id=OuterRef("pk"))
+            )
+        )
+        .values_list("id", "is_followed")
+    )
+
+
+def _outcomes(
+    user_id: int,
+    followee_ids: Iterable[int],
+    done: str,
+    skipped: str,
+    skip_if_following: bool,
+) -> Dict[int, str]:
+    followee_ids = list(dict.fromkeys(followee_ids))
+    following = _following_by_id(user_id, followee_ids)
+    outcomes = {}
+    for followee_id in followee_ids:
+        if followee_id == user_id:
+            outcomes[followee_id] = SELF
+        elif followee_id not in following:
+            outcomes[followee_id] = NOT_FOUND
+        elif following[followee_id] == skip_if_following:
+            outcomes[followee_id] = skipped
+        else:
+            outcomes[followee_id] = done
+    return outcomes
+
+
+def _delete_follows(user_id: int, followee_ids: List[int]) -> List[int]:
+    """Delete the follows, return the followee ids of the rows actually deleted"""
+    db = router.db_for_write(Follower)
+    connection = connections[db]
+    quote = connection.ops.quote_name
+    placeholders = ", ".join(["%s"] * len(followee_ids))
+    sql = (
+        f"DELETE FROM {quote(Follower._meta.db_table)} "
+        f"WHERE {quote('user_id')} = %s AND {quote('followee_id')} IN ({placeholders}) "
+        f"RETURNING {quote('followee_id')}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [user_id, *followee_ids])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def follow_many(user_id: int, followee_ids: Iterable[int]) -> Dict[int, str]:
+    """Follow the users in a single INSERT, return the outcome per id"""
+    outcomes = _outcomes(user_id, followee_ids, FOLLOWED, ALREADY_FOLLOWING, True)
+    new_ids = [pk for pk, outcome in outcomes.items() if outcome == FOLLOWED]
+    if new_ids:
+        with transaction.atomic(using=router.db_for_write(Follower)):
+            # Rows inserted concurrently since the outcomes were read are skipped
+            inserted = set(Follower.objects.insert_follows(user_id, new_ids))
+            for pk in set(new_ids) - inserted:
+                outcomes[pk] = ALREADY_FOLLOWING
+            if inserted:
+                follows_created.send(
+                    sender=Follower, user_id=user_id, followee_ids=list(inserted)
+                )
+    return outcomes
+
+
+def unfollow_many(user_id: int, followee_ids: Iterable[int]) -> Dict[int, str]:
+    """Unfollow the users in a single DELETE, return the outcome per id"""
+    outcomes = _outcomes(user_id, followee_ids, UNFOLLOWED, NOT_FOLLOWING, False)
+    removed_ids = [pk for pk, outcome in outcomes.items() if outcome == UNFOLLOWED]
+    if removed_ids:
+        with transaction.atomic(using=router.db_for_write(Follower)):
+            # Skip the per-row post_delete signals, follows_deleted applies
+            # their side effects once for the rows this DELETE removed
+            deleted = set(_delete_follows(user_id, removed_ids))
+            for pk in set(removed_ids) - deleted:
+                outcomes[pk] = NOT_FOLLOWING
+            if deleted:
+                follows_deleted.send(
+                    sender=Follower, user_id=user_id, followee_ids=list(deleted)
+                )
+    return outcomes
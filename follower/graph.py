@@ -0,0 +1,350 @@
+import os
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from typing import Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from .graphfile import read_edges
+from .models import Follower
+
+SNAPSHOT_MAGIC = b"FGRAPH1\0"
+SNAPSHOT_HEADER = struct.Struct("<qqqqqq")
+
+
+def intersect(left: array, right: array) -> List[int]:
+    """Intersect two sorted id arrays, binary searching the larger one when sizes differ a lot"""
+    if len(left) > len(right):
+        left, right = right, left
+    if not left:
+        return []
+    if len(left) * 8 < len(right):
+        result = []
+        for value in left:
+            i = bisect_left(right, value)
+            if i < len(right) and right[i] == value:
+                result.append(value)
+        return result
+    result, i, j = [], 0, 0
+    while i < len(left) and j < len(right):
+        if left[i] < right[j]:
+            i += 1
+        elif left[i] > right[j]:
+            j += 1
+        else:
+            result.append(left[i])
+            i += 1
+            j += 1
+    return result
+
+
+class Adjacency:
+    """
+    Sorted neighbor lists in CSR layout: the neighbors of node n are
+    targets[offsets[n]:offsets[n + 1]]. Incremental updates copy the row into
+    `rows`, which shadows the CSR arrays until the next compaction.
+    """
+
+    def __init__(
+        self, offsets: Optional[array] = None, targets: Optional[array] = None
+    ) -> None:
+        # Swapped as one tuple so readers never mix arrays of two compactions
+        self.csr = (
+            offsets if offsets is not None else array("q", [0]),
+            targets if targets is not None else array("q"),
+        )
+        self.rows = {}
+
+    @classmethod
+    def from_sorted_pairs(cls, pairs: Iterable[Tuple[int, int]]) -> "Adjacency":
+        """Build the arrays from (node, neighbor) pairs sorted by node and neighbor"""
+        offsets, targets = array("q"), array("q")
+        for node, neighbor in pairs:
+            while len(offsets) <= node:
+                offsets.append(len(targets))
+            targets.append(neighbor)
+        offsets.append(len(targets))
+        return cls(offsets, targets)
+
+    def transpose(self) -> "Adjacency":
+        """Build the reversed adjacency with a counting sort, rows stay sorted"""
+        self.compact()
+        source_offsets, source_targets = self.csr
+        degrees = array("q", bytes(8 * (max(source_targets, default=-1) + 1)))
+        for neighbor in source_targets:
+            degrees[neighbor] += 1
+        offsets = array("q", [0])
+        for degree in degrees:
+            offsets.append(offsets[-1] + degree)
+        positions = offsets[:-1]
+        targets = array("q", bytes(8 * len(source_targets)))
+        for node in range(len(source_offsets) - 1):
+            for k in range(source_offsets[node], source_offsets[node + 1]):
+                neighbor = source_targets[k]
+                targets[positions[neighbor]] = node
+                positions[neighbor] += 1
+        return Adjacency(offsets, targets)
+
+    def _bounds(self, node: int) -> Tuple[array, int, int]:
+        row = self.rows.get(node)
+        if row is not None:
+            return row, 0, len(row)
+        offsets, targets = self.csr
+        if node + 1 >= len(offsets):
+            return targets, 0, 0
+        return targets, offsets[node], offsets[node + 1]
+
+    def neighbors(self, node: int) -> array:
+        values, lo, hi = self._bounds(node)
+        return values[lo:hi]
+
+    def degree(self, node: int) -> int:
+        _, lo, hi = self._bounds(node)
+        return hi - lo
+
+    def contains(self, node: int, neighbor: int) -> bool:
+        values, lo, hi = self._bounds(node)
+        i = bisect_left(values, neighbor, lo, hi)
+        return i < hi and values[i] == neighbor
+
+    def add(self, node: int, neighbor: int) -> bool:
+        row = self.neighbors(node)
+        i = bisect_left(row, neighbor)
+        if i < len(row) and row[i] == neighbor:
+            return False
+        row.insert(i, neighbor)
+        self.rows[node] = row
+        self._maybe_compact()
+        return True
+
+    def remove(self, node: int, neighbor: int) -> bool:
+        row = self.neighbors(node)
+        i = bisect_left(row, neighbor)
+        if i == len(row) or row[i] != neighbor:
+            return False
+        del row[i]
+        self.rows[node] = row
+        self._maybe_compact()
+        return True
+
+    def _maybe_compact(self) -> None:
+        if len(self.rows) > max(1024, len(self.csr[0]) // 8):
+            self.compact()
+
+    def compact(self) -> None:
+        """Fold the updated rows back into the CSR arrays"""
+        if not self.rows:
+            return
+        size = max(len(self.csr[0]) - 1, max(self.rows) + 1)
+        offsets, targets = array("q", [0]), array("q")
+        for node in range(size):
+            values, lo, hi = self._bounds(node)
+            targets.extend(values[lo:hi])
+            offsets.append(len(targets))
+        self.csr = (offsets, targets)
+        self.rows = {}
+
+
+class FollowGraph:
+    """
+    Process-local index of the follower table: out-edges lead to followees,
+    in-edges to followers. Membership checks are O(log d) binary searches.
+    Changes of this process are applied by the signals, those of other
+    processes are caught up from the watermark, see get_follow_graph.
+    """
+
+    def __init__(
+        self,
+        following: Optional[Adjacency] = None,
+        followers: Optional[Adjacency] = None,
+        watermark: Tuple[int, int] = (0, 0),
+    ) -> None:
+        self.following = following or Adjacency()
+        self.followers = followers or self.following.transpose()
+        self.watermark = watermark
+        self.loaded_at = self.checked_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def current_watermark() -> Tuple[int, int]:
+        """Return the latest follower id and row count, ids are never reused"""
+        stats = Follower.objects.aggregate(last_id=Max("id"), total=Count("id"))
+        return stats["last_id"] or 0, stats["total"]
+
+    @classmethod
+    def load(cls, chunk_size: Optional[int] = None) -> "FollowGraph":
+        """Stream the follower table in chunks and build both adjacencies"""
+        watermark = cls.current_watermark()
+        pairs = (
+            Follower.objects.order_by("user_id", "followee_id")
+            .values_list("user_id", "followee_id")
+            .iterator(chunk_size=chunk_size or settings.FOLLOW_GRAPH_CHUNK_SIZE)
+        )
+        return cls(Adjacency.from_sorted_pairs(pairs), watermark=watermark)
+
+    @classmethod
+    def load_export(cls, path: str, use_mmap: bool = False) -> "FollowGraph":
+        """Build the graph from an export file written by export_follow_graph"""
+        pairs = (
+            (user_id, followee_id)
+            for user_id, followee_id, _ in read_edges(path, use_mmap=use_mmap)
+        )
+        return cls(Adjacency.from_sorted_pairs(pairs))
+
+    def save_snapshot(self, path: str) -> None:
+        with self._lock:
+            arrays = []
+            for adjacency in (self.following, self.followers):
+                adjacency.compact()
+                arrays += adjacency.csr
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as file:
+                file.write(SNAPSHOT_MAGIC)
+                file.write(
+                    SNAPSHOT_HEADER.pack(*self.watermark, *(len(a) for a in arrays))
+                )
+                for values in arrays:
+                    values.tofile(file)
+            os.replace(tmp_path, path)
+
+    @classmethod
+    def load_snapshot(cls, path: str) -> "FollowGraph":
+        with open(path, "rb") as file:
+            if file.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                raise ValueError(f"{path} is not a follow graph snapshot")
+            last_id, total, *sizes = SNAPSHOT_HEADER.unpack(
+                file.read(SNAPSHOT_HEADER.size)
+            )
+            arrays = []
+            for size in sizes:
+                values = array("q")
+                values.fromfile(file, size)
+                arrays.append(values)
+        return cls(
+            Adjacency(*arrays[:2]), Adjacency(*arrays[2:]), watermark=(last_id, total)
+        )
+
+    def add_edge(self, follower: Follower) -> None:
+        with self._lock:
+            if self.following.add(follower.user_id, follower.followee_id):
+                self.followers.add(follower.followee_id, follower.user_id)
+                last_id, total = self.watermark
+                self.watermark = (max(last_id, follower.id), total + 1)
+
+    def remove_edge(self, follower: Follower) -> None:
+        with self._lock:
+            if self.following.remove(follower.user_id, follower.followee_id):
+                self.followers.remove(follower.followee_id, follower.user_id)
+                last_id, total = self.watermark
+                self.watermark = (last_id, total - 1)
+
+    def catch_up(self, chunk_size: Optional[int] = None) -> bool:
+        """
+        Add the follows inserted since the watermark. Return False when rows
+        were also deleted by another process, only a reload drops those edges.
+        """
+        self.checked_at = time.monotonic()
+        last_id, total = self.current_watermark()
+        if (last_id, total) == self.watermark:
+            return True
+        new_follows = (
+            Follower.objects.filter(id__gt=self.watermark[0], id__lte=last_id)
+            .only("id", "user_id", "followee_id")
+            .iterator(chunk_size=chunk_size or settings.FOLLOW_GRAPH_CHUNK_SIZE)
+        )
+        for follower in new_follows:
+            self.add_edge(follower)
+        with self._lock:
+            if self.watermark[1] != total:
+                return False
+            self.watermark = (last_id, total)
+        return True
+
+    def follows(self, user_id: int, followee_id: int) -> bool:
+        return self.following.contains(user_id, followee_id)
+
+    def followee_ids(self, user_id: int) -> array:
+        return self.following.neighbors(user_id)
+
+    def follower_ids(self, user_id: int) -> array:
+        return self.followers.neighbors(user_id)
+
+    def following_count(self, user_id: int) -> int:
+        return self.following.degree(user_id)
+
+    def followers_count(self, user_id: int) -> int:
+        return self.followers.degree(user_id)
+
+    def common_followees(self, user_id: int, other_id: int) -> List[int]:
+        return intersect(self.followee_ids(user_id), self.followee_ids(other_id))
+
+
+_follow_graph: Optional[FollowGraph] = None
+_load_lock = threading.Lock()
+_refresh_lock = threading.Lock()
+
+
+def loaded_follow_graph() -> Optional[FollowGraph]:
+    """Return the graph of this process if it has been loaded"""
+    return _follow_graph
+
+
+def get_follow_graph() -> Optional[FollowGraph]:
+    """
+    Return the graph of this process, loading it on first use. Warm starts from
+    FOLLOW_GRAPH_SNAPSHOT_PATH when the snapshot still matches the table.
+    Every FOLLOW_GRAPH_REFRESH_SECONDS the graph catches up with the table,
+    it is reloaded when that fails or it is older than FOLLOW_GRAPH_MAX_AGE.
+    Returns None unless FOLLOW_GRAPH_ENABLED is set.
+    """
+    global _follow_graph
+    if not settings.FOLLOW_GRAPH_ENABLED:
+        return None
+    with _load_lock:
+        if _follow_graph is None:
+            path = settings.FOLLOW_GRAPH_SNAPSHOT_PATH
+            graph = None
+            if path and os.path.exists(path):
+                graph = FollowGraph.load_snapshot(path)
+                if graph.watermark != FollowGraph.current_watermark():
+                    graph = None
+            _follow_graph = graph or FollowGraph.load()
+            return _follow_graph
+        graph = _follow_graph
+    if time.monotonic() - graph.checked_at >= settings.FOLLOW_GRAPH_REFRESH_SECONDS:
+        _refresh_follow_graph(graph)
+    return _follow_graph
+
+
+def _refresh_follow_graph(graph: FollowGraph) -> None:
+    """Catch up or reload the graph, other threads keep reading it meanwhile"""
+    global _follow_graph
+    if not _refresh_lock.acquire(blocking=False):
+        return
+    try:
+        expired = time.monotonic() - graph.loaded_at >= settings.FOLLOW_GRAPH_MAX_AGE
+        if expired or not graph.catch_up():
+            fresh = FollowGraph.load()
+            with _load_lock:
+                if _follow_graph is graph:
+                    _follow_graph = fresh
+    finally:
+        _refresh_lock.release()
+
+
+def reset_follow_graph() -> None:
+    global _follow_graph
+    with _load_lock:
+        _follow_graph = None
+
+
+def is_following(user_id: int, followee_id: int) -> bool:
+    """Check the follow in the graph when it is enabled, in the table otherwise"""
+    graph = get_follow_graph()
+    if graph is not None:
+        return graph.follows(user_id, followee_id)
+    return Follower.objects.filter(user_id=user_id, followee_id=followee_id).exists()
@@ -0,0 +1,173 @@
+"""
+Compact binary format of the follow graph.
+
+After an 8-byte magic and a header of (edge count, user count), every user
+with follows is one block: varint user id delta, varint out-degree, then
+for each followee in ascending order a varint followee id delta and a
+zigzag varint delta of followed_at in microseconds since the epoch.
+"""
+
+import mmap
+import struct
+from datetime import datetime, timedelta, timezone
+from itertools import groupby, islice
+from operator import itemgetter
+from typing import Iterable, Iterator, Tuple, Union
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from .models import Follower
+
+MAGIC = b"FEDGES1\0"
+HEADER = struct.Struct("<qq")
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+Buffer = Union[bytes, mmap.mmap]
+
+
+def to_microseconds(value: datetime) -> int:
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def from_microseconds(value: int) -> datetime:
+    return EPOCH + timedelta(microseconds=value)
+
+
+def encode_varint(value: int, out: bytearray) -> None:
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varint(data: Buffer, pos: int) -> Tuple[int, int]:
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def write_edges(path: str, edges: Iterable[Tuple[int, int, datetime]]) -> int:
+    """Write (user id, followee id, followed_at) edges sorted by user and followee"""
+    total = users = previous_user = previous_time = 0
+    with open(path, "wb") as file:
+        file.write(MAGIC)
+        file.write(HEADER.pack(0, 0))
+        for user_id, group in groupby(edges, key=itemgetter(0)):
+            group = list(group)
+            block = bytearray()
+            encode_varint(user_id - previous_user, block)
+            encode_varint(len(group), block)
+            previous_followee = 0
+            for _, followee_id, followed_at in group:
+                encode_varint(followee_id - previous_followee, block)
+                timestamp = to_microseconds(followed_at)
+                delta = timestamp - previous_time
+                encode_varint((delta << 1) ^ (delta >> 63), block)
+                previous_followee, previous_time = followee_id, timestamp
+            file.write(block)
+            previous_user = user_id
+            total += len(group)
+            users += 1
+        file.seek(len(MAGIC))
+        file.write(HEADER.pack(total, users))
+    return total
+
+
+def read_edges(path: str, use_mmap: bool = False) -> Iterator[Tuple[int, int, int]]:
+    """Yield (user id, followee id, followed_at in microseconds) in file order"""
+    with open(path, "rb") as file:
+        data = (
+            mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            if use_mmap
+            else file.read()
+        )
+    try:
+        if data[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a follow graph export")
+        _, users = HEADER.unpack_from(data, len(MAGIC))
+        pos = len(MAGIC) + HEADER.size
+        user_id = timestamp = 0
+        for _ in range(users):
+            delta, pos = decode_varint(data, pos)
+            user_id += delta
+            degree, pos = decode_varint(data, pos)
+            followee_id = 0
+            for _ in range(degree):
+                delta, pos = decode_varint(data, pos)
+                followee_id += delta
+                delta, pos = decode_varint(data, pos)
+                timestamp += (delta >> 1) ^ -(delta & 1)
+                yield user_id, followee_id, timestamp
+    finally:
+        if use_mmap:
+            data.close()
+
+
+def edge_count(path: str) -> int:
+    with open(path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a follow graph export")
+        return HEADER.unpack(file.read(HEADER.size))[0]
+
+
+def dump_follows(path: str, chunk_size: int = 10_000) -> int:
+    """Stream the follower table into an export file"""
+    edges = (
+        Follower.objects.order_by("user_id", "followee_id")
+        .values_list("user_id", "followee_id", "followed_at")
+        .iterator(chunk_size=chunk_size)
+    )
+    return write_edges(path, edges)
+
+
+def load_follows(
+    path: str,
+    batch_size: int = 10_000,
+    use_mmap: bool = False,
+    using: str = DEFAULT_DB_ALIAS,
+) -> int:
+    """
+    Insert the follows of an export file in batches, skipping pairs that
+    already exist, and return the number of rows inserted. Foreign keys are
+    checked once after the last batch, the same way loaddata does it.
+    Signals are not sent.
+    """
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    table = Follower._meta.db_table
+    followed_at = Follower._meta.get_field("followed_at")
+    # Raw inserts, bulk_create would overwrite followed_at (auto_now_add)
+    sql = (
+        f"INSERT INTO {qn(table)} "
+        f"({qn('user_id')}, {qn('followee_id')}, {qn('followed_at')}) "
+        f"VALUES (%s, %s, %s) "
+        f"ON CONFLICT ({qn('user_id')}, {qn('followee_id')}) DO NOTHING"
+    )
+    edges = read_edges(path, use_mmap=use_mmap)
+    total = 0
+    with transaction.atomic(using=using):
+        with connection.constraint_checks_disabled():
+            with connection.cursor() as cursor:
+                while batch := list(islice(edges, batch_size)):
+                    cursor.executemany(
+                        sql,
+                        [
+                            (
+                                user_id,
+                                followee_id,
+                                followed_at.get_db_prep_value(
+                                    from_microseconds(timestamp), connection
+                                ),
+                            )
+                            for user_id, followee_id, timestamp in batch
+                        ],
+                    )
+                    # Pairs skipped by ON CONFLICT are not counted
+                    total += cursor.rowcount
+        connection.check_constraints(table_names=[table])
+    return total
@@ -0,0 +1,94 @@
+import os
+import random
+import tempfile
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from follower.graphfile import dump_follows, load_follows
+from follower.models import Follower
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare export_follow_graph/import_follow_graph with dumpdata/loaddata "
+        "on synthetic follows inside a transaction that is rolled back"
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--users", type=int, default=5_000)
+        parser.add_argument("--edges", type=int, default=100_000)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def report(self, label: str, seconds: float, edges: int, size: int) -> None:
+        self.stdout.write(
+            f"{label:<10} {seconds:6.2f}s  {edges / seconds:10.0f} follows/s  "
+            f"{size / 1024:10.0f} KiB"
+        )
+
+    def handle(self, *args, **options) -> None:
+        rng = random.Random(options["seed"])
+        User = get_user_model()
+        per_user = max(options["edges"] // options["users"], 1)
+
+        with tempfile.TemporaryDirectory() as directory, transaction.atomic():
+            users = User.objects.bulk_create(
+                User(email=f"follow-bench-{i}@example.com")
+                for i in range(options["users"])
+            )
+            user_ids = [user.id for user in users]
+            follows = []
+            for user_id in user_ids:
+                followees = set(rng.sample(user_ids, per_user))
+                followees.discard(user_id)
+                follows += (
+                    Follower(user_id=user_id, followee_id=followee_id)
+                    for followee_id in followees
+                )
+            Follower.objects.bulk_create(follows, batch_size=10_000)
+            edges = len(follows)
+            self.stdout.write(f"Generated {edges} follows")
+            json_path = os.path.join(directory, "follows.json")
+            binary_path = os.path.join(directory, "follows.fgraph")
+
+            started = time.perf_counter()
+            call_command("dumpdata", "follower.Follower", output=json_path)
+            self.report(
+                "dumpdata",
+                time.perf_counter() - started,
+                edges,
+                os.path.getsize(json_path),
+            )
+            started = time.perf_counter()
+            dump_follows(binary_path)
+            self.report(
+                "export",
+                time.perf_counter() - started,
+                edges,
+                os.path.getsize(binary_path),
+            )
+
+            follows = Follower.objects.filter(user_id__in=user_ids)
+            follows._raw_delete(follows.db)
+            started = time.perf_counter()
+            call_command("loaddata", json_path, verbosity=0)
+            self.report(
+                "loaddata",
+                time.perf_counter() - started,
+                edges,
+                os.path.getsize(json_path),
+            )
+
+            follows._raw_delete(follows.db)
+            started = time.perf_counter()
+            load_follows(binary_path)
+            self.report(
+                "import",
+                time.perf_counter() - started,
+                edges,
+                os.path.getsize(binary_path),
+            )
+            transaction.set_rollback(True)
@@ -0,0 +1,89 @@
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from itertools import accumulate
+
+from django.core.management.base import BaseCommand
+
+from follower.graph import Adjacency, FollowGraph
+from follower.suggestions import rank_candidates
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare friend-of-friend ranking over the in-memory follow graph with "
+        "the per-user aggregate query on a synthetic graph in a throwaway SQLite database"
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--users", type=int, default=100_000)
+        parser.add_argument("--edges", type=int, default=1_000_000)
+        parser.add_argument("--samples", type=int, default=200)
+        parser.add_argument("--limit", type=int, default=50)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options) -> None:
+        rng = random.Random(options["seed"])
+        users = options["users"]
+        # Zipf-like popularity, a few accounts gather most of the followers
+        weights = list(accumulate(1 / rank for rank in range(1, users + 1)))
+        per_user = max(options["edges"] // users, 1)
+
+        started = time.perf_counter()
+        pairs = []
+        for user_id in range(1, users + 1):
+            followees = set(
+                rng.choices(range(1, users + 1), cum_weights=weights, k=per_user)
+            )
+            followees.discard(user_id)
+            pairs.extend((user_id, followee_id) for followee_id in sorted(followees))
+        graph = FollowGraph(Adjacency.from_sorted_pairs(pairs))
+        self.stdout.write(
+            f"Generated and indexed {len(pairs)} follows "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+
+        samples = rng.sample(range(1, users + 1), options["samples"])
+        started = time.perf_counter()
+        for user_id in samples:
+            rank_candidates(graph, user_id, options["limit"])
+        graph_time = (time.perf_counter() - started) / len(samples)
+
+        with tempfile.TemporaryDirectory() as directory:
+            db = sqlite3.connect(os.path.join(directory, "bench.sqlite3"))
+            db.executescript("""
+                CREATE TABLE follower_follower (
+                    id INTEGER PRIMARY KEY,
+                    user_id INTEGER NOT NULL,
+                    followee_id INTEGER NOT NULL,
+                    UNIQUE (user_id, followee_id)
+                );
+                """)
+            db.executemany(
+                "INSERT INTO follower_follower(user_id, followee_id) VALUES (?, ?)",
+                pairs,
+            )
+            db.commit()
+            started = time.perf_counter()
+            for user_id in samples:
+                db.execute(
+                    "SELECT f.followee_id, COUNT(*) AS mutual "
+                    "FROM follower_follower f "
+                    "WHERE f.user_id IN "
+                    "(SELECT followee_id FROM follower_follower WHERE user_id = ?) "
+                    "AND f.followee_id != ? AND f.followee_id NOT IN "
+                    "(SELECT followee_id FROM follower_follower WHERE user_id = ?) "
+                    "GROUP BY f.followee_id ORDER BY mutual DESC, f.followee_id "
+                    "LIMIT ?",
+                    (user_id, user_id, user_id, options["limit"]),
+                ).fetchall()
+            query_time = (time.perf_counter() - started) / len(samples)
+            db.close()
+
+        self.stdout.write(f"Aggregate query:  {query_time * 1000:.2f} ms/user")
+        self.stdout.write(f"In-memory graph:  {graph_time * 1000:.2f} ms/user")
+        self.stdout.write(
+            self.style.SUCCESS(f"Speedup: {query_time / graph_time:.1f}x")
+        )
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from follower.graphfile import dump_follows
+
+
+class Command(BaseCommand):
+    help = "Write the follower table to a compact delta-encoded binary file"
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("path")
+        parser.add_argument("--chunk-size", type=int, default=10_000)
+
+    def handle(self, *args, **options) -> None:
+        total = dump_follows(options["path"], chunk_size=options["chunk_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Exported {total} follow(s) to {options['path']}.")
+        )
@@ -0,0 +1,34 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from follower.graphfile import load_follows
+from follower.models import FollowSuggestion
+
+
+class Command(BaseCommand):
+    help = (
+        "Load follows from a file written by export_follow_graph, then "
+        "recompute the stored follow counts. Home timelines are left as they "
+        "are, run rebuild_timelines afterwards if the database has posts"
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("path")
+        parser.add_argument("--batch-size", type=int, default=10_000)
+        parser.add_argument("--mmap", action="store_true")
+
+    def handle(self, *args, **options) -> None:
+        try:
+            total = load_follows(
+                options["path"],
+                batch_size=options["batch_size"],
+                use_mmap=options["mmap"],
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        # The import sends no signals, so the counters are rebuilt from the table
+        call_command("reconcile_follow_counts", stdout=self.stdout)
+        FollowSuggestion.objects.update(stale=True)
+        self.stdout.write(
+            self.style.SUCCESS(f"Imported {total} follow(s) from {options['path']}.")
+        )
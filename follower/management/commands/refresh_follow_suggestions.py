@@ -0,0 +1,38 @@
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from follower.graph import FollowGraph, get_follow_graph
+from follower.models import FollowSuggestion
+from follower.suggestions import outdated_suggestions, refresh_suggestions
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute stored follow suggestions over the in-memory follow graph, "
+        "only stale or expired ones unless --all is given"
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--all", action="store_true")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options) -> None:
+        if options["all"]:
+            user_ids = get_user_model().objects.values_list("id", flat=True)
+        else:
+            user_ids = FollowSuggestion.objects.filter(
+                outdated_suggestions()
+            ).values_list("user_id", flat=True)
+        user_ids = user_ids.order_by("pk").iterator()
+
+        graph = get_follow_graph() or FollowGraph.load()
+        refreshed = 0
+        while batch := list(islice(user_ids, options["batch_size"])):
+            refresh_suggestions(batch, graph=graph)
+            refreshed += len(batch)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Refreshed suggestions of {refreshed} user(s).")
+        )
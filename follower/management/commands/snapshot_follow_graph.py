@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from follower.graph import FollowGraph
+
+
+class Command(BaseCommand):
+    help = "Load the follow graph from the follower table and write a snapshot for warm starts"
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--path", default=settings.FOLLOW_GRAPH_SNAPSHOT_PATH)
+        parser.add_argument("--chunk-size", type=int)
+
+    def handle(self, *args, **options) -> None:
+        if not options["path"]:
+            raise CommandError("Set FOLLOW_GRAPH_SNAPSHOT_PATH or pass --path.")
+        graph = FollowGraph.load(chunk_size=options["chunk_size"])
+        graph.save_snapshot(options["path"])
+        _, total = graph.watermark
+        self.stdout.write(
+            self.style.SUCCESS(f"Wrote {total} follow(s) to {options['path']}.")
+        )
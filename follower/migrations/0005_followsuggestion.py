@@ -0,0 +1,33 @@
+# Generated by Django 4.2 on 2026-10-18 09:23
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("user", "0010_user_follow_counts"),
+        ("follower", "0004_alter_follower_followee_alter_follower_user"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FollowSuggestion",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="follow_suggestion",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("candidates", models.JSONField(default=list)),
+                ("computed_at", models.DateTimeField()),
+                ("stale", models.BooleanField(default=False)),
+            ],
+        ),
+    ]
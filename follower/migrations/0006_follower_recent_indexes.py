@@ -0,0 +1,48 @@
+# Generated by Django 4.2 on 2026-10-18 09:33
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("follower", "0005_followsuggestion"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="follower",
+            index=models.Index(
+                fields=["user", "-followed_at", "-id"], name="follow_user_recent_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="follower",
+            index=models.Index(
+                fields=["followee", "-followed_at", "-id"],
+                name="follow_followee_recent_idx",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="follower",
+            name="followee",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="followers_set",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="follower",
+            name="user",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="following_set",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+    ]
@@ -1,8 +1,59 @@
-from typing import Any
+from typing import Any, List
 
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.contrib.auth import get_user_model
+from django.db import connections, models, router, transaction
+from django.utils import timezone
+
+
+class FollowerManager(models.Manager):
+    def insert_follows(self, user_id: int, followee_ids: List[int]) -> List[int]:
+        """
+        Insert the follows with INSERT ... SELECT ... ON CONFLICT DO NOTHING,
+        return the followee ids of the rows the database actually inserted.
+        Ids of missing users are skipped. No signals are sent, callers send
+        follows_created for the returned ids.
+        """
+        db = router.db_for_write(self.model)
+        connection = connections[db]
+        quote = connection.ops.quote_name
+        placeholders = ", ".join(["%s"] * len(followee_ids))
+        sql = (
+            f"INSERT INTO {quote(self.model._meta.db_table)} "
+            f"({quote('user_id')}, {quote('followee_id')}, {quote('followed_at')}) "
+            f"SELECT %s, {quote('id')}, %s FROM {quote(get_user_model()._meta.db_table)} "
+            f"WHERE {quote('id')} IN ({placeholders}) "
+            f"ON CONFLICT ({quote('user_id')}, {quote('followee_id')}) DO NOTHING "
+            f"RETURNING {quote('followee_id')}"
+        )
+        followed_at = connection.ops.adapt_datetimefield_value(timezone.now())
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [user_id, followed_at, *followee_ids])
+            return [row[0] for row in cursor.fetchall()]
+
+    def follow(self, user_id: int, followee_id: int) -> bool:
+        """
+        Follow the user with a single INSERT, return False if already following.
+        Raises User.DoesNotExist if the followee does not exist. Concurrent
+        calls for the same pair are safe.
+        """
+        from .signals import follows_created
+
+        if user_id == followee_id:
+            raise ValidationError("Cannot follow oneself.")
+        with transaction.atomic(using=router.db_for_write(self.model)):
+            if not self.insert_follows(user_id, [followee_id]):
+                if not get_user_model().objects.filter(pk=followee_id).exists():
+                    raise get_user_model().DoesNotExist(
+                        "The user with the specified ID does not exist."
+                    )
+                return False
+            # Counters, graph, timelines and caches follow in this transaction
+            follows_created.send(
+                sender=self.model, user_id=user_id, followee_ids=[followee_id]
+            )
+        return True
 
 
 class Follower(models.Model):
@@ -10,27 +61,70 @@ class Follower(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
         related_name="following_set",
+        db_index=False,
     )
     followee = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
         related_name="followers_set",
+        db_index=False,
     )
     followed_at = models.DateTimeField(auto_now_add=True)
 
+    objects = FollowerManager()
+
     class Meta:
         unique_together = ["user", "followee"]
+        # Also serve the lookups by user or followee alone
+        indexes = [
+            models.Index(
+                fields=["user", "-followed_at", "-id"], name="follow_user_recent_idx"
+            ),
+            models.Index(
+                fields=["followee", "-followed_at", "-id"],
+                name="follow_followee_recent_idx",
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"{self.user} follows {self.followee}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets the signals tell a saved follow that moved to another pair
+        instance._loaded_pair = (
+            instance.__dict__.get("user_id"),
+            instance.__dict__.get("followee_id"),
+        )
+        return instance
+
     def clean(self) -> Any:
-        if self.user == self.followee:
+        if self.user_id == self.followee_id:
             raise ValidationError("Cannot follow oneself.")
 
     def save(self, *args, **kwargs) -> None:
         self.clean()
-        super().save(*args, **kwargs)
+        # The counters are updated by the post_save signal in the same transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
     def unfollow(self) -> None:
         self.delete()
+
+
+class FollowSuggestion(models.Model):
+    """Ranked friend-of-friend candidates of a user as [user id, mutual follows] pairs."""
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="follow_suggestion",
+    )
+    candidates = models.JSONField(default=list)
+    computed_at = models.DateTimeField()
+    stale = models.BooleanField(default=False)
+
+    def __str__(self) -> str:
+        return f"Suggestions for {self.user_id}"
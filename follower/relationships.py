@@ -0,0 +1,35 @@
+from typing import Dict, Iterable
+
+from .graph import get_follow_graph
+from .models import Follower
+
+# Bits of a relationship bitmap, as seen from the requesting user
+FOLLOWING = 1
+FOLLOWED_BY = 2
+
+
+def get_relationships(user_id: int, other_ids: Iterable[int]) -> Dict[int, int]:
+    """Return the relationship bitmap with each of the users in two indexed queries"""
+    other_ids = list(other_ids)
+    graph = get_follow_graph()
+    if graph is not None:
+        return {
+            other_id: (FOLLOWING if graph.follows(user_id, other_id) else 0)
+            | (FOLLOWED_BY if graph.follows(other_id, user_id) else 0)
+            for other_id in other_ids
+        }
+    following = set(
+        Follower.objects.filter(user_id=user_id, followee_id__in=other_ids).values_list(
+            "followee_id", flat=True
+        )
+    )
+    followed_by = set(
+        Follower.objects.filter(followee_id=user_id, user_id__in=other_ids).values_list(
+            "user_id", flat=True
+        )
+    )
+    return {
+        other_id: (FOLLOWING if other_id in following else 0)
+        | (FOLLOWED_BY if other_id in followed_by else 0)
+        for other_id in other_ids
+    }
@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
 from rest_framework import serializers
 from .models import Follower
 
@@ -6,3 +8,46 @@ class FollowerSerializer(serializers.ModelSerializer):
     class Meta:
         model = Follower
         fields = ("user", "followee", "followed_at")
+
+
+class FollowStatusSerializer(serializers.Serializer):
+    detail = serializers.CharField()
+    user = serializers.IntegerField()
+    followee = serializers.IntegerField()
+    is_following = serializers.BooleanField()
+    following_count = serializers.IntegerField()
+    followers_count = serializers.IntegerField()
+
+
+class SuggestedUserSerializer(serializers.ModelSerializer):
+    mutual_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = get_user_model()
+        fields = ("id", "email", "first_name", "last_name", "mutual_count")
+
+
+class BulkFollowSerializer(serializers.Serializer):
+    user_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.FOLLOW_BULK_MAX_USERS,
+    )
+
+
+class BulkFollowOutcomeSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    status = serializers.CharField()
+
+
+class BulkFollowResultSerializer(serializers.Serializer):
+    results = BulkFollowOutcomeSerializer(many=True)
+    following_count = serializers.IntegerField()
+    followers_count = serializers.IntegerField()
+
+
+class RelationshipSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    relationship = serializers.IntegerField(
+        help_text="Bitmap of 1 (you follow the user) and 2 (the user follows you)"
+    )
@@ -0,0 +1,153 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import Signal, receiver
+
+from .graph import loaded_follow_graph
+from .models import Follower
+from .suggestions import mark_neighborhood_stale
+
+# Sent by Follower.objects.follow and the bulk follow operations, which write
+# without per-row signals, with the user_id and the followee_ids that were
+# followed or unfollowed
+follows_created = Signal()
+follows_deleted = Signal()
+# Sent once followers_count of the followee_ids has been decremented
+followers_count_decreased = Signal()
+
+
+def change_follow_counts(user_id: int, followee_id: int, delta: int) -> None:
+    User = get_user_model()
+    users = User.objects.filter(pk=user_id)
+    followees = User.objects.filter(pk=followee_id)
+    if delta < 0:
+        users = users.filter(following_count__gt=0)
+        followees = followees.filter(followers_count__gt=0)
+    users.update(following_count=F("following_count") + delta)
+    followees.update(followers_count=F("followers_count") + delta)
+    if delta < 0:
+        followers_count_decreased.send(sender=Follower, followee_ids=[followee_id])
+
+
+@receiver(pre_save, sender=Follower)
+def track_moved_follow(sender, instance, raw=False, **kwargs) -> None:
+    """Remember the pair a saved follow had when it was loaded, if it changed"""
+    loaded_pair = getattr(instance, "_loaded_pair", None)
+    pair = (instance.user_id, instance.followee_id)
+    instance._moved_from = None
+    if not raw and not instance._state.adding and loaded_pair not in (None, pair):
+        instance._moved_from = loaded_pair
+    instance._loaded_pair = pair
+
+
+@receiver(post_save, sender=Follower)
+def increment_follow_counts(sender, instance, created, raw=False, **kwargs) -> None:
+    moved_from = getattr(instance, "_moved_from", None)
+    if raw or not (created or moved_from):
+        return
+    if moved_from:
+        change_follow_counts(*moved_from, -1)
+    change_follow_counts(instance.user_id, instance.followee_id, 1)
+
+
+@receiver(post_delete, sender=Follower)
+def decrement_follow_counts(sender, instance, **kwargs) -> None:
+    change_follow_counts(instance.user_id, instance.followee_id, -1)
+
+
+@receiver(post_save, sender=Follower)
+def add_follow_graph_edge(sender, instance, created, raw=False, **kwargs) -> None:
+    moved_from = getattr(instance, "_moved_from", None)
+    graph = loaded_follow_graph()
+    if graph is None or raw:
+        return
+    if created:
+        transaction.on_commit(lambda: graph.add_edge(instance))
+    elif moved_from:
+        user_id, followee_id = moved_from
+        previous = Follower(id=instance.id, user_id=user_id, followee_id=followee_id)
+
+        def move_edge() -> None:
+            graph.remove_edge(previous)
+            graph.add_edge(instance)
+
+        transaction.on_commit(move_edge)
+
+
+@receiver(post_delete, sender=Follower)
+def remove_follow_graph_edge(sender, instance, **kwargs) -> None:
+    graph = loaded_follow_graph()
+    if graph is not None:
+        transaction.on_commit(lambda: graph.remove_edge(instance))
+
+
+@receiver(post_save, sender=Follower)
+@receiver(post_delete, sender=Follower)
+def invalidate_follow_suggestions(sender, instance, raw=False, **kwargs) -> None:
+    if raw:
+        return
+    # Deletes send no created flag and always change the neighborhood
+    created = kwargs.get("created", True)
+    moved_from = None if created else getattr(instance, "_moved_from", None)
+    if created or moved_from:
+        mark_neighborhood_stale(instance.user_id)
+    if moved_from and moved_from[0] != instance.user_id:
+        mark_neighborhood_stale(moved_from[0])
+
+
+@receiver(follows_created, sender=Follower)
+def increment_bulk_follow_counts(sender, user_id, followee_ids, **kwargs) -> None:
+    User = get_user_model()
+    User.objects.filter(pk=user_id).update(
+        following_count=F("following_count") + len(followee_ids)
+    )
+    User.objects.filter(pk__in=followee_ids).update(
+        followers_count=F("followers_count") + 1
+    )
+
+
+@receiver(follows_deleted, sender=Follower)
+def decrement_bulk_follow_counts(sender, user_id, followee_ids, **kwargs) -> None:
+    User = get_user_model()
+    User.objects.filter(pk=user_id).update(
+        following_count=F("following_count") - len(followee_ids)
+    )
+    User.objects.filter(pk__in=followee_ids, followers_count__gt=0).update(
+        followers_count=F("followers_count") - 1
+    )
+    followers_count_decreased.send(sender=Follower, followee_ids=followee_ids)
+
+
+@receiver(follows_created, sender=Follower)
+def add_bulk_follow_graph_edges(sender, user_id, followee_ids, **kwargs) -> None:
+    graph = loaded_follow_graph()
+    if graph is None:
+        return
+
+    def add_edges() -> None:
+        for follower in Follower.objects.filter(
+            user_id=user_id, followee_id__in=followee_ids
+        ):
+            graph.add_edge(follower)
+
+    transaction.on_commit(add_edges)
+
+
+@receiver(follows_deleted, sender=Follower)
+def remove_bulk_follow_graph_edges(sender, user_id, followee_ids, **kwargs) -> None:
+    graph = loaded_follow_graph()
+    if graph is None:
+        return
+
+    def remove_edges() -> None:
+        for followee_id in followee_ids:
+            graph.remove_edge(Follower(user_id=user_id, followee_id=followee_id))
+
+    transaction.on_commit(remove_edges)
+
+
+@receiver(follows_created, sender=Follower)
+@receiver(follows_deleted, sender=Follower)
+def invalidate_bulk_follow_suggestions(sender, user_id, **kwargs) -> None:
+    mark_neighborhood_stale(user_id)
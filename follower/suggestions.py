@@ -0,0 +1,106 @@
+import heapq
+from collections import Counter
+from datetime import timedelta
+from typing import Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .graph import FollowGraph, get_follow_graph
+from .models import Follower, FollowSuggestion
+
+
+def rank_candidates(
+    graph: FollowGraph, user_id: int, limit: int
+) -> List[Tuple[int, int]]:
+    """
+    Return (candidate id, mutual follows) pairs for friends of friends of the
+    user: the row of the user in A @ A over the adjacency matrix A, counted
+    from the sorted neighbor arrays.
+    """
+    followee_ids = graph.followee_ids(user_id)
+    counts = Counter()
+    for followee_id in followee_ids:
+        counts.update(graph.followee_ids(followee_id))
+    excluded = set(followee_ids)
+    excluded.add(user_id)
+    return heapq.nlargest(
+        limit,
+        (
+            (candidate, mutual)
+            for candidate, mutual in counts.items()
+            if candidate not in excluded
+        ),
+        key=lambda item: (item[1], -item[0]),
+    )
+
+
+def query_candidates(user_id: int, limit: int) -> List[Tuple[int, int]]:
+    """Rank the candidates of one user with a single aggregate query"""
+    followee_ids = Follower.objects.filter(user_id=user_id).values("followee_id")
+    return list(
+        Follower.objects.filter(user_id__in=followee_ids)
+        .exclude(followee_id__in=followee_ids)
+        .exclude(followee_id=user_id)
+        .values("followee_id")
+        .annotate(mutual=Count("id"))
+        .order_by("-mutual", "followee_id")
+        .values_list("followee_id", "mutual")[:limit]
+    )
+
+
+def refresh_suggestions(
+    user_ids: Iterable[int], graph: Optional[FollowGraph] = None
+) -> None:
+    """Recompute and store the suggestions of the given users"""
+    limit = settings.FOLLOW_SUGGESTIONS_SIZE
+    now = timezone.now()
+    suggestions = [
+        FollowSuggestion(
+            user_id=user_id,
+            candidates=(
+                rank_candidates(graph, user_id, limit)
+                if graph is not None
+                else query_candidates(user_id, limit)
+            ),
+            computed_at=now,
+            stale=False,
+        )
+        for user_id in user_ids
+    ]
+    FollowSuggestion.objects.bulk_create(
+        suggestions,
+        update_conflicts=True,
+        unique_fields=["user"],
+        update_fields=["candidates", "computed_at", "stale"],
+    )
+
+
+def outdated_suggestions() -> Q:
+    expired_at = timezone.now() - timedelta(seconds=settings.FOLLOW_SUGGESTIONS_TTL)
+    return Q(stale=True) | Q(computed_at__lt=expired_at)
+
+
+def get_suggestions(user_id: int) -> List[Tuple[int, int]]:
+    """Return the stored suggestions of the user, recomputing them when outdated"""
+    suggestion = (
+        FollowSuggestion.objects.filter(user_id=user_id)
+        .exclude(outdated_suggestions())
+        .first()
+    )
+    if suggestion is None:
+        refresh_suggestions([user_id], graph=get_follow_graph())
+        suggestion = FollowSuggestion.objects.get(user_id=user_id)
+    return [tuple(candidate) for candidate in suggestion.candidates]
+
+
+def mark_neighborhood_stale(user_id: int) -> None:
+    """
+    A follow or unfollow by the user changes the friends of friends of the
+    user and of everyone following the user
+    """
+    followers = Follower.objects.filter(followee_id=user_id).values("user_id")
+    FollowSuggestion.objects.filter(
+        Q(user_id=user_id) | Q(user_id__in=followers)
+    ).update(stale=True)
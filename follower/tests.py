@@ -1,11 +1,29 @@
+import os
+import tempfile
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from unittest import mock
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.db.models.signals import post_save
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from .models import Follower
+from posts.models import Post, TimelineEntry
+
+from .graph import FollowGraph, get_follow_graph, intersect, reset_follow_graph
+from .graphfile import load_follows
+from .models import Follower, FollowSuggestion
+from .signals import follows_created
+from .suggestions import get_suggestions, rank_candidates
 
 
 class FollowerModelTestCase(TestCase):
@@ -44,6 +62,48 @@ class FollowerModelTestCase(TestCase):
         with self.assertRaises(Exception):
             Follower.objects.create(user=self.user1, followee=self.user1)
 
+    def test_follow_counts_are_stored(self):
+        follow = Follower.objects.create(user=self.user1, followee=self.user2)
+        self.user1.refresh_from_db()
+        self.user2.refresh_from_db()
+        self.assertEqual(
+            (self.user1.following_count, self.user1.followers_count), (1, 0)
+        )
+        self.assertEqual(
+            (self.user2.following_count, self.user2.followers_count), (0, 1)
+        )
+
+        follow.unfollow()
+        self.user1.refresh_from_db()
+        self.user2.refresh_from_db()
+        self.assertEqual(self.user1.following_count, 0)
+        self.assertEqual(self.user2.followers_count, 0)
+
+    def test_changed_pair_moves_follow_counts(self):
+        user3 = get_user_model().objects.create_user(
+            email="user3@user.com", password="testpassword3"
+        )
+        follow = Follower.objects.create(user=self.user1, followee=self.user2)
+        follow = Follower.objects.get(pk=follow.pk)
+        follow.followee = user3
+        follow.save()
+        follow.user = self.user2
+        follow.save()
+        counts = {
+            email: (following, followers)
+            for email, following, followers in get_user_model().objects.values_list(
+                "email", "following_count", "followers_count"
+            )
+        }
+        self.assertEqual(
+            counts,
+            {
+                "user1@user.com": (0, 0),
+                "user2@user.com": (1, 0),
+                "user3@user.com": (0, 1),
+            },
+        )
+
     def test_followed_at(self):
         follow = Follower.objects.create(user=self.user1, followee=self.user2)
         self.assertLess(follow.followed_at, timezone.now())
@@ -65,10 +125,54 @@ class FollowViewTestCase(TestCase):
         response = self.client.post(url)
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertIn("Successfully followed.", response.data["detail"])
+        self.assertTrue(response.data["is_following"])
+        self.assertEqual(response.data["following_count"], 1)
+        self.assertEqual(response.data["followers_count"], 0)
         self.assertTrue(
             Follower.objects.filter(user=self.user, followee=self.followee).exists()
         )
 
+    def test_follow_sends_follows_created_instead_of_post_save(self):
+        saved, created = mock.Mock(), mock.Mock()
+        post_save.connect(saved, sender=Follower)
+        follows_created.connect(created, sender=Follower)
+        try:
+            self.assertTrue(Follower.objects.follow(self.user.id, self.followee.id))
+            self.assertFalse(Follower.objects.follow(self.user.id, self.followee.id))
+        finally:
+            post_save.disconnect(saved, sender=Follower)
+            follows_created.disconnect(created, sender=Follower)
+        saved.assert_not_called()
+        created.assert_called_once()
+        self.assertEqual(created.call_args.kwargs["followee_ids"], [self.followee.id])
+
+    def test_follow_twice_is_idempotent(self):
+        url = reverse("follower:follow", kwargs={"pk": self.followee.pk})
+        self.client.post(url)
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["detail"], "Already following.")
+        self.assertTrue(response.data["is_following"])
+        self.assertEqual(response.data["following_count"], 1)
+
+    def test_follow_cost_does_not_depend_on_graph_size(self):
+        def count_queries(followee):
+            url = reverse("follower:follow", kwargs={"pk": followee.pk})
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post(url)
+            return len(queries)
+
+        baseline = count_queries(self.followee)
+        for i in range(5):
+            fan = get_user_model().objects.create_user(
+                email=f"fan{i}@user.com", password="testpassword"
+            )
+            Follower.objects.create(user=fan, followee=self.user)
+        other = get_user_model().objects.create_user(
+            email="other@user.com", password="testpassword"
+        )
+        self.assertEqual(count_queries(other), baseline)
+
     def test_follow_self(self):
         url = reverse("follower:follow", kwargs={"pk": self.user.pk})
         response = self.client.post(url)
@@ -107,6 +211,8 @@ class UnfollowViewTestCase(TestCase):
         response = self.client.delete(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn("Successfully unfollowed.", response.data["detail"])
+        self.assertFalse(response.data["is_following"])
+        self.assertEqual(response.data["following_count"], 0)
         self.assertFalse(
             Follower.objects.filter(user=self.user, followee=self.followee).exists()
         )
@@ -128,3 +234,393 @@ class UnfollowViewTestCase(TestCase):
         self.assertFalse(
             Follower.objects.filter(user=self.user, followee_id=9999).exists()
         )
+
+
+class FollowGraphTestCase(TestCase):
+    def setUp(self):
+        self.users = [
+            get_user_model().objects.create_user(
+                email=f"node{i}@user.com", password="testpassword"
+            )
+            for i in range(5)
+        ]
+        self.ids = [user.id for user in self.users]
+        a, b, c, d, e = self.users
+        for user, followee in [(a, b), (a, c), (a, d), (b, c), (b, d), (e, a)]:
+            Follower.objects.create(user=user, followee=followee)
+
+    def tearDown(self):
+        reset_follow_graph()
+
+    def test_load_streams_both_directions(self):
+        a, b, c, d, e = self.ids
+        graph = FollowGraph.load(chunk_size=2)
+        self.assertEqual(list(graph.followee_ids(a)), [b, c, d])
+        self.assertEqual(list(graph.follower_ids(d)), [a, b])
+        self.assertTrue(graph.follows(e, a))
+        self.assertFalse(graph.follows(a, e))
+        self.assertEqual(graph.followers_count(c), 2)
+        self.assertEqual(graph.common_followees(a, b), [c, d])
+        self.assertEqual(graph.watermark, FollowGraph.current_watermark())
+
+    def test_intersect_skewed_sizes(self):
+        large = array("q", range(0, 1000, 3))
+        self.assertEqual(intersect(array("q", [3, 4, 999]), large), [3, 999])
+
+    @override_settings(FOLLOW_GRAPH_ENABLED=True)
+    def test_signals_update_loaded_graph(self):
+        a, b, c, d, e = self.users
+        graph = get_follow_graph()
+        with self.captureOnCommitCallbacks(execute=True):
+            Follower.objects.create(user=c, followee=e)
+        self.assertTrue(graph.follows(c.id, e.id))
+        self.assertEqual(list(graph.follower_ids(e.id)), [c.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Follower.objects.get(user=a, followee=c).unfollow()
+        self.assertFalse(graph.follows(a.id, c.id))
+        self.assertEqual(list(graph.follower_ids(c.id)), [b.id])
+        self.assertEqual(graph.watermark, FollowGraph.current_watermark())
+
+    @override_settings(FOLLOW_GRAPH_ENABLED=True, FOLLOW_GRAPH_REFRESH_SECONDS=0)
+    def test_graph_catches_up_with_other_processes(self):
+        a, b, c, d, e = self.users
+        graph = get_follow_graph()
+        # Written by another process: no signals reach this graph
+        Follower.objects.bulk_create([Follower(user=c, followee=e)])
+        self.assertIs(get_follow_graph(), graph)
+        self.assertTrue(graph.follows(c.id, e.id))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "DELETE FROM follower_follower WHERE user_id = %s AND followee_id = %s",
+                [a.id, b.id],
+            )
+        reloaded = get_follow_graph()
+        self.assertIsNot(reloaded, graph)
+        self.assertFalse(reloaded.follows(a.id, b.id))
+        self.assertEqual(reloaded.watermark, FollowGraph.current_watermark())
+
+    @override_settings(FOLLOW_GRAPH_ENABLED=True)
+    def test_changed_followee_moves_the_edge(self):
+        a, b, c, d, e = self.users
+        graph = get_follow_graph()
+        follow = Follower.objects.get(user=b, followee=c)
+        follow.followee = e
+        with self.captureOnCommitCallbacks(execute=True):
+            follow.save()
+        self.assertFalse(graph.follows(b.id, c.id))
+        self.assertTrue(graph.follows(b.id, e.id))
+        self.assertEqual(list(graph.follower_ids(e.id)), [b.id])
+        self.assertEqual(graph.watermark, FollowGraph.current_watermark())
+
+    def test_compaction_keeps_rows(self):
+        a, b, c, d, e = self.ids
+        graph = FollowGraph.load()
+        for follower in Follower.objects.filter(user_id=a):
+            graph.remove_edge(follower)
+        graph.following.compact()
+        graph.followers.compact()
+        self.assertEqual(list(graph.followee_ids(a)), [])
+        self.assertEqual(list(graph.followee_ids(b)), [c, d])
+        self.assertEqual(list(graph.follower_ids(d)), [b])
+
+    def test_snapshot_warm_start(self):
+        a, b, c, d, e = self.ids
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "graph.bin")
+            FollowGraph.load().save_snapshot(path)
+            graph = FollowGraph.load_snapshot(path)
+            self.assertEqual(list(graph.followee_ids(a)), [b, c, d])
+            self.assertEqual(list(graph.follower_ids(a)), [e])
+
+            with override_settings(
+                FOLLOW_GRAPH_ENABLED=True, FOLLOW_GRAPH_SNAPSHOT_PATH=path
+            ):
+                with self.assertNumQueries(1):
+                    self.assertTrue(get_follow_graph().follows(b, c))
+                reset_follow_graph()
+                Follower.objects.create(user_id=c, followee_id=a)
+                self.assertTrue(get_follow_graph().follows(c, a))
+
+    def test_export_is_loadable_as_graph(self):
+        a, b, c, d, e = self.ids
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "follows.fgraph")
+            call_command(
+                "export_follow_graph", path, "--chunk-size", "2", stdout=StringIO()
+            )
+            for use_mmap in (False, True):
+                graph = FollowGraph.load_export(path, use_mmap=use_mmap)
+                self.assertEqual(list(graph.followee_ids(a)), [b, c, d])
+                self.assertEqual(list(graph.follower_ids(d)), [a, b])
+
+    def test_import_restores_follows_and_counts(self):
+        a, b, c, d, e = self.ids
+        expected = list(
+            Follower.objects.order_by("user_id", "followee_id").values_list(
+                "user_id", "followee_id", "followed_at"
+            )
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "follows.fgraph")
+            call_command("export_follow_graph", path, stdout=StringIO())
+            Follower.objects.exclude(user_id=a).delete()
+            out = StringIO()
+            call_command(
+                "import_follow_graph", path, "--batch-size", "2", "--mmap", stdout=out
+            )
+            # The follows of a were still there and are not counted again
+            self.assertIn("Imported 3 follow(s)", out.getvalue())
+            self.assertEqual(load_follows(path, batch_size=2), 0)
+        self.assertEqual(
+            list(
+                Follower.objects.order_by("user_id", "followee_id").values_list(
+                    "user_id", "followee_id", "followed_at"
+                )
+            ),
+            expected,
+        )
+        user = get_user_model().objects.get(id=a)
+        self.assertEqual((user.followers_count, user.following_count), (1, 3))
+
+
+class FollowSuggestionsTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.users = [
+            get_user_model().objects.create_user(
+                email=f"friend{i}@user.com", password="testpassword"
+            )
+            for i in range(5)
+        ]
+        me, b, c, d, e = self.users
+        for user, followee in [(me, b), (me, c), (b, d), (c, d), (c, e), (b, me)]:
+            Follower.objects.create(user=user, followee=followee)
+        self.client.force_authenticate(user=me)
+
+    def test_suggestions_ranked_by_mutual_follows(self):
+        me, b, c, d, e = self.users
+        response = self.client.get(reverse("follower:suggestions"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(user["id"], user["mutual_count"]) for user in response.data],
+            [(d.id, 2), (e.id, 1)],
+        )
+
+    def test_graph_and_query_rankings_match(self):
+        me = self.users[0]
+        graph = FollowGraph.load()
+        self.assertEqual(
+            rank_candidates(graph, me.id, 10),
+            [tuple(candidate) for candidate in get_suggestions(me.id)],
+        )
+
+    def test_suggestions_are_stored_and_invalidated(self):
+        me, b, c, d, e = self.users
+        get_suggestions(me.id)
+        with self.assertNumQueries(1):
+            get_suggestions(me.id)
+
+        Follower.objects.create(user=me, followee=d)
+        self.assertTrue(FollowSuggestion.objects.get(user=me).stale)
+        self.assertEqual(get_suggestions(me.id), [(e.id, 1)])
+
+        get_suggestions(b.id)
+        Follower.objects.create(user=me, followee=e)
+        self.assertTrue(FollowSuggestion.objects.get(user=b).stale)
+
+    def test_refresh_command_recomputes_outdated(self):
+        me = self.users[0]
+        get_suggestions(me.id)
+        FollowSuggestion.objects.update(stale=True, candidates=[])
+        call_command("refresh_follow_suggestions", stdout=StringIO())
+        suggestion = FollowSuggestion.objects.get(user=me)
+        self.assertFalse(suggestion.stale)
+        self.assertEqual(len(suggestion.candidates), 2)
+
+
+class BulkFollowTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="bulk@user.com", password="testpassword"
+        )
+        self.others = [
+            get_user_model().objects.create_user(
+                email=f"target{i}@user.com", password="testpassword"
+            )
+            for i in range(4)
+        ]
+        Follower.objects.create(user=self.user, followee=self.others[0])
+        self.client.force_authenticate(user=self.user)
+
+    def outcomes(self, response):
+        return {item["id"]: item["status"] for item in response.data["results"]}
+
+    def test_bulk_follow(self):
+        a, b, c, d = self.others
+        post = Post.objects.create(user=b, content="Backfilled")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse("follower:follow_bulk"),
+                {"user_ids": [a.id, b.id, c.id, self.user.id, 9999]},
+                format="json",
+            )
+        inserts = [q for q in queries if q["sql"].startswith("INSERT")]
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.outcomes(response),
+            {
+                a.id: "already_following",
+                b.id: "followed",
+                c.id: "followed",
+                self.user.id: "self",
+                9999: "not_found",
+            },
+        )
+        self.assertEqual(response.data["following_count"], 3)
+        self.assertEqual(
+            len([q for q in inserts if '"follower_follower"' in q["sql"]]), 1
+        )
+        c.refresh_from_db()
+        self.assertEqual(c.followers_count, 1)
+        self.assertTrue(
+            TimelineEntry.objects.filter(owner=self.user, post=post).exists()
+        )
+
+    @override_settings(TIMELINE_BACKFILL_SIZE=2)
+    def test_bulk_follow_backfills_each_followee(self):
+        a, b, c, d = self.others
+        for author in (b, c):
+            for i in range(3):
+                Post.objects.create(user=author, content=f"Post {i}")
+        self.client.post(
+            reverse("follower:follow_bulk"), {"user_ids": [b.id, c.id]}, format="json"
+        )
+        for author in (b, c):
+            entries = TimelineEntry.objects.filter(owner=self.user, author=author)
+            self.assertEqual(
+                list(
+                    entries.values_list("post__content", flat=True).order_by("-post_id")
+                ),
+                ["Post 2", "Post 1"],
+            )
+
+    def test_bulk_unfollow(self):
+        a, b, c, d = self.others
+        Follower.objects.create(user=self.user, followee=b)
+        Post.objects.create(user=b, content="Trimmed")
+        response = self.client.post(
+            reverse("follower:unfollow_bulk"),
+            {"user_ids": [a.id, b.id, c.id]},
+            format="json",
+        )
+        self.assertEqual(
+            self.outcomes(response),
+            {a.id: "unfollowed", b.id: "unfollowed", c.id: "not_following"},
+        )
+        self.assertEqual(response.data["following_count"], 0)
+        self.assertFalse(Follower.objects.filter(user=self.user).exists())
+        self.assertFalse(
+            TimelineEntry.objects.filter(owner=self.user, author=b).exists()
+        )
+        b.refresh_from_db()
+        self.assertEqual(b.followers_count, 0)
+
+    def test_bulk_writes_count_only_rows_the_database_changed(self):
+        a, b, c, d = self.others
+        # A concurrent request followed b and unfollowed a after the pre-read
+        Follower.objects.create(user=self.user, followee=b)
+        stale = {a.id: False, b.id: False}
+        with mock.patch("follower.bulk._following_by_id", return_value=stale):
+            response = self.client.post(
+                reverse("follower:follow_bulk"), {"user_ids": [b.id]}, format="json"
+            )
+        self.assertEqual(self.outcomes(response), {b.id: "already_following"})
+        Follower.objects.filter(user=self.user, followee=a).delete()
+        stale = {a.id: True, b.id: True}
+        with mock.patch("follower.bulk._following_by_id", return_value=stale):
+            response = self.client.post(
+                reverse("follower:unfollow_bulk"),
+                {"user_ids": [a.id, b.id]},
+                format="json",
+            )
+        self.assertEqual(
+            self.outcomes(response), {a.id: "not_following", b.id: "unfollowed"}
+        )
+        self.user.refresh_from_db()
+        b.refresh_from_db()
+        self.assertEqual((self.user.following_count, b.followers_count), (0, 0))
+
+    def test_bulk_follow_validates_payload(self):
+        response = self.client.post(
+            reverse("follower:follow_bulk"), {"user_ids": []}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ConcurrentFollowTestCase(TransactionTestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="clicker@user.com", password="testpassword"
+        )
+        self.followee = get_user_model().objects.create_user(
+            email="clicked@user.com", password="testpassword"
+        )
+
+    def follow(self, _):
+        try:
+            while True:
+                try:
+                    return Follower.objects.follow(self.user.id, self.followee.id)
+                except OperationalError as error:
+                    # Shared-cache in-memory SQLite reports locks instead of waiting
+                    if "locked" not in str(error):
+                        raise
+                    time.sleep(0.001)
+        finally:
+            connection.close()
+
+    def test_concurrent_follows_create_one_row(self):
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(self.follow, range(32)))
+        self.assertEqual(results.count(True), 1)
+        self.assertEqual(Follower.objects.count(), 1)
+        self.followee.refresh_from_db()
+        self.assertEqual(self.followee.followers_count, 1)
+
+
+class RelationshipsTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.users = [
+            get_user_model().objects.create_user(
+                email=f"badge{i}@user.com", password="testpassword"
+            )
+            for i in range(4)
+        ]
+        me, a, b, c = self.users
+        Follower.objects.create(user=me, followee=a)
+        Follower.objects.create(user=me, followee=b)
+        Follower.objects.create(user=b, followee=me)
+        Follower.objects.create(user=c, followee=me)
+        self.client.force_authenticate(user=me)
+
+    def test_relationship_bitmaps(self):
+        me, a, b, c = self.users
+        ids = ",".join(str(pk) for pk in [a.id, b.id, c.id, 9999])
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("follower:relationships"), {"ids": ids})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            {item["id"]: item["relationship"] for item in response.data},
+            {a.id: 1, b.id: 3, c.id: 2, 9999: 0},
+        )
+
+    def test_relationships_validate_ids(self):
+        url = reverse("follower:relationships")
+        response = self.client.get(url, {"ids": "1,x"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        with override_settings(FOLLOW_RELATIONSHIPS_MAX_IDS=2):
+            response = self.client.get(url, {"ids": "1,2,3"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
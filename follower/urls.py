@@ -1,11 +1,22 @@
 from django.urls import path
 
-from follower.views import FollowView, UnfollowView
+from follower.views import (
+    FollowView,
+    UnfollowView,
+    SuggestionsView,
+    BulkFollowView,
+    BulkUnfollowView,
+    RelationshipsView,
+)
 
 
 urlpatterns = [
     path("follow/<int:pk>/", FollowView.as_view(), name="follow"),
     path("unfollow/<int:pk>/", UnfollowView.as_view(), name="unfollow"),
+    path("follow/bulk/", BulkFollowView.as_view(), name="follow_bulk"),
+    path("unfollow/bulk/", BulkUnfollowView.as_view(), name="unfollow_bulk"),
+    path("suggestions/", SuggestionsView.as_view(), name="suggestions"),
+    path("relationships/", RelationshipsView.as_view(), name="relationships"),
 ]
 
 app_name = "follower"
@@ -1,8 +1,11 @@
-from typing import Any, Tuple
+from typing import Any
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.http import Http404
-from drf_spectacular.utils import extend_schema
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import get_object_or_404
 from rest_framework.utils.serializer_helpers import ReturnDict
 from rest_framework.views import APIView
@@ -10,29 +13,39 @@ from rest_framework import status, generics
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 
-from user.serializers import UserSerializer
+from .bulk import follow_many, unfollow_many
 from .models import Follower
-from .serializers import FollowerSerializer
+from .serializers import (
+    BulkFollowSerializer,
+    BulkFollowResultSerializer,
+    FollowerSerializer,
+    FollowStatusSerializer,
+    RelationshipSerializer,
+    SuggestedUserSerializer,
+)
+from .relationships import get_relationships
+from .suggestions import get_suggestions
 
 
 class FollowMixin:
     @staticmethod
-    def get_following_and_followers(user) -> Tuple[ReturnDict, ReturnDict]:
-        following = (
-            Follower.objects.filter(user=user)
-            .select_related("followee")
-            .values_list("followee", flat=True)
-        )
-        followers = (
-            Follower.objects.filter(followee=user)
-            .select_related("user")
-            .values_list("user", flat=True)
+    def get_follow_status(
+        user, followee_id: int, following: bool, detail: str
+    ) -> ReturnDict:
+        """Return the relationship with the followee and the user's updated counts"""
+        serializer = FollowStatusSerializer(
+            {
+                "detail": detail,
+                "user": user.id,
+                "followee": followee_id,
+                "is_following": following,
+                **get_user_model()
+                .objects.filter(pk=user.id)
+                .values("following_count", "followers_count")
+                .get(),
+            }
         )
-        following_users = get_user_model().objects.filter(pk__in=following)
-        follower_users = get_user_model().objects.filter(pk__in=followers)
-        following_serializer = UserSerializer(following_users, many=True)
-        follower_serializer = UserSerializer(follower_users, many=True)
-        return following_serializer.data, follower_serializer.data
+        return serializer.data
 
 
 class FollowView(FollowMixin, APIView):
@@ -42,40 +55,30 @@ class FollowView(FollowMixin, APIView):
     @extend_schema(
         description="Follow a user by ID.",
         request=FollowerSerializer,
-        responses={201: FollowerSerializer},
+        responses={201: FollowStatusSerializer, 200: FollowStatusSerializer},
     )
     def post(self, request, pk: int, *args, **kwargs) -> Response:
-        followee = get_user_model().objects.filter(pk=pk).first()
-        if not followee:
-            return Response(
-                {"detail": "The user with the specified ID does not exist."},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
         user = request.user
-        if user.id == followee.id:
+        if user.id == pk:
             return Response(
                 {"detail": "You cannot follow yourself."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
         try:
-            Follower.objects.create(user=user, followee=followee)
-            following, followers = self.get_following_and_followers(user)
-            return Response(
-                {
-                    "detail": "Successfully followed.",
-                    "following": following,
-                    "followers": followers,
-                },
-                status=status.HTTP_201_CREATED,
-            )
-        except Exception:
+            created = Follower.objects.follow(user.id, pk)
+        except get_user_model().DoesNotExist:
             return Response(
-                {"detail": "Failed to follow."},
+                {"detail": "The user with the specified ID does not exist."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        detail = "Successfully followed." if created else "Already following."
+        return Response(
+            self.get_follow_status(user, pk, True, detail),
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+
 
 class UnfollowView(FollowMixin, generics.DestroyAPIView):
     serializer_class = FollowerSerializer
@@ -90,7 +93,7 @@ class UnfollowView(FollowMixin, generics.DestroyAPIView):
     @extend_schema(
         description="Unfollow a user by ID.",
         request=FollowerSerializer,
-        responses={204: None},
+        responses={200: FollowStatusSerializer},
     )
     def delete(self, request, *args, **kwargs) -> Response:
         followee = get_object_or_404(get_user_model(), pk=self.kwargs["pk"])
@@ -111,12 +114,122 @@ class UnfollowView(FollowMixin, generics.DestroyAPIView):
             )
 
         self.perform_destroy(instance)
-        following, followers = self.get_following_and_followers(request.user)
         return Response(
-            {
-                "detail": "Successfully unfollowed.",
-                "following": following,
-                "followers": followers,
-            },
+            self.get_follow_status(
+                user, followee.id, False, "Successfully unfollowed."
+            ),
             status=status.HTTP_200_OK,
         )
+
+
+class SuggestionsView(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    @extend_schema(
+        description="Suggest users followed by the users you follow, most mutual follows first.",
+        parameters=[
+            OpenApiParameter(
+                name="limit",
+                type=OpenApiTypes.INT,
+                location=OpenApiParameter.QUERY,
+                description="Number of suggestions to return.",
+            )
+        ],
+        responses={200: SuggestedUserSerializer(many=True)},
+    )
+    def get(self, request, *args, **kwargs) -> Response:
+        try:
+            limit = int(request.query_params.get("limit", 10))
+        except ValueError:
+            limit = 10
+        candidates = get_suggestions(request.user.id)[: max(limit, 1)]
+        users = get_user_model().objects.in_bulk([user_id for user_id, _ in candidates])
+        suggested = []
+        for user_id, mutual_count in candidates:
+            user = users.get(user_id)
+            if user is not None:
+                user.mutual_count = mutual_count
+                suggested.append(user)
+        return Response(SuggestedUserSerializer(suggested, many=True).data)
+
+
+class BulkFollowMixin:
+    serializer_class = BulkFollowSerializer
+    permission_classes = (IsAuthenticated,)
+
+    def apply(self, request, operation) -> Response:
+        serializer = BulkFollowSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        outcomes = operation(request.user.id, serializer.validated_data["user_ids"])
+        result = BulkFollowResultSerializer(
+            {
+                "results": [
+                    {"id": pk, "status": outcome} for pk, outcome in outcomes.items()
+                ],
+                **get_user_model()
+                .objects.filter(pk=request.user.id)
+                .values("following_count", "followers_count")
+                .get(),
+            }
+        )
+        return Response(result.data, status=status.HTTP_200_OK)
+
+
+class BulkFollowView(BulkFollowMixin, APIView):
+    @extend_schema(
+        description="Follow several users by ID, returns the outcome per ID.",
+        request=BulkFollowSerializer,
+        responses={200: BulkFollowResultSerializer},
+    )
+    def post(self, request, *args, **kwargs) -> Response:
+        return self.apply(request, follow_many)
+
+
+class BulkUnfollowView(BulkFollowMixin, APIView):
+    @extend_schema(
+        description="Unfollow several users by ID, returns the outcome per ID.",
+        request=BulkFollowSerializer,
+        responses={200: BulkFollowResultSerializer},
+    )
+    def post(self, request, *args, **kwargs) -> Response:
+        return self.apply(request, unfollow_many)
+
+
+class RelationshipsView(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    @extend_schema(
+        description="Resolve whether you follow and are followed by each of the users.",
+        parameters=[
+            OpenApiParameter(
+                name="ids",
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                required=True,
+                description="Comma-separated user IDs.",
+            )
+        ],
+        responses={200: RelationshipSerializer(many=True)},
+    )
+    def get(self, request, *args, **kwargs) -> Response:
+        try:
+            user_ids = list(
+                dict.fromkeys(
+                    int(pk) for pk in request.query_params.get("ids", "").split(",")
+                )
+            )
+        except ValueError:
+            raise ValidationError({"ids": "Provide comma-separated user IDs."})
+        if len(user_ids) > settings.FOLLOW_RELATIONSHIPS_MAX_IDS:
+            raise ValidationError(
+                {
+                    "ids": f"At most {settings.FOLLOW_RELATIONSHIPS_MAX_IDS} "
+                    "user IDs are allowed."
+                }
+            )
+        relationships = get_relationships(request.user.id, user_ids)
+        serializer = RelationshipSerializer(
+            [{"id": pk, "relationship": bits} for pk, bits in relationships.items()],
+            many=True,
+        )
+        return Response(serializer.data)
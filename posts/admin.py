@@ -1,9 +1,10 @@
 from typing import List
 
 from django.contrib import admin
-from django.db.models import Q, QuerySet
+from django.db.models import QuerySet
 
-from posts.models import Post, Comment
+from posts.hashtags import normalize_hashtag, parse_hashtags
+from posts.models import Post, Comment, Hashtag, PostHashtag
 
 
 class HashtagListFilter(admin.SimpleListFilter):
@@ -11,30 +12,22 @@ class HashtagListFilter(admin.SimpleListFilter):
     parameter_name = "hashtags"
 
     def lookups(self, request, model_admin) -> List:
-        queryset = Post.objects.all()
-        hashtags_set = set()
-        for post in queryset:
-            hashtags = post.hashtags
-            if hashtags is not None:
-                for hashtag in hashtags.split("#"):
-                    if hashtag:
-                        hashtags_set.add(hashtag.strip())
-        return [(hashtag, hashtag) for hashtag in sorted(hashtags_set)]
+        hashtags = Hashtag.objects.filter(post_links__isnull=False).distinct()
+        return [
+            (hashtag, hashtag) for hashtag in hashtags.values_list("name", flat=True)
+        ]
 
     def queryset(self, request, queryset) -> QuerySet:
         if self.value() is None:
             return queryset
 
-        # Split the selected hashtag(s) into separate words
-        hashtags = self.value().split("#")
-        hashtags = [hashtag.strip() for hashtag in hashtags if hashtag.strip()]
-
-        # Build a filter expression to match posts containing any of the selected hashtags
-        q = Q()
-        for hashtag in hashtags:
-            q |= Q(hashtags__contains=f"#{hashtag}")
-
-        return queryset.filter(q)
+        # Match posts containing any of the selected hashtags
+        hashtags = parse_hashtags(self.value()) or {normalize_hashtag(self.value())}
+        return queryset.filter(
+            pk__in=PostHashtag.objects.filter(hashtag__name__in=hashtags).values(
+                "post_id"
+            )
+        )
 
 
 @admin.register(Post)
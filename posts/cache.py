@@ -0,0 +1,141 @@
+import hashlib
+import time
+import uuid
+from itertools import islice
+from typing import Callable, Dict, Iterable, List
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+READER_VERSION_KEY = "feed:reader:{}"
+AUTHOR_VERSION_KEY = "feed:author:{}"
+PULLED_AUTHORS_KEY = "feed:pulled:{}:{}"
+HITS_KEY = "feed:stats:hits"
+MISSES_KEY = "feed:stats:misses"
+
+
+def get_cache():
+    return caches[settings.FEED_CACHE_ALIAS]
+
+
+def _new_version() -> str:
+    return uuid.uuid4().hex
+
+
+def _get_versions(keys: List[str]) -> Dict[str, str]:
+    """Return the current version of every key, creating missing ones"""
+    cache = get_cache()
+    versions = cache.get_many(keys)
+    for key in set(keys) - versions.keys():
+        cache.add(key, _new_version(), timeout=None)
+        versions[key] = cache.get(key)
+    return versions
+
+
+def _bump(keys: Iterable[str]) -> None:
+    cache = get_cache()
+    keys = iter(keys)
+    while chunk := list(islice(keys, 1000)):
+        cache.set_many({key: _new_version() for key in chunk}, timeout=None)
+
+
+def _bump_on_commit(keys: List[str]) -> None:
+    # Bumping again after the commit drops pages rebuilt from the old rows
+    # by concurrent readers while the transaction was still open.
+    _bump(keys)
+    transaction.on_commit(lambda: _bump(keys))
+
+
+def invalidate_readers(user_ids: Iterable[int]) -> None:
+    """Invalidate every cached feed page of the given readers"""
+    _bump_on_commit([READER_VERSION_KEY.format(user_id) for user_id in user_ids])
+
+
+def invalidate_authors(user_ids: Iterable[int]) -> None:
+    """Invalidate every cached feed page showing a post of the given authors"""
+    _bump_on_commit([AUTHOR_VERSION_KEY.format(user_id) for user_id in user_ids])
+
+
+def _count(key: str) -> None:
+    cache = get_cache()
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+def get_stats() -> Dict[str, float]:
+    counters = get_cache().get_many([HITS_KEY, MISSES_KEY])
+    hits, misses = counters.get(HITS_KEY, 0), counters.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "hit_ratio": hits / total if total else 0}
+
+
+def _is_fresh(entry: dict) -> bool:
+    authors = entry["authors"]
+    return not authors or get_cache().get_many(list(authors)) == authors
+
+
+def get_feed_page(
+    user_id: int,
+    url: str,
+    build: Callable[[], dict],
+    pulled_author_ids: Callable[[], List[int]],
+) -> dict:
+    """
+    Return the cached feed page of the reader or build and cache it.
+
+    A page is keyed by the reader version, the versions of the authors merged
+    into the feed at read time and the request URL, which carries the cursor,
+    page size, hashtags and search query. It also remembers the
+    versions of the authors whose posts it shows, so an edited or liked post
+    only invalidates pages which contain posts of its author.
+    Concurrent misses of the same page wait for a single rebuild.
+    """
+    cache = get_cache()
+    reader_key = READER_VERSION_KEY.format(user_id)
+    reader_version = _get_versions([reader_key])[reader_key]
+
+    pulled_key = PULLED_AUTHORS_KEY.format(user_id, reader_version)
+    pulled_ids = cache.get(pulled_key)
+    if pulled_ids is None:
+        pulled_ids = pulled_author_ids()
+        cache.set(pulled_key, pulled_ids, settings.FEED_CACHE_TIMEOUT)
+    pulled_versions = _get_versions(
+        [AUTHOR_VERSION_KEY.format(author_id) for author_id in pulled_ids]
+    )
+
+    digest = hashlib.sha1(
+        repr((url, reader_version, sorted(pulled_versions.items()))).encode()
+    ).hexdigest()
+    key = f"feed:page:{user_id}:{digest}"
+
+    entry = cache.get(key)
+    if entry is not None and _is_fresh(entry):
+        _count(HITS_KEY)
+        return entry["data"]
+    _count(MISSES_KEY)
+
+    lock_key = f"{key}:lock"
+    if not cache.add(lock_key, True, settings.FEED_CACHE_LOCK_TIMEOUT):
+        deadline = time.monotonic() + settings.FEED_CACHE_LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            entry = cache.get(key)
+            if entry is not None and _is_fresh(entry):
+                return entry["data"]
+            if cache.get(lock_key) is None:
+                break
+
+    try:
+        data = build()
+        author_keys = {
+            AUTHOR_VERSION_KEY.format(post["user"]) for post in data["results"]
+        }
+        entry = {"data": data, "authors": _get_versions(list(author_keys))}
+        cache.set(key, entry, settings.FEED_CACHE_TIMEOUT)
+    finally:
+        cache.delete(lock_key)
+    return data
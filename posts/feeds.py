@@ -0,0 +1,121 @@
+import heapq
+from typing import Any, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Q, QuerySet
+
+from .models import Post, TimelineEntry
+from .timeline import pulled_followee_ids
+
+QUERY = "query"
+MERGE = "merge"
+
+Item = Tuple[Any, int]
+
+
+def select_engine(user_id: int, pulled_ids: List[int]) -> str:
+    """
+    Merge per-source streams for users following many accounts, as long as
+    the number of pulled authors, one query each, stays small
+    """
+    if len(pulled_ids) > settings.FEED_MERGE_MAX_PULLED:
+        return QUERY
+    following = (
+        get_user_model()
+        .objects.filter(
+            pk=user_id, following_count__gte=settings.FEED_MERGE_MIN_FOLLOWING
+        )
+        .exists()
+    )
+    return MERGE if following else QUERY
+
+
+def _after(position: Optional[List[Any]], id_field: str) -> Q:
+    """Items after the keyset cursor of the (-created_at, -id) ordering"""
+    if position is None:
+        return Q()
+    created_at, last_id = position
+    # The redundant bound lets the index range scan start at the cursor
+    return Q(created_at__lte=created_at) & (
+        Q(created_at__lt=created_at)
+        | Q(created_at=created_at, **{f"{id_field}__lt": last_id})
+    )
+
+
+def _stream(queryset: QuerySet, id_field: str, position, limit: int) -> Iterator[Item]:
+    return iter(
+        queryset.filter(_after(position, id_field))
+        .order_by("-created_at", f"-{id_field}")
+        .values_list("created_at", id_field)[:limit]
+    )
+
+
+def merged_post_ids(
+    user_id: int,
+    pulled_ids: List[int],
+    position: Optional[List[Any]],
+    limit: int,
+    include_own: bool = True,
+) -> List[int]:
+    """
+    Return ids of the next `limit` posts of the home timeline after the cursor:
+    the materialized entries and the latest posts of every pulled author,
+    each read from its (owner/user, created_at) index, merged with a heap
+    """
+    entries = TimelineEntry.objects.filter(owner_id=user_id)
+    if not include_own:
+        entries = entries.exclude(author_id=user_id)
+    streams = [_stream(entries, "post_id", position, limit)]
+    streams += [
+        _stream(Post.objects.filter(user_id=author_id), "id", position, limit)
+        for author_id in pulled_ids
+    ]
+    # Posts of an author pulled since a backfill can come from two streams
+    post_ids = []
+    for _, post_id in heapq.merge(*streams, reverse=True):
+        if not post_ids or post_ids[-1] != post_id:
+            post_ids.append(post_id)
+            if len(post_ids) == limit:
+                break
+    return post_ids
+
+
+def queried_post_ids(
+    user_id: int,
+    pulled_ids: List[int],
+    position: Optional[List[Any]],
+    limit: int,
+    include_own: bool = True,
+) -> List[int]:
+    """
+    Return ids of up to `limit` timeline entries and `limit` posts of the
+    pulled authors after the cursor, two range scans over the
+    (owner, created_at) and (user, created_at) indexes
+    """
+    entries = TimelineEntry.objects.filter(owner_id=user_id)
+    if not include_own:
+        entries = entries.exclude(author_id=user_id)
+    post_ids = [post_id for _, post_id in _stream(entries, "post_id", position, limit)]
+    if pulled_ids:
+        pulled = Post.objects.filter(user_id__in=pulled_ids)
+        post_ids += [post_id for _, post_id in _stream(pulled, "id", position, limit)]
+    return post_ids
+
+
+def home_feed_candidates(
+    user_id: int,
+    position: Optional[List[Any]],
+    limit: int,
+    include_own: bool = True,
+) -> QuerySet:
+    """
+    Return the home timeline narrowed to the posts the next page can contain.
+    The page itself is still cut by the keyset paginator.
+    """
+    pulled_ids = pulled_followee_ids(user_id)
+    if select_engine(user_id, pulled_ids) == QUERY:
+        post_ids = queried_post_ids(user_id, pulled_ids, position, limit, include_own)
+    else:
+        post_ids = merged_post_ids(user_id, pulled_ids, position, limit, include_own)
+    return Post.objects.filter(pk__in=post_ids)
@@ -0,0 +1,65 @@
+import re
+from typing import Iterable, Set, Tuple
+
+from django.db.models import Count, QuerySet
+
+from .models import Hashtag, Post, PostHashtag
+
+HASHTAG_RE = re.compile(r"#(\w+)")
+
+
+def normalize_hashtag(hashtag: str) -> str:
+    return hashtag.strip().lstrip("#").lower()
+
+
+def parse_hashtags(text: str) -> Set[str]:
+    """Extract the normalized hashtags mentioned in the text"""
+    return {normalize_hashtag(hashtag) for hashtag in HASHTAG_RE.findall(text or "")}
+
+
+def sync_post_hashtags(post: Post) -> Tuple[Set[str], Set[str]]:
+    """
+    Bring the hashtag index of the post in line with its `hashtags` text,
+    return the sets of added and removed hashtags.
+    """
+    hashtags = parse_hashtags(post.hashtags)
+    current = dict(
+        PostHashtag.objects.filter(post_id=post.id).values_list("hashtag__name", "id")
+    )
+    added = hashtags - current.keys()
+    removed = current.keys() - hashtags
+
+    if removed:
+        PostHashtag.objects.filter(id__in=[current[name] for name in removed]).delete()
+    if added:
+        Hashtag.objects.bulk_create(
+            [Hashtag(name=name) for name in added], ignore_conflicts=True
+        )
+        hashtag_ids = Hashtag.objects.filter(name__in=added).values_list(
+            "id", flat=True
+        )
+        PostHashtag.objects.bulk_create(
+            [
+                PostHashtag(post_id=post.id, hashtag_id=hashtag_id)
+                for hashtag_id in hashtag_ids
+            ],
+            ignore_conflicts=True,
+        )
+    return added, removed
+
+
+def filter_by_hashtags(queryset: QuerySet, hashtags: Iterable[str]) -> QuerySet:
+    """
+    Keep posts tagged with every given hashtag by intersecting their posting lists
+    """
+    hashtags = {normalize_hashtag(hashtag) for hashtag in hashtags} - {""}
+    if not hashtags:
+        return queryset
+    matching = (
+        PostHashtag.objects.filter(hashtag__name__in=hashtags)
+        .values("post_id")
+        .annotate(matched=Count("hashtag_id"))
+        .filter(matched=len(hashtags))
+        .values("post_id")
+    )
+    return queryset.filter(pk__in=matching)
@@ -0,0 +1,97 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Optional
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from .cache import invalidate_authors
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.POST_IMAGE_WORKERS,
+                thread_name_prefix="post-image",
+            )
+    return _executor
+
+
+def encode_variant(image: Image.Image, size: int) -> ContentFile:
+    """Fit the image into a size x size box and re-encode it without metadata"""
+    variant = image.copy()
+    variant.thumbnail((size, size), Image.LANCZOS)
+    buffer = BytesIO()
+    variant.save(buffer, format="JPEG", quality=85, optimize=True, progressive=True)
+    return ContentFile(buffer.getvalue())
+
+
+def process_post_image(post_id: int) -> None:
+    """Produce the resized variants of the post image and record its dimensions"""
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image:
+        return
+
+    with post.image.open("rb") as file, Image.open(file) as original:
+        image = ImageOps.exif_transpose(original).convert("RGB")
+    fields = {"image_width": image.width, "image_height": image.height}
+    stem = os.path.splitext(os.path.basename(post.image.name))[0]
+    for variant, size in settings.POST_IMAGE_VARIANTS.items():
+        field = getattr(post, f"image_{variant}")
+        if field:
+            field.delete(save=False)
+        field.save(f"{stem}.jpg", encode_variant(image, size), save=False)
+        fields[f"image_{variant}"] = field.name
+
+    # Skip the update and drop the files if the image has been replaced meanwhile
+    if Post.objects.filter(pk=post_id, image=post.image.name).update(**fields):
+        invalidate_authors([post.user_id])
+    else:
+        for variant in settings.POST_IMAGE_VARIANTS:
+            getattr(post, f"image_{variant}").delete(save=False)
+
+
+def clear_post_image_variants(post: Post) -> None:
+    """Drop the variants and dimensions of a replaced or removed post image"""
+    fields = {"image_width": None, "image_height": None}
+    for variant in settings.POST_IMAGE_VARIANTS:
+        field = getattr(post, f"image_{variant}")
+        if field:
+            field.delete(save=False)
+        fields[f"image_{variant}"] = None
+    Post.objects.filter(pk=post.pk).update(**fields)
+    for name, value in fields.items():
+        setattr(post, name, value)
+    invalidate_authors([post.user_id])
+
+
+def _run(post_id: int) -> None:
+    try:
+        process_post_image(post_id)
+    except Exception:
+        logger.exception("Failed to process the image of post %s", post_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_post_image(post: Post) -> None:
+    """Hand the post image to the worker pool once the transaction commits"""
+    if not post.image:
+        return
+    if settings.POST_IMAGE_WORKERS:
+        transaction.on_commit(lambda: get_executor().submit(_run, post.id))
+    else:
+        transaction.on_commit(lambda: process_post_image(post.id))
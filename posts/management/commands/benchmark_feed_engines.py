@@ -0,0 +1,145 @@
+import heapq
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+
+AFTER = "(created_at < ? OR (created_at = ? AND {id} < ?))"
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the sorted home feed query with the k-way merge of per-source "
+        "index scans on a synthetic timeline in a throwaway SQLite database"
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--followees", type=int, default=2_000)
+        parser.add_argument("--posts-per-followee", type=int, default=50)
+        parser.add_argument("--pulled", type=int, default=20)
+        parser.add_argument("--posts-per-pulled", type=int, default=2_000)
+        parser.add_argument("--pages", type=int, default=20)
+        parser.add_argument("--page-size", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options) -> None:
+        rng = random.Random(options["seed"])
+        followees = range(1, options["followees"] + 1)
+        pulled = range(
+            options["followees"] + 1, options["followees"] + options["pulled"] + 1
+        )
+        self.limit = options["page_size"] + 1
+
+        with tempfile.TemporaryDirectory() as directory:
+            db = sqlite3.connect(os.path.join(directory, "bench.sqlite3"))
+            db.executescript("""
+                CREATE TABLE posts_post (
+                    id INTEGER PRIMARY KEY,
+                    user_id INTEGER NOT NULL,
+                    created_at INTEGER NOT NULL
+                );
+                CREATE INDEX post_created_idx ON posts_post (created_at DESC, id DESC);
+                CREATE INDEX post_user_recent_idx
+                    ON posts_post (user_id, created_at DESC, id DESC);
+                CREATE TABLE posts_timelineentry (
+                    owner_id INTEGER NOT NULL,
+                    post_id INTEGER NOT NULL,
+                    author_id INTEGER NOT NULL,
+                    created_at INTEGER NOT NULL
+                );
+                CREATE INDEX timeline_owner_recent_idx
+                    ON posts_timelineentry (owner_id, created_at DESC, post_id, author_id);
+                """)
+            started = time.perf_counter()
+            for authors, per_author in (
+                (followees, options["posts_per_followee"]),
+                (pulled, options["posts_per_pulled"]),
+            ):
+                db.executemany(
+                    "INSERT INTO posts_post (user_id, created_at) VALUES (?, ?)",
+                    (
+                        (author_id, rng.randrange(10**9))
+                        for author_id in authors
+                        for _ in range(per_author)
+                    ),
+                )
+            # The reader is user 0, posts of pushed followees are fanned out
+            db.execute(
+                "INSERT INTO posts_timelineentry "
+                "SELECT 0, id, user_id, created_at FROM posts_post WHERE user_id <= ?",
+                (options["followees"],),
+            )
+            db.commit()
+            self.stdout.write(
+                f"Generated {db.execute('SELECT COUNT(*) FROM posts_post').fetchone()[0]} "
+                f"posts in {time.perf_counter() - started:.1f}s"
+            )
+
+            pulled_list = ", ".join(str(author_id) for author_id in pulled)
+            all_list = ", ".join(str(author_id) for author_id in (*followees, *pulled))
+            pull_all = self.walk(
+                options["pages"],
+                lambda cursor: db.execute(
+                    f"SELECT created_at, id FROM posts_post "
+                    f"WHERE user_id IN ({all_list}) AND {AFTER.format(id='id')} "
+                    f"ORDER BY created_at DESC, id DESC LIMIT ?",
+                    (*cursor, self.limit),
+                ).fetchall(),
+            )
+            query = self.walk(
+                options["pages"],
+                lambda cursor: db.execute(
+                    f"SELECT created_at, id FROM posts_post "
+                    f"WHERE (id IN (SELECT post_id FROM posts_timelineentry "
+                    f"WHERE owner_id = 0) OR user_id IN ({pulled_list})) "
+                    f"AND {AFTER.format(id='id')} "
+                    f"ORDER BY created_at DESC, id DESC LIMIT ?",
+                    (*cursor, self.limit),
+                ).fetchall(),
+            )
+            merge = self.walk(
+                options["pages"],
+                lambda cursor: list(
+                    islice(
+                        heapq.merge(
+                            db.execute(
+                                f"SELECT created_at, post_id FROM posts_timelineentry "
+                                f"WHERE owner_id = 0 AND {AFTER.format(id='post_id')} "
+                                f"ORDER BY created_at DESC, post_id DESC LIMIT ?",
+                                (*cursor, self.limit),
+                            ).fetchall(),
+                            *(
+                                db.execute(
+                                    f"SELECT created_at, id FROM posts_post "
+                                    f"WHERE user_id = ? AND {AFTER.format(id='id')} "
+                                    f"ORDER BY created_at DESC, id DESC LIMIT ?",
+                                    (author_id, *cursor, self.limit),
+                                ).fetchall()
+                                for author_id in pulled
+                            ),
+                            reverse=True,
+                        ),
+                        self.limit,
+                    )
+                ),
+            )
+            db.close()
+
+        self.stdout.write(f"user__in over all followees: {pull_all * 1000:.2f} ms/page")
+        self.stdout.write(f"Timeline OR pulled authors:  {query * 1000:.2f} ms/page")
+        self.stdout.write(f"k-way merge of streams:      {merge * 1000:.2f} ms/page")
+        self.stdout.write(self.style.SUCCESS(f"Speedup: {query / merge:.1f}x"))
+
+    def walk(self, pages: int, fetch) -> float:
+        """Read consecutive pages through the keyset cursor, return seconds per page"""
+        cursor = (2**62, 2**62, 2**62)
+        started = time.perf_counter()
+        for _ in range(pages):
+            rows = fetch(cursor)
+            created_at, last_id = rows[-2]
+            cursor = (created_at, created_at, last_id)
+        return (time.perf_counter() - started) / pages
@@ -0,0 +1,90 @@
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from itertools import accumulate
+
+from django.core.management.base import BaseCommand
+
+from posts.search import fts_query
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare FTS5 search with the LIKE scan produced by content__icontains "
+        "on a synthetic corpus in a throwaway SQLite database"
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--posts", type=int, default=1_000_000)
+        parser.add_argument("--queries", type=int, default=20)
+        parser.add_argument("--words-per-post", type=int, default=20)
+        parser.add_argument("--vocabulary", type=int, default=50_000)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options) -> None:
+        rng = random.Random(options["seed"])
+        vocabulary = [f"w{i}x" for i in range(options["vocabulary"])]
+        # Zipf-like word frequencies, as in natural language
+        weights = list(accumulate(1 / rank for rank in range(1, len(vocabulary) + 1)))
+
+        with tempfile.TemporaryDirectory() as directory:
+            db = sqlite3.connect(os.path.join(directory, "bench.sqlite3"))
+            db.executescript("""
+                CREATE TABLE posts_post (
+                    id INTEGER PRIMARY KEY, content TEXT NOT NULL
+                );
+                CREATE VIRTUAL TABLE posts_post_fts USING fts5(
+                    content, content='posts_post', content_rowid='id'
+                );
+                """)
+
+            started = time.perf_counter()
+            batch = 10_000
+            for offset in range(0, options["posts"], batch):
+                rows = [
+                    (
+                        " ".join(
+                            rng.choices(
+                                vocabulary,
+                                cum_weights=weights,
+                                k=options["words_per_post"],
+                            )
+                        ),
+                    )
+                    for _ in range(min(batch, options["posts"] - offset))
+                ]
+                db.executemany("INSERT INTO posts_post(content) VALUES (?)", rows)
+            db.execute("INSERT INTO posts_post_fts(posts_post_fts) VALUES ('rebuild')")
+            db.commit()
+            self.stdout.write(
+                f"Generated and indexed {options['posts']} posts "
+                f"in {time.perf_counter() - started:.1f}s"
+            )
+
+            terms = rng.sample(vocabulary[100:5_000], options["queries"])
+            like_time = self.run_queries(
+                db,
+                "SELECT id FROM posts_post WHERE content LIKE ? ESCAPE '\\' "
+                "ORDER BY id DESC LIMIT 20",
+                [(f"%{term}%",) for term in terms],
+            )
+            fts_time = self.run_queries(
+                db,
+                "SELECT rowid FROM posts_post_fts WHERE posts_post_fts MATCH ? "
+                "ORDER BY bm25(posts_post_fts) LIMIT 20",
+                [(fts_query(term),) for term in terms],
+            )
+            db.close()
+
+        self.stdout.write(f"icontains (LIKE scan): {like_time * 1000:.2f} ms/query")
+        self.stdout.write(f"FTS5 with bm25:        {fts_time * 1000:.2f} ms/query")
+        self.stdout.write(self.style.SUCCESS(f"Speedup: {like_time / fts_time:.1f}x"))
+
+    @staticmethod
+    def run_queries(db, sql, params) -> float:
+        started = time.perf_counter()
+        for param in params:
+            db.execute(sql, param).fetchall()
+        return (time.perf_counter() - started) / len(params)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from posts.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index of post content"
+
+    def handle(self, *args, **options) -> None:
+        if connection.vendor != "sqlite":
+            raise CommandError("The FTS5 search index is only available on SQLite.")
+        rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS("Rebuilt the post search index."))
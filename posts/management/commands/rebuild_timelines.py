@@ -0,0 +1,31 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.timeline import rebuild_timeline
+
+
+class Command(BaseCommand):
+    help = "Rebuild materialized home timelines from the posts and follower tables"
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--user",
+            type=int,
+            action="append",
+            dest="user_ids",
+            help="Rebuild only the timeline of the user with this ID (repeatable)",
+        )
+
+    def handle(self, *args, **options) -> None:
+        user_ids = get_user_model().objects.order_by("id").values_list("id", flat=True)
+        if options["user_ids"]:
+            user_ids = user_ids.filter(id__in=options["user_ids"])
+
+        rebuilt = 0
+        for user_id in list(user_ids):
+            with transaction.atomic():
+                rebuild_timeline(user_id)
+            rebuilt += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuilt} timeline(s)."))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from posts.trending import get_trending_hashtags
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount the trending hashtag buckets from the posts inside the window, "
+        "run once after deploying and whenever the counts need to be repaired. "
+        "Schedule it with --prune every few minutes to expire old buckets"
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--prune",
+            action="store_true",
+            help=(
+                "Only delete the buckets that left the window and refresh the "
+                "stored scores"
+            ),
+        )
+
+    def handle(self, *args, **options) -> None:
+        trending = get_trending_hashtags()
+        if options["prune"]:
+            deleted = trending.prune()
+            self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} bucket(s)."))
+            return
+        buckets = trending.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt {buckets} trending hashtag bucket(s).")
+        )
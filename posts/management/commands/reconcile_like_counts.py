@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored Post.likes_count from the likes table in chunks"
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options) -> None:
+        Like = Post.likes.through
+        batch_size = options["batch_size"]
+        last_id, checked, repaired = 0, 0, 0
+
+        while True:
+            with transaction.atomic():
+                posts = list(
+                    Post.objects.filter(id__gt=last_id)
+                    .order_by("id")
+                    .values_list("id", "likes_count")[:batch_size]
+                )
+                if not posts:
+                    break
+                last_id = posts[-1][0]
+                actual = dict(
+                    Like.objects.filter(post_id__in=[post_id for post_id, _ in posts])
+                    .values("post_id")
+                    .annotate(total=Count("id"))
+                    .values_list("post_id", "total")
+                )
+                stale = [
+                    Post(id=post_id, likes_count=actual.get(post_id, 0))
+                    for post_id, likes_count in posts
+                    if likes_count != actual.get(post_id, 0)
+                ]
+                Post.objects.bulk_update(stale, ["likes_count"])
+            checked += len(posts)
+            repaired += len(stale)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Checked {checked} post(s), repaired {repaired}.")
+        )
@@ -0,0 +1,94 @@
+# Generated by Django 4.2 on 2026-10-18 08:57
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def materialize_timelines(apps, schema_editor):
+    Post = apps.get_model("posts", "Post")
+    Follower = apps.get_model("follower", "Follower")
+    TimelineEntry = apps.get_model("posts", "TimelineEntry")
+
+    for post in Post.objects.only("id", "user_id", "created_at").iterator():
+        owner_ids = [post.user_id] + list(
+            Follower.objects.filter(followee_id=post.user_id).values_list(
+                "user_id", flat=True
+            )
+        )
+        TimelineEntry.objects.bulk_create(
+            [
+                TimelineEntry(
+                    owner_id=owner_id,
+                    post_id=post.id,
+                    author_id=post.user_id,
+                    created_at=post.created_at,
+                )
+                for owner_id in owner_ids
+            ],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("follower", "0004_alter_follower_followee_alter_follower_user"),
+        ("posts", "0004_post_likes_comment"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TimelineEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField()),
+                (
+                    "author",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="timeline_entries",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "post",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="timeline_entries",
+                        to="posts.post",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="timelineentry",
+            index=models.Index(
+                fields=["owner", "-created_at", "post", "author"],
+                name="timeline_owner_recent_idx",
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="timelineentry",
+            unique_together={("owner", "post")},
+        ),
+        migrations.RunPython(materialize_timelines, migrations.RunPython.noop),
+    ]
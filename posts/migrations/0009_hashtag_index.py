@@ -0,0 +1,92 @@
+# Generated by Django 4.2 on 2026-10-18 09:03
+
+import re
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def index_hashtags(apps, schema_editor):
+    Post = apps.get_model("posts", "Post")
+    Hashtag = apps.get_model("posts", "Hashtag")
+    PostHashtag = apps.get_model("posts", "PostHashtag")
+
+    posts = Post.objects.exclude(hashtags=None).values_list("id", "hashtags")
+    for post_id, text in posts.iterator():
+        names = {name.lower() for name in re.findall(r"#(\w+)", text)}
+        if not names:
+            continue
+        Hashtag.objects.bulk_create(
+            [Hashtag(name=name) for name in names], ignore_conflicts=True
+        )
+        PostHashtag.objects.bulk_create(
+            [
+                PostHashtag(post_id=post_id, hashtag_id=hashtag_id)
+                for hashtag_id in Hashtag.objects.filter(name__in=names).values_list(
+                    "id", flat=True
+                )
+            ],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("posts", "0008_post_comments_count"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Hashtag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255, unique=True)),
+            ],
+            options={
+                "ordering": ["name"],
+            },
+        ),
+        migrations.CreateModel(
+            name="PostHashtag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "hashtag",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="post_links",
+                        to="posts.hashtag",
+                    ),
+                ),
+                (
+                    "post",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="hashtag_links",
+                        to="posts.post",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("hashtag", "post")},
+            },
+        ),
+        migrations.RunPython(index_hashtags, migrations.RunPython.noop),
+    ]
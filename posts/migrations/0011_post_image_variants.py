@@ -0,0 +1,43 @@
+# Generated by Django 4.2 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("posts", "0010_post_search_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="image_feed",
+            field=models.ImageField(
+                blank=True, editable=False, null=True, upload_to="post_image/feed"
+            ),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="image_full",
+            field=models.ImageField(
+                blank=True, editable=False, null=True, upload_to="post_image/full"
+            ),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="image_height",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="image_thumbnail",
+            field=models.ImageField(
+                blank=True, editable=False, null=True, upload_to="post_image/thumbnail"
+            ),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="image_width",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2 on 2026-10-18 10:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("posts", "0012_post_user_recent_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TrendingBucket",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("hashtag", models.CharField(max_length=255)),
+                ("bucket", models.IntegerField()),
+                ("count", models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="trendingbucket",
+            index=models.Index(fields=["bucket"], name="trending_bucket_idx"),
+        ),
+        migrations.AlterUniqueTogether(
+            name="trendingbucket",
+            unique_together={("hashtag", "bucket")},
+        ),
+    ]
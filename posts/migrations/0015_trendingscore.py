@@ -0,0 +1,32 @@
+# Generated by Django 4.2 on 2026-10-18 10:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("posts", "0014_timeline_owner_recent_idx_post_desc"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TrendingScore",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("hashtag", models.CharField(max_length=255, unique=True)),
+                ("level", models.FloatField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="trendingscore",
+            index=models.Index(fields=["-level"], name="trending_score_level_idx"),
+        ),
+    ]
@@ -1,24 +1,72 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.conf import settings
 
+from .cache import invalidate_authors
+
 
 class Post(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     content = models.TextField()
     image = models.ImageField(upload_to="post_image", null=True, blank=True)
+    image_thumbnail = models.ImageField(
+        upload_to="post_image/thumbnail", null=True, blank=True, editable=False
+    )
+    image_feed = models.ImageField(
+        upload_to="post_image/feed", null=True, blank=True, editable=False
+    )
+    image_full = models.ImageField(
+        upload_to="post_image/full", null=True, blank=True, editable=False
+    )
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     hashtags = models.CharField(max_length=3000, default=None, null=True, blank=True)
     likes = models.ManyToManyField(
         settings.AUTH_USER_MODEL, related_name="liked_posts", blank=True
     )
+    likes_count = models.PositiveIntegerField(default=0, editable=False)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         default_related_name = "posts"
-        ordering = ["-created_at"]
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="post_created_idx"),
+            models.Index(
+                fields=["user", "-created_at", "-id"], name="post_user_recent_idx"
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.content
 
+    def add_like(self, user) -> bool:
+        """Like the post by the user, return False if it was already liked"""
+        with transaction.atomic():
+            _, created = Post.likes.through.objects.get_or_create(
+                post_id=self.pk, user_id=user.pk
+            )
+            if created:
+                Post.objects.filter(pk=self.pk).update(likes_count=F("likes_count") + 1)
+                invalidate_authors([self.user_id])
+        self.refresh_from_db(fields=["likes_count"])
+        return created
+
+    def remove_like(self, user) -> bool:
+        """Unlike the post by the user, return False if it was not liked"""
+        with transaction.atomic():
+            deleted, _ = Post.likes.through.objects.filter(
+                post_id=self.pk, user_id=user.pk
+            ).delete()
+            if deleted:
+                Post.objects.filter(pk=self.pk, likes_count__gt=0).update(
+                    likes_count=F("likes_count") - 1
+                )
+                invalidate_authors([self.user_id])
+        self.refresh_from_db(fields=["likes_count"])
+        return bool(deleted)
+
 
 class Comment(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="comments")
@@ -27,7 +75,101 @@ class Comment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        ordering = ["-created_at"]
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            models.Index(
+                fields=["post", "-created_at", "-id"], name="comment_post_recent_idx"
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.content
+
+
+class TimelineEntry(models.Model):
+    """A post materialized into the home timeline of one of its readers."""
+
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="timeline_entries",
+        db_index=False,
+    )
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="timeline_entries"
+    )
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+"
+    )
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ["owner", "post"]
+        indexes = [
+            models.Index(
+                fields=["owner", "-created_at", "-post", "author"],
+                name="timeline_owner_recent_idx",
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.post_id} in timeline of {self.owner_id}"
+
+
+class Hashtag(models.Model):
+    name = models.CharField(max_length=255, unique=True)
+
+    class Meta:
+        ordering = ["name"]
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class PostHashtag(models.Model):
+    """Posting list entry linking a hashtag to a post that mentions it."""
+
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="hashtag_links"
+    )
+    hashtag = models.ForeignKey(
+        Hashtag, on_delete=models.CASCADE, related_name="post_links", db_index=False
+    )
+
+    class Meta:
+        unique_together = ["hashtag", "post"]
+
+    def __str__(self) -> str:
+        return f"#{self.hashtag_id} in {self.post_id}"
+
+
+class TrendingBucket(models.Model):
+    """Number of posts created within one time bucket that mention a hashtag."""
+
+    hashtag = models.CharField(max_length=255)
+    bucket = models.IntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ["hashtag", "bucket"]
+        indexes = [models.Index(fields=["bucket"], name="trending_bucket_idx")]
+
+    def __str__(self) -> str:
+        return f"#{self.hashtag} x{self.count} in bucket {self.bucket}"
+
+
+class TrendingScore(models.Model):
+    """
+    Decayed score of a hashtag as log2(score) + current_bucket / half_life.
+    Decay lowers every score by the same factor, so levels written at
+    different times still order the hashtags like their scores.
+    """
+
+    hashtag = models.CharField(max_length=255, unique=True)
+    level = models.FloatField()
+
+    class Meta:
+        indexes = [models.Index(fields=["-level"], name="trending_score_level_idx")]
+
+    def __str__(self) -> str:
+        return f"#{self.hashtag} at level {self.level}"
@@ -0,0 +1,46 @@
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Q, QuerySet, Value
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = "posts_post_fts"
+
+
+def fts_query(text: str) -> str:
+    """Quote every word of the text so user input can't inject FTS5 syntax"""
+    return " ".join(f'"{word}"' for word in re.findall(r"\w+", text))
+
+
+def search_posts(queryset: QuerySet, text: str) -> QuerySet:
+    """
+    Keep posts whose content matches all words of the text and annotate them
+    with their bm25 `search_rank` (lower is better).
+    """
+    query = fts_query(text)
+    if not query:
+        return queryset.none()
+
+    if connection.vendor != "sqlite":
+        condition = Q()
+        for word in re.findall(r"\w+", text):
+            condition &= Q(content__icontains=word)
+        return queryset.filter(condition).annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        )
+
+    matches = RawSQL(
+        f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", (query,)
+    )
+    rank = RawSQL(
+        f"SELECT bm25({FTS_TABLE}) FROM {FTS_TABLE} "
+        f"WHERE {FTS_TABLE} MATCH %s AND rowid = posts_post.id",
+        (query,),
+        output_field=FloatField(),
+    )
+    return queryset.filter(pk__in=matches).annotate(search_rank=rank)
+
+
+def rebuild_search_index() -> None:
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
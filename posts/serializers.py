@@ -1,6 +1,24 @@
+from typing import Dict, Iterable, Optional, Set
+
+from django.conf import settings
+from django.db import models
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 from .models import Post, Comment
 
+IMAGE_VARIANT_FIELDS = ("image_thumbnail", "image_feed", "image_full")
+
+
+def liked_post_ids(request, post_ids: Iterable[int]) -> Set[int]:
+    """Return ids of the given posts liked by the requesting user in one query"""
+    if request is None or not request.user.is_authenticated:
+        return set()
+    return set(
+        Post.likes.through.objects.filter(
+            user_id=request.user.id, post_id__in=list(post_ids)
+        ).values_list("post_id", flat=True)
+    )
+
 
 class CommentSerializer(serializers.ModelSerializer):
     class Meta:
@@ -8,28 +26,78 @@ class CommentSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+class PostListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        posts = list(data.all() if isinstance(data, models.Manager) else data)
+        self.context["liked_post_ids"] = liked_post_ids(
+            self.context.get("request"), [post.pk for post in posts]
+        )
+        return super().to_representation(posts)
+
+
 class PostSerializer(serializers.ModelSerializer):
-    likes_count = serializers.SerializerMethodField()
     user_liked = serializers.SerializerMethodField()
-    comments = CommentSerializer(many=True, read_only=True)
+    comments = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Post
-        fields = "__all__"
+        exclude = ("likes",) + IMAGE_VARIANT_FIELDS
+        list_serializer_class = PostListSerializer
 
-    def get_likes_count(self, obj):
-        return obj.likes.count()
+    def get_file_url(self, file) -> Optional[str]:
+        if not file:
+            return None
+        request = self.context.get("request")
+        return request.build_absolute_uri(file.url) if request else file.url
 
-    def get_user_liked(self, obj):
-        if "request" in self.context:
-            user = self.context["request"].user
-            if user.is_authenticated:
-                return obj.likes.filter(id=user.id).exists()
-        return False
+    def to_representation(self, instance):
+        """Serve the feed-sized image variant once it has been processed"""
+        data = super().to_representation(instance)
+        if instance.image and instance.image_feed:
+            data["image"] = self.get_file_url(instance.image_feed)
+        return data
+
+    @extend_schema_field(
+        {
+            "type": "object",
+            "nullable": True,
+            "properties": {
+                variant: {"type": "string", "format": "uri"}
+                for variant in settings.POST_IMAGE_VARIANTS
+            },
+        }
+    )
+    def get_image_variants(self, obj) -> Optional[Dict[str, Optional[str]]]:
+        if not obj.image or not obj.image_feed:
+            return None
+        return {
+            variant: self.get_file_url(getattr(obj, f"image_{variant}"))
+            for variant in settings.POST_IMAGE_VARIANTS
+        }
+
+    def get_user_liked(self, obj) -> bool:
+        liked = self.context.get("liked_post_ids")
+        if liked is None:
+            liked = liked_post_ids(self.context.get("request"), [obj.pk])
+        return obj.pk in liked
+
+    @extend_schema_field(CommentSerializer(many=True))
+    def get_comments(self, obj) -> list:
+        """Return the latest comments, prefetched as `latest_comments` for feeds"""
+        comments = getattr(obj, "latest_comments", None)
+        if comments is None:
+            comments = obj.comments.all()[: settings.POST_COMMENT_PREVIEW_SIZE]
+        return CommentSerializer(comments, many=True, context=self.context).data
 
 
 class PostCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Post
-        fields = "__all__"
-        read_only_fields = ("user",)
+        exclude = IMAGE_VARIANT_FIELDS
+        read_only_fields = ("user", "likes")
+
+
+class TrendingHashtagSerializer(serializers.Serializer):
+    hashtag = serializers.CharField()
+    score = serializers.FloatField()
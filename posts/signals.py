@@ -0,0 +1,163 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from follower.models import Follower
+from follower.signals import (
+    followers_count_decreased,
+    follows_created,
+    follows_deleted,
+)
+from . import timeline
+from .cache import invalidate_authors, invalidate_readers
+from .hashtags import sync_post_hashtags
+from .models import Post, Comment, PostHashtag
+from .trending import get_trending_hashtags
+
+
+@receiver(post_save, sender=Post)
+def fan_out_created_post(sender, instance, created, raw=False, **kwargs) -> None:
+    if created and not raw:
+        invalidate_readers(timeline.fan_out_post(instance))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_author_feeds(sender, instance, raw=False, **kwargs) -> None:
+    if not raw:
+        invalidate_authors([instance.user_id])
+
+
+@receiver(post_save, sender=Post)
+def index_post_hashtags(sender, instance, raw=False, **kwargs) -> None:
+    if raw:
+        return
+    added, removed = sync_post_hashtags(instance)
+    # Counted in the transaction of the post, so a rollback uncounts it too
+    trending = get_trending_hashtags()
+    trending.record(added, at=instance.created_at)
+    trending.record(removed, at=instance.created_at, delta=-1)
+
+
+@receiver(pre_delete, sender=Post)
+def uncount_trending_hashtags(sender, instance, **kwargs) -> None:
+    trending = get_trending_hashtags()
+    if not trending.covers(instance.created_at):
+        return
+    hashtags = list(
+        PostHashtag.objects.filter(post_id=instance.id).values_list(
+            "hashtag__name", flat=True
+        )
+    )
+    trending.record(hashtags, at=instance.created_at, delta=-1)
+
+
+def invalidate_post_author_feeds(post_id: int) -> None:
+    invalidate_authors(
+        Post.objects.filter(pk=post_id).values_list("user_id", flat=True)
+    )
+
+
+@receiver(post_save, sender=Comment)
+def increment_comments_count(sender, instance, created, raw=False, **kwargs) -> None:
+    if created and not raw:
+        Post.objects.filter(pk=instance.post_id).update(
+            comments_count=F("comments_count") + 1
+        )
+        invalidate_post_author_feeds(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_comments_count(sender, instance, **kwargs) -> None:
+    Post.objects.filter(pk=instance.post_id, comments_count__gt=0).update(
+        comments_count=F("comments_count") - 1
+    )
+    invalidate_post_author_feeds(instance.post_id)
+
+
+@receiver(m2m_changed, sender=Post.likes.through)
+def recount_changed_likes(sender, instance, action, reverse, pk_set, **kwargs) -> None:
+    """
+    Keep likes_count in sync when likes are changed through the relation,
+    e.g. post.likes.add(user) from the admin or the shell. Post.add_like and
+    Post.remove_like update the counter themselves and send no m2m_changed.
+    """
+    if not reverse:
+        post_ids = [instance.pk]
+    elif action == "pre_clear":
+        # The liked posts are gone once post_clear is sent
+        instance._cleared_like_post_ids = list(
+            sender.objects.filter(user_id=instance.pk).values_list("post_id", flat=True)
+        )
+        return
+    elif action == "post_clear":
+        post_ids = instance.__dict__.pop("_cleared_like_post_ids", [])
+    else:
+        post_ids = pk_set
+    if action not in ("post_add", "post_remove", "post_clear") or not post_ids:
+        return
+    likes = (
+        sender.objects.filter(post_id=OuterRef("pk"))
+        .values("post_id")
+        .annotate(total=Count("id"))
+        .values("total")
+    )
+    Post.objects.filter(pk__in=post_ids).update(
+        likes_count=Coalesce(Subquery(likes), 0)
+    )
+    invalidate_authors(
+        Post.objects.filter(pk__in=post_ids).values_list("user_id", flat=True)
+    )
+
+
+@receiver(followers_count_decreased, sender=Follower)
+def push_authors_back_under_limit(sender, followee_ids, **kwargs) -> None:
+    """
+    Backfill the followers of authors who were just unfollowed down to
+    TIMELINE_FANOUT_LIMIT, their older posts were merged at read time only
+    """
+    crossed_ids = (
+        get_user_model()
+        .objects.filter(
+            pk__in=followee_ids, followers_count=settings.TIMELINE_FANOUT_LIMIT
+        )
+        .values_list("pk", flat=True)
+    )
+    for author_id in crossed_ids:
+        invalidate_readers(timeline.backfill_followers(author_id))
+
+
+@receiver(post_save, sender=Follower)
+def backfill_timeline_on_follow(sender, instance, created, raw=False, **kwargs) -> None:
+    if created and not raw:
+        timeline.backfill_followee(instance.user_id, instance.followee_id)
+        invalidate_readers([instance.user_id])
+
+
+@receiver(post_delete, sender=Follower)
+def trim_timeline_on_unfollow(sender, instance, **kwargs) -> None:
+    timeline.trim_followee(instance.user_id, instance.followee_id)
+    invalidate_readers([instance.user_id])
+
+
+@receiver(follows_created, sender=Follower)
+def backfill_timeline_on_bulk_follow(sender, user_id, followee_ids, **kwargs) -> None:
+    timeline.backfill_followees(user_id, followee_ids)
+    invalidate_readers([user_id])
+
+
+@receiver(follows_deleted, sender=Follower)
+def trim_timeline_on_bulk_unfollow(sender, user_id, followee_ids, **kwargs) -> None:
+    timeline.trim_followees(user_id, followee_ids)
+    invalidate_readers([user_id])
+
+
+@receiver(post_save, sender=get_user_model())
+def reset_new_user_feeds(sender, instance, created, raw=False, **kwargs) -> None:
+    # Primary keys of deleted users may be reused, never serve their pages
+    if created and not raw:
+        invalidate_readers([instance.id])
+        invalidate_authors([instance.id])
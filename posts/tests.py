@@ -1,15 +1,41 @@
+import os
+import tempfile
+import threading
+import time
 from datetime import datetime
+from io import BytesIO, StringIO
+
+from PIL import Image
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient, force_authenticate
 from django.contrib.admin.sites import AdminSite
 from django.contrib.auth import get_user_model
-from django.test import TestCase, RequestFactory
+from django.test import TestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
 
 
 from posts.admin import PostAdmin, HashtagListFilter
-from posts.models import Post
+from posts.cache import get_feed_page, get_stats
+from follower.bulk import unfollow_many
+from follower.models import Follower
+from pagination.pagination import KeysetPagination
+from posts.models import (
+    Comment,
+    Post,
+    TimelineEntry,
+    TrendingBucket,
+    TrendingScore,
+)
 from posts.serializers import PostSerializer
+from posts.timeline import home_feed
+from posts.trending import TrendingHashtags, get_trending_hashtags
 
 
 class PostAdminTest(TestCase):
@@ -108,6 +134,74 @@ class PostViewSetTestCase(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertNotIn(self.user, self.post1.likes.all())
 
+    def test_likes_changed_through_relation_keep_count(self):
+        other = get_user_model().objects.create_user(
+            email="other@test.com", password="testpass"
+        )
+        self.post1.likes.add(self.user, other)
+        self.post1.refresh_from_db()
+        self.assertEqual(self.post1.likes_count, 2)
+
+        url = reverse("posts:posts-unlike", args=[self.post1.pk])
+        response = self.client.post(url, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.post1.refresh_from_db()
+        self.assertEqual(self.post1.likes_count, 1)
+
+        self.post2.likes.add(other)
+        other.liked_posts.clear()
+        self.post1.refresh_from_db()
+        self.post2.refresh_from_db()
+        self.assertEqual((self.post1.likes_count, self.post2.likes_count), (0, 0))
+
+
+class FeedPaginationTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="testuser@test.com", password="testpass"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.posts = [
+            Post.objects.create(user=self.user, content=f"Post {i}") for i in range(5)
+        ]
+
+    def test_cursor_walks_feed_in_order(self):
+        seen = []
+        url = reverse("posts:posts-list")
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn("count", response.data)
+            seen += [post["id"] for post in response.data["results"]]
+            url = response.data["next"]
+        self.assertEqual(seen, [post.id for post in reversed(self.posts)])
+
+    def test_page_does_not_count_or_offset_feed(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("posts:posts-list"), {"page_size": 2})
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(*) AS "__count" FROM "posts_post"', query["sql"])
+            self.assertNotIn("OFFSET", query["sql"])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse("posts:posts-list"), {"cursor": "invalid"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_tampered_cursor(self):
+        paginator = KeysetPagination()
+        for values in (
+            ["abc", 1],
+            [{"x": 1}, 2],
+            [None, None],
+            ["2020-01-01T00:00:00", "zz"],
+        ):
+            cursor = paginator.encode_cursor(values)
+            for name in ("posts:posts-list", "posts:posts-following"):
+                with self.subTest(values=values, url=name):
+                    response = self.client.get(reverse(name), {"cursor": cursor})
+                    self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
 
 class IsOwnerOrReadOnlyTests(TestCase):
     def setUp(self):
@@ -133,3 +227,584 @@ class IsOwnerOrReadOnlyTests(TestCase):
             format="json",
         )
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TimelineTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="reader@test.com", password="testpass"
+        )
+        self.author = get_user_model().objects.create_user(
+            email="author@test.com", password="testpass"
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def get_feed_ids(self, name="posts:posts-list"):
+        response = self.client.get(reverse(name), {"page_size": 100})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post["id"] for post in response.data["results"]]
+
+    def test_post_is_fanned_out_to_followers(self):
+        Follower.objects.create(user=self.user, followee=self.author)
+        post = Post.objects.create(user=self.author, content="Fanned out")
+        self.assertTrue(
+            TimelineEntry.objects.filter(owner=self.user, post=post).exists()
+        )
+        self.assertIn(post.id, self.get_feed_ids("posts:posts-following"))
+
+    def test_follow_backfills_and_unfollow_trims_timeline(self):
+        post = Post.objects.create(user=self.author, content="Old post")
+        follow = Follower.objects.create(user=self.user, followee=self.author)
+        self.assertTrue(
+            TimelineEntry.objects.filter(owner=self.user, post=post).exists()
+        )
+        follow.unfollow()
+        self.assertFalse(TimelineEntry.objects.filter(owner=self.user).exists())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_pulled_author_posts_are_merged_at_read_time(self):
+        Follower.objects.create(user=self.user, followee=self.author)
+        post = Post.objects.create(user=self.author, content="Celebrity post")
+        own_post = Post.objects.create(user=self.user, content="Own post")
+        self.assertFalse(
+            TimelineEntry.objects.filter(owner=self.user, post=post).exists()
+        )
+        self.assertEqual(self.get_feed_ids(), [own_post.id, post.id])
+
+    @override_settings(TIMELINE_BACKFILL_SIZE=1)
+    def test_posts_older_than_the_backfill_stay_reachable(self):
+        old_post = Post.objects.create(user=self.author, content="Old post")
+        Post.objects.create(user=self.author, content="New post")
+        Follower.objects.create(user=self.user, followee=self.author)
+        self.assertNotIn(old_post.id, self.get_feed_ids())
+        url = reverse("posts:posts-detail", args=[old_post.id])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        stranger_post = Post.objects.create(
+            user=get_user_model().objects.create_user(
+                email="stranger@test.com", password="testpass"
+            ),
+            content="Not followed",
+        )
+        url = reverse("posts:posts-detail", args=[stranger_post.id])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_author_back_under_the_limit_is_backfilled(self):
+        other = get_user_model().objects.create_user(
+            email="other@test.com", password="testpass"
+        )
+        Follower.objects.create(user=self.user, followee=self.author)
+        follow = Follower.objects.create(user=other, followee=self.author)
+        post = Post.objects.create(user=self.author, content="Pulled post")
+        self.assertFalse(
+            TimelineEntry.objects.filter(owner=self.user, post=post).exists()
+        )
+        follow.unfollow()
+        self.assertTrue(
+            TimelineEntry.objects.filter(owner=self.user, post=post).exists()
+        )
+        self.assertIn(post.id, self.get_feed_ids())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_bulk_unfollow_backfills_author_back_under_the_limit(self):
+        other = get_user_model().objects.create_user(
+            email="other@test.com", password="testpass"
+        )
+        Follower.objects.create(user=self.user, followee=self.author)
+        Follower.objects.create(user=other, followee=self.author)
+        post = Post.objects.create(user=self.author, content="Pulled post")
+        unfollow_many(other.id, [self.author.id])
+        self.assertTrue(
+            TimelineEntry.objects.filter(owner=self.user, post=post).exists()
+        )
+
+    def walk_feed_ids(self, name="posts:posts-list"):
+        cache.clear()
+        seen, url, params = [], reverse(name), {"page_size": 2}
+        while url:
+            response = self.client.get(url, params)
+            seen += [post["id"] for post in response.data["results"]]
+            url, params = response.data["next"], None
+        return seen
+
+    def test_merged_feed_matches_sorted_query(self):
+        other = get_user_model().objects.create_user(
+            email="other@test.com", password="testpass"
+        )
+        Follower.objects.create(user=self.user, followee=self.author)
+        Follower.objects.create(user=self.user, followee=other)
+        Post.objects.create(user=self.author, content="Fanned out before")
+        with override_settings(TIMELINE_FANOUT_LIMIT=0):
+            for i in range(3):
+                for user in (self.author, other, self.user):
+                    Post.objects.create(user=user, content=f"Post {i}")
+            for name in ("posts:posts-list", "posts:posts-following"):
+                with override_settings(FEED_MERGE_MIN_FOLLOWING=10**9):
+                    expected = self.walk_feed_ids(name)
+                with override_settings(FEED_MERGE_MIN_FOLLOWING=0):
+                    with CaptureQueriesContext(connection) as queries:
+                        merged = self.walk_feed_ids(name)
+                self.assertEqual(merged, expected)
+                self.assertEqual(len(merged), len(set(merged)))
+                self.assertTrue(
+                    any(
+                        'FROM "posts_timelineentry"' in query["sql"]
+                        and "LIMIT 3" in query["sql"]
+                        for query in queries.captured_queries
+                    )
+                )
+
+    def test_query_feed_reads_timeline_index_range(self):
+        Follower.objects.create(user=self.user, followee=self.author)
+        for i in range(5):
+            Post.objects.create(user=self.author, content=f"Post {i}")
+        expected = list(
+            home_feed(self.user.id)
+            .order_by("-created_at", "-id")
+            .values_list("id", flat=True)
+        )
+        with override_settings(FEED_MERGE_MIN_FOLLOWING=10**9):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.walk_feed_ids(), expected)
+        plans = []
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries:
+                if 'FROM "posts_timelineentry"' in query["sql"]:
+                    cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+                    plans.append(" ".join(row[-1] for row in cursor.fetchall()))
+        self.assertTrue(plans)
+        for plan in plans:
+            self.assertIn("COVERING INDEX timeline_owner_recent_idx", plan)
+            self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_rebuild_timelines_command(self):
+        Follower.objects.create(user=self.user, followee=self.author)
+        post = Post.objects.create(user=self.author, content="Rebuilt")
+        TimelineEntry.objects.all().delete()
+        call_command("rebuild_timelines", stdout=StringIO())
+        self.assertTrue(
+            TimelineEntry.objects.filter(owner=self.user, post=post).exists()
+        )
+
+
+class LikesCountTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="liker@test.com", password="testpass"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.post = Post.objects.create(user=self.user, content="Liked post")
+
+    def test_like_twice_counts_once(self):
+        url = reverse("posts:posts-like", args=[self.post.pk])
+        self.client.post(url)
+        response = self.client.post(url)
+        self.assertEqual(response.data["likes_count"], 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+
+    def test_unlike_not_liked_post_keeps_count(self):
+        self.assertFalse(self.user.unlike_post(self.post))
+        response = self.client.post(reverse("posts:posts-unlike", args=[self.post.pk]))
+        self.assertEqual(response.data["likes_count"], 0)
+
+    def test_reconcile_like_counts(self):
+        self.post.likes.add(self.user)
+        call_command("reconcile_like_counts", stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+
+    def test_user_liked_is_resolved_once_per_page(self):
+        posts = [
+            Post.objects.create(user=self.user, content=f"Post {i}") for i in range(4)
+        ]
+        self.user.like_post(posts[0])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("posts:posts-list"), {"page_size": 5})
+        likes_queries = [
+            query
+            for query in queries.captured_queries
+            if '"posts_post_likes"' in query["sql"]
+        ]
+        self.assertEqual(len(likes_queries), 1)
+        liked = {post["id"]: post["user_liked"] for post in response.data["results"]}
+        self.assertTrue(liked[posts[0].id])
+        self.assertFalse(liked[posts[1].id])
+
+
+@override_settings(POST_COMMENT_PREVIEW_SIZE=2)
+class CommentPreviewTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="commenter@test.com", password="testpass"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.posts = [
+            Post.objects.create(user=self.user, content=f"Post {i}") for i in range(3)
+        ]
+        self.comments = [
+            Comment.objects.create(
+                post=self.posts[0], user=self.user, content=f"Comment {i}"
+            )
+            for i in range(5)
+        ]
+
+    def test_comments_count_follows_create_and_delete(self):
+        self.posts[0].refresh_from_db()
+        self.assertEqual(self.posts[0].comments_count, 5)
+        self.comments[0].delete()
+        self.posts[0].refresh_from_db()
+        self.assertEqual(self.posts[0].comments_count, 4)
+
+    def test_feed_embeds_latest_comments_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("posts:posts-list"), {"page_size": 3})
+        comment_queries = [
+            query
+            for query in queries.captured_queries
+            if 'FROM "posts_comment"' in query["sql"]
+        ]
+        self.assertEqual(len(comment_queries), 1)
+        post = next(p for p in response.data["results"] if p["id"] == self.posts[0].id)
+        self.assertEqual(post["comments_count"], 5)
+        self.assertEqual(
+            [comment["id"] for comment in post["comments"]],
+            [self.comments[4].id, self.comments[3].id],
+        )
+
+    def test_comments_endpoint_is_paginated(self):
+        url = reverse("posts:posts-comments", args=[self.posts[0].pk])
+        response = self.client.get(url, {"page_size": 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 3)
+        response = self.client.get(response.data["next"])
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertIsNone(response.data["next"])
+
+
+class HashtagIndexTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="tagger@test.com", password="testpass"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.art = Post.objects.create(
+            user=self.user, content="Art", hashtags="#Art #travel"
+        )
+        self.artificial = Post.objects.create(
+            user=self.user, content="AI", hashtags="#artificial#travel"
+        )
+
+    def get_ids(self, hashtags):
+        response = self.client.get(
+            reverse("posts:posts-list"), {"hashtags": hashtags, "page_size": 10}
+        )
+        return {post["id"] for post in response.data["results"]}
+
+    def test_hashtags_are_indexed_on_save(self):
+        self.assertEqual(
+            set(self.art.hashtag_links.values_list("hashtag__name", flat=True)),
+            {"art", "travel"},
+        )
+
+    def test_filter_matches_whole_hashtags(self):
+        self.assertEqual(self.get_ids("art"), {self.art.id})
+        self.assertEqual(self.get_ids("travel"), {self.art.id, self.artificial.id})
+
+    def test_filter_intersects_hashtags(self):
+        self.assertEqual(self.get_ids("travel,artificial"), {self.artificial.id})
+        self.assertEqual(self.get_ids("art,artificial"), set())
+
+    def test_edit_updates_index(self):
+        self.art.hashtags = "#nature"
+        self.art.save()
+        self.assertEqual(self.get_ids("art"), set())
+        self.assertEqual(self.get_ids("nature"), {self.art.id})
+
+
+class TrendingHashtagsTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="trender@test.com", password="testpass"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.trending = get_trending_hashtags()
+        self.trending.reset()
+        self.trending.refresh_seconds = 0
+        Post.objects.create(user=self.user, content="Old", hashtags="#travel")
+
+    def tearDown(self):
+        self.trending.reset()
+        self.trending.refresh_seconds = settings.TRENDING_REFRESH_SECONDS
+
+    def get_trending(self):
+        response = self.client.get(reverse("posts:posts-trending-hashtags"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item["hashtag"] for item in response.data]
+
+    def test_trending_counts_created_and_deleted_posts(self):
+        self.assertEqual(self.get_trending(), ["travel"])
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(user=self.user, content="1", hashtags="#art")
+            post = Post.objects.create(user=self.user, content="2", hashtags="#art")
+        self.assertEqual(self.get_trending(), ["art", "travel"])
+        with self.captureOnCommitCallbacks(execute=True):
+            post.delete()
+            Post.objects.filter(hashtags="#travel").delete()
+        self.assertEqual(self.get_trending(), ["art"])
+        # Another process ranks from the same counts
+        other_process = TrendingHashtags(refresh_seconds=0)
+        self.assertEqual([tag for tag, _ in other_process.top(10)], ["art"])
+
+    def test_recent_buckets_weigh_more_and_expire(self):
+        TrendingBucket.objects.all().delete()
+        TrendingScore.objects.all().delete()
+        now = [0.0]
+        trending = TrendingHashtags(
+            bucket_seconds=60,
+            window_buckets=10,
+            half_life_seconds=60,
+            refresh_seconds=0,
+            clock=lambda: now[0],
+        )
+        trending.record(["old", "old"])
+        now[0] = 300
+        trending.record(["new"])
+        self.assertEqual([tag for tag, _ in trending.top(2)], ["new", "old"])
+        now[0] = 1000
+        trending.prune()
+        self.assertEqual(trending.top(10), [])
+        self.assertFalse(TrendingBucket.objects.filter(hashtag="old").exists())
+
+    def test_top_reads_stored_scores_only(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(user=self.user, content="1", hashtags="#art #art")
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(
+                [tag for tag, _ in self.trending.top(10)], ["art", "travel"]
+            )
+        self.assertEqual(len(queries.captured_queries), 1)
+        self.assertIn('FROM "posts_trendingscore"', queries[0]["sql"])
+        self.assertNotIn("GROUP BY", queries[0]["sql"])
+
+    def test_rebuild_command_recounts_window(self):
+        TrendingBucket.objects.all().delete()
+        Post.objects.create(user=self.user, content="New", hashtags="#art #travel")
+        TrendingBucket.objects.filter(hashtag="travel").delete()
+        out = StringIO()
+        call_command("rebuild_trending_hashtags", stdout=out)
+        self.assertIn("Rebuilt 2", out.getvalue())
+        self.assertEqual(self.get_trending(), ["travel", "art"])
+        self.assertEqual(TrendingBucket.objects.get(hashtag="travel").count, 2)
+
+
+class PostSearchTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="searcher@test.com", password="testpass"
+        )
+        self.stranger = get_user_model().objects.create_user(
+            email="stranger@test.com", password="testpass"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.once = Post.objects.create(user=self.user, content="A trip to the alps")
+        self.twice = Post.objects.create(
+            user=self.user, content="Alps, alps and more alps trip"
+        )
+        Post.objects.create(user=self.user, content="Nothing to see here")
+        Post.objects.create(user=self.stranger, content="Private alps trip")
+
+    def search(self, text):
+        response = self.client.get(
+            reverse("posts:posts-list"), {"search": text, "page_size": 1}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [post["id"] for post in response.data["results"]]
+        while response.data["next"]:
+            response = self.client.get(response.data["next"])
+            ids += [post["id"] for post in response.data["results"]]
+        return ids
+
+    def test_search_ranks_visible_posts(self):
+        self.assertEqual(self.search("alps trip"), [self.twice.id, self.once.id])
+
+    def test_search_follows_content_updates(self):
+        self.once.content = "A trip to the sea"
+        self.once.save()
+        self.assertEqual(self.search("alps"), [self.twice.id])
+        self.assertEqual(self.search("sea"), [self.once.id])
+
+    def test_search_ignores_query_syntax(self):
+        self.assertEqual(self.search('alps" OR "nothing'), [])
+
+
+@override_settings(POST_IMAGE_WORKERS=0)
+class PostImageTestCase(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root.name)
+        self.settings_override.enable()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="photographer@test.com", password="testpass"
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.media_root.cleanup()
+
+    def make_photo(self):
+        exif = Image.Exif()
+        exif[0x010F] = "Camera maker"
+        buffer = BytesIO()
+        Image.new("RGB", (2000, 1000), "red").save(buffer, "JPEG", exif=exif)
+        return SimpleUploadedFile("photo.jpg", buffer.getvalue(), "image/jpeg")
+
+    def test_upload_is_processed_into_variants(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("posts:posts-list"),
+                {"content": "Photo", "image": self.make_photo()},
+                format="multipart",
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        post = Post.objects.get(pk=response.data["id"])
+        self.assertEqual((post.image_width, post.image_height), (2000, 1000))
+        with Image.open(post.image_thumbnail.path) as thumbnail:
+            self.assertEqual(thumbnail.size, (150, 75))
+            self.assertEqual(len(thumbnail.getexif()), 0)
+
+        response = self.client.get(reverse("posts:posts-detail", args=[post.pk]))
+        self.assertTrue(response.data["image"].endswith(post.image_feed.url))
+        self.assertEqual(
+            set(response.data["image_variants"]), {"thumbnail", "feed", "full"}
+        )
+
+    def test_replaced_or_removed_image_drops_old_variants(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            post_id = self.client.post(
+                reverse("posts:posts-list"),
+                {"content": "Photo", "image": self.make_photo()},
+                format="multipart",
+            ).data["id"]
+        old_feed = Post.objects.get(pk=post_id).image_feed.path
+        url = reverse("posts:posts-detail", args=[post_id])
+
+        # The replacement is served as uploaded until the pool processes it
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.patch(
+                url, {"image": self.make_photo()}, format="multipart"
+            )
+        self.assertNotIn("/feed/", response.data["image"])
+        self.assertIsNone(response.data["image_variants"])
+        self.assertFalse(os.path.exists(old_feed))
+        for callback in callbacks:
+            callback()
+
+        response = self.client.patch(url, {"image": None}, format="json")
+        self.assertIsNone(response.data["image"])
+        self.assertIsNone(response.data["image_variants"])
+        post = Post.objects.get(pk=post_id)
+        self.assertFalse(post.image_feed)
+        self.assertIsNone(post.image_width)
+
+
+class FeedCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="reader@test.com", password="testpass"
+        )
+        self.author = get_user_model().objects.create_user(
+            email="author@test.com", password="testpass"
+        )
+        Follower.objects.create(user=self.user, followee=self.author)
+        self.post = Post.objects.create(user=self.author, content="First")
+        self.client.force_authenticate(user=self.user)
+
+    def get_feed(self, name="posts:posts-list"):
+        response = self.client.get(reverse(name), {"page_size": 10})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data["results"]
+
+    def test_unchanged_feed_is_served_from_cache(self):
+        self.get_feed()
+        with self.assertNumQueries(0):
+            self.get_feed()
+        self.assertEqual(get_stats()["hits"], 1)
+        self.assertEqual(get_stats()["misses"], 1)
+
+    def test_cached_pages_survive_a_large_working_set(self):
+        self.get_feed()
+        cache.set_many({f"other:{i}": i for i in range(1_000)})
+        with self.assertNumQueries(0):
+            self.get_feed()
+
+    def test_new_post_of_followee_invalidates_feed(self):
+        self.get_feed("posts:posts-following")
+        post = Post.objects.create(user=self.author, content="Second")
+        self.assertEqual(
+            [item["id"] for item in self.get_feed("posts:posts-following")],
+            [post.id, self.post.id],
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_new_post_of_pulled_author_invalidates_feed(self):
+        self.get_feed()
+        post = Post.objects.create(user=self.author, content="Pulled")
+        self.assertEqual(self.get_feed()[0]["id"], post.id)
+
+    def test_like_and_edit_invalidate_feed(self):
+        self.get_feed()
+        self.client.post(reverse("posts:posts-like", args=[self.post.pk]))
+        feed = self.get_feed()
+        self.assertTrue(feed[0]["user_liked"])
+        self.assertEqual(feed[0]["likes_count"], 1)
+
+        self.post.content = "Edited"
+        self.post.save()
+        self.assertEqual(self.get_feed()[0]["content"], "Edited")
+
+    def test_follow_and_unfollow_invalidate_feed(self):
+        self.get_feed()
+        Follower.objects.get(user=self.user, followee=self.author).unfollow()
+        self.assertEqual(self.get_feed(), [])
+
+    def test_stats_are_available_to_staff_only(self):
+        url = reverse("posts:posts-feed-cache-stats")
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+        self.user.is_staff = True
+        self.client.get(reverse("posts:posts-list"))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["misses"], 1)
+
+    def test_concurrent_misses_rebuild_once(self):
+        builds = []
+
+        def build():
+            builds.append(1)
+            time.sleep(0.2)
+            return {"next": None, "results": [{"user": self.author.id}]}
+
+        threads = [
+            threading.Thread(
+                target=get_feed_page,
+                args=(self.user.id, "/api/posts/"),
+                kwargs={"build": build, "pulled_author_ids": list},
+            )
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(builds), 1)
@@ -0,0 +1,198 @@
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import F, Q, QuerySet, Window
+from django.db.models.functions import RowNumber
+
+from follower.graph import get_follow_graph
+from follower.models import Follower
+from .models import Post, TimelineEntry
+
+
+def _chunks(iterable: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def is_pulled_author(user_id: int) -> bool:
+    """
+    Authors followed by more than TIMELINE_FANOUT_LIMIT users are not fanned out,
+    their posts are merged into the readers' feeds at read time instead.
+    """
+    return (
+        get_user_model()
+        .objects.filter(pk=user_id, followers_count__gt=settings.TIMELINE_FANOUT_LIMIT)
+        .exists()
+    )
+
+
+def pulled_followee_ids(user_id: int) -> List[int]:
+    """Return ids of followees of the user whose posts are merged at read time"""
+    graph = get_follow_graph()
+    if graph is not None:
+        return [
+            followee_id
+            for followee_id in graph.followee_ids(user_id)
+            if graph.followers_count(followee_id) > settings.TIMELINE_FANOUT_LIMIT
+        ]
+    return list(
+        Follower.objects.filter(
+            user_id=user_id,
+            followee__followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+        ).values_list("followee_id", flat=True)
+    )
+
+
+def _create_entries(owner_ids: Iterable[int], post: Post) -> None:
+    for chunk in _chunks(owner_ids, settings.TIMELINE_BATCH_SIZE):
+        TimelineEntry.objects.bulk_create(
+            [
+                TimelineEntry(
+                    owner_id=owner_id,
+                    post_id=post.id,
+                    author_id=post.user_id,
+                    created_at=post.created_at,
+                )
+                for owner_id in chunk
+            ],
+            ignore_conflicts=True,
+        )
+
+
+def fan_out_post(post: Post) -> List[int]:
+    """Write a new post into the timelines of its author and followers, return their ids"""
+    owner_ids = [post.user_id]
+    if not is_pulled_author(post.user_id):
+        owner_ids += Follower.objects.filter(followee_id=post.user_id).values_list(
+            "user_id", flat=True
+        )
+    _create_entries(owner_ids, post)
+    return owner_ids
+
+
+def _backfill(owner_id: int, posts: QuerySet) -> None:
+    rows = posts.values_list("id", "user_id", "created_at").iterator(
+        chunk_size=settings.TIMELINE_BATCH_SIZE
+    )
+    for chunk in _chunks(rows, settings.TIMELINE_BATCH_SIZE):
+        TimelineEntry.objects.bulk_create(
+            [
+                TimelineEntry(
+                    owner_id=owner_id,
+                    post_id=post_id,
+                    author_id=author_id,
+                    created_at=created_at,
+                )
+                for post_id, author_id, created_at in chunk
+            ],
+            ignore_conflicts=True,
+        )
+
+
+def backfill_followee(user_id: int, followee_id: int) -> None:
+    """Copy the latest posts of a newly followed user into the user's timeline"""
+    if is_pulled_author(followee_id):
+        return
+    posts = Post.objects.filter(user_id=followee_id).order_by("-created_at", "-id")
+    _backfill(user_id, posts[: settings.TIMELINE_BACKFILL_SIZE])
+
+
+def backfill_followees(user_id: int, followee_ids: List[int]) -> None:
+    """
+    Copy the latest posts of several newly followed users in one pass,
+    up to TIMELINE_BACKFILL_SIZE posts of each of them
+    """
+    pushed_ids = get_user_model().objects.filter(
+        pk__in=followee_ids, followers_count__lte=settings.TIMELINE_FANOUT_LIMIT
+    )
+    posts = (
+        Post.objects.filter(user_id__in=pushed_ids.values("pk"))
+        .annotate(
+            author_rank=Window(
+                RowNumber(),
+                partition_by=F("user_id"),
+                order_by=(F("created_at").desc(), F("id").desc()),
+            )
+        )
+        .filter(author_rank__lte=settings.TIMELINE_BACKFILL_SIZE)
+    )
+    _backfill(user_id, posts)
+
+
+def backfill_followers(author_id: int) -> List[int]:
+    """
+    Copy the latest posts of an author who is fanned out again into the
+    timelines of their followers, return the follower ids
+    """
+    posts = list(
+        Post.objects.filter(user_id=author_id)
+        .order_by("-created_at", "-id")
+        .values_list("id", "created_at")[: settings.TIMELINE_BACKFILL_SIZE]
+    )
+    follower_ids = list(
+        Follower.objects.filter(followee_id=author_id).values_list("user_id", flat=True)
+    )
+    entries = (
+        TimelineEntry(
+            owner_id=owner_id,
+            post_id=post_id,
+            author_id=author_id,
+            created_at=created_at,
+        )
+        for owner_id in follower_ids
+        for post_id, created_at in posts
+    )
+    for chunk in _chunks(entries, settings.TIMELINE_BATCH_SIZE):
+        TimelineEntry.objects.bulk_create(chunk, ignore_conflicts=True)
+    return follower_ids
+
+
+def trim_followees(user_id: int, followee_ids: List[int]) -> None:
+    """Remove posts of several unfollowed users from the user's timeline"""
+    TimelineEntry.objects.filter(owner_id=user_id, author_id__in=followee_ids).delete()
+
+
+def trim_followee(user_id: int, followee_id: int) -> None:
+    """Remove posts of an unfollowed user from the user's timeline"""
+    TimelineEntry.objects.filter(owner_id=user_id, author_id=followee_id).delete()
+
+
+def rebuild_timeline(user_id: int) -> None:
+    """Recreate the timeline of the user from the posts and follower tables"""
+    TimelineEntry.objects.filter(owner_id=user_id).delete()
+    followee_ids = Follower.objects.filter(user_id=user_id).values_list(
+        "followee_id", flat=True
+    )
+    pulled_ids = pulled_followee_ids(user_id)
+    _backfill(user_id, Post.objects.filter(user_id=user_id))
+    _backfill(
+        user_id,
+        Post.objects.filter(user_id__in=followee_ids).exclude(user_id__in=pulled_ids),
+    )
+
+
+def visible_posts(user_id: int) -> QuerySet:
+    """Return posts the user may open: their own and those of their followees"""
+    followee_ids = Follower.objects.filter(user_id=user_id).values("followee_id")
+    return Post.objects.filter(Q(user_id=user_id) | Q(user_id__in=followee_ids))
+
+
+def home_feed(
+    user_id: int, include_own: bool = True, pulled_ids: Optional[List[int]] = None
+) -> QuerySet:
+    """
+    Return posts of the user's home timeline: the materialized entries
+    merged with the posts of followees which are not fanned out.
+    """
+    entries = TimelineEntry.objects.filter(owner_id=user_id)
+    if not include_own:
+        entries = entries.exclude(author_id=user_id)
+    condition = Q(pk__in=entries.values("post_id"))
+    if pulled_ids is None:
+        pulled_ids = pulled_followee_ids(user_id)
+    if pulled_ids:
+        condition |= Q(user_id__in=pulled_ids)
+    return Post.objects.filter(condition)
@@ -0,0 +1,226 @@
+import math
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import F, FloatField, QuerySet, Sum, Value
+from django.db.models.functions import Power
+
+from .models import PostHashtag, TrendingBucket, TrendingScore
+
+
+class TrendingHashtags:
+    """
+    Sliding window of per-bucket hashtag counts stored in the TrendingBucket
+    table, so every process records into and ranks from the same counts.
+
+    A post in bucket b weighs 2 ** ((b - current) / half_life), the score of a
+    hashtag is the weighted sum of its buckets inside the window. Writes keep
+    the TrendingScore of their hashtags up to date, so reading the top K is
+    an index scan of K rows. Buckets leaving the window are dropped, and the
+    other scores refreshed, by `manage.py rebuild_trending_hashtags --prune`.
+    """
+
+    def __init__(
+        self,
+        bucket_seconds: Optional[int] = None,
+        window_buckets: Optional[int] = None,
+        half_life_seconds: Optional[int] = None,
+        max_results: Optional[int] = None,
+        refresh_seconds: Optional[float] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.bucket_seconds = bucket_seconds or settings.TRENDING_BUCKET_SECONDS
+        self.window_buckets = window_buckets or settings.TRENDING_WINDOW_BUCKETS
+        self.half_life = (
+            half_life_seconds or settings.TRENDING_HALF_LIFE_SECONDS
+        ) / self.bucket_seconds
+        self.max_results = max_results or settings.TRENDING_MAX_RESULTS
+        self.refresh_seconds = (
+            settings.TRENDING_REFRESH_SECONDS
+            if refresh_seconds is None
+            else refresh_seconds
+        )
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._top: Optional[List[Tuple[str, float]]] = None
+        self._top_computed_at = 0.0
+
+    def _current_bucket(self) -> int:
+        return int(self.clock() // self.bucket_seconds)
+
+    def _bucket_of(self, at: Optional[datetime]) -> int:
+        if at is None:
+            return self._current_bucket()
+        return int(at.timestamp() // self.bucket_seconds)
+
+    def _first_bucket(self) -> int:
+        return self._current_bucket() - self.window_buckets + 1
+
+    def window_start(self) -> datetime:
+        return datetime.fromtimestamp(
+            self._first_bucket() * self.bucket_seconds, tz=timezone.utc
+        )
+
+    def covers(self, at: datetime) -> bool:
+        """Whether a post created at the given time still counts as trending"""
+        return self._bucket_of(at) >= self._first_bucket()
+
+    def record(
+        self, hashtags: Iterable[str], at: Optional[datetime] = None, delta: int = 1
+    ) -> None:
+        """Count (or with a negative delta, uncount) hashtags of a post created at `at`"""
+        bucket = self._bucket_of(at)
+        if bucket < self._first_bucket():
+            return
+        counts = Counter(hashtags)
+        if not counts:
+            return
+        if delta > 0:
+            self._increment(bucket, counts, delta)
+        else:
+            for hashtag, count in counts.items():
+                TrendingBucket.objects.filter(
+                    hashtag=hashtag, bucket=bucket, count__gt=0
+                ).update(count=F("count") + count * delta)
+        self._score(list(counts))
+        with self._lock:
+            self._top = None
+
+    def _increment(self, bucket: int, counts: Counter, delta: int) -> None:
+        """Add to the bucket counts with one INSERT ... ON CONFLICT DO UPDATE"""
+        db = router.db_for_write(TrendingBucket)
+        connection = connections[db]
+        quote = connection.ops.quote_name
+        table = quote(TrendingBucket._meta.db_table)
+        sql = (
+            f"INSERT INTO {table} ({quote('hashtag')}, {quote('bucket')}, "
+            f"{quote('count')}) VALUES (%s, %s, %s) "
+            f"ON CONFLICT ({quote('hashtag')}, {quote('bucket')}) DO UPDATE "
+            f"SET {quote('count')} = {table}.{quote('count')} + EXCLUDED.{quote('count')}"
+        )
+        with transaction.atomic(using=db), connection.cursor() as cursor:
+            cursor.executemany(
+                sql,
+                [(hashtag, bucket, count * delta) for hashtag, count in counts.items()],
+            )
+
+    def _scores(self, hashtags: Optional[List[str]] = None) -> QuerySet:
+        """Decayed scores of the hashtags, or of all of them, inside the window"""
+        current = self._current_bucket()
+        buckets = TrendingBucket.objects.filter(
+            bucket__gte=self._first_bucket(), bucket__lte=current, count__gt=0
+        )
+        if hashtags is not None:
+            buckets = buckets.filter(hashtag__in=hashtags)
+        weight = Power(
+            Value(2.0),
+            (F("bucket") - Value(current)) / Value(self.half_life),
+            output_field=FloatField(),
+        )
+        return (
+            buckets.values("hashtag")
+            .annotate(score=Sum(F("count") * weight, output_field=FloatField()))
+            .values_list("hashtag", "score")
+        )
+
+    def _score(self, hashtags: List[str]) -> None:
+        """Store the current level of the hashtags, drop those without posts"""
+        offset = self._current_bucket() / self.half_life
+        scores = [
+            TrendingScore(hashtag=hashtag, level=math.log2(score) + offset)
+            for hashtag, score in self._scores(hashtags)
+            if score > 0
+        ]
+        with transaction.atomic(using=router.db_for_write(TrendingScore)):
+            TrendingScore.objects.filter(hashtag__in=hashtags).exclude(
+                hashtag__in=[score.hashtag for score in scores]
+            ).delete()
+            TrendingScore.objects.bulk_create(
+                scores,
+                update_conflicts=True,
+                unique_fields=["hashtag"],
+                update_fields=["level"],
+            )
+
+    def prune(self) -> int:
+        """
+        Delete buckets that left the window and emptied counts, then store the
+        level of every hashtag again. Return the number of deleted buckets.
+        """
+        deleted, _ = TrendingBucket.objects.filter(
+            bucket__lt=self._first_bucket()
+        ).delete()
+        deleted += TrendingBucket.objects.filter(count__lte=0).delete()[0]
+        self._rescore()
+        return deleted
+
+    def _rescore(self) -> None:
+        offset = self._current_bucket() / self.half_life
+        with transaction.atomic(using=router.db_for_write(TrendingScore)):
+            TrendingScore.objects.all().delete()
+            TrendingScore.objects.bulk_create(
+                (
+                    TrendingScore(hashtag=hashtag, level=math.log2(score) + offset)
+                    for hashtag, score in self._scores().iterator()
+                    if score > 0
+                ),
+                batch_size=1_000,
+            )
+        self.reset()
+
+    def top(self, k: int) -> List[Tuple[str, float]]:
+        """Return up to k hashtags with the highest decayed score"""
+        now = self.clock()
+        with self._lock:
+            if self._top is None or now - self._top_computed_at >= self.refresh_seconds:
+                offset = self._current_bucket() / self.half_life
+                self._top = [
+                    (hashtag, 2 ** (level - offset))
+                    for hashtag, level in TrendingScore.objects.order_by(
+                        "-level", "hashtag"
+                    ).values_list("hashtag", "level")[: self.max_results]
+                ]
+                self._top_computed_at = now
+            return self._top[:k]
+
+    def rebuild(self) -> int:
+        """Recount the window from the posting lists, return the number of buckets"""
+        counts = Counter(
+            (name, self._bucket_of(created_at))
+            for name, created_at in PostHashtag.objects.filter(
+                post__created_at__gte=self.window_start()
+            )
+            .values_list("hashtag__name", "post__created_at")
+            .iterator()
+        )
+        with transaction.atomic(using=router.db_for_write(TrendingBucket)):
+            TrendingBucket.objects.all().delete()
+            TrendingBucket.objects.bulk_create(
+                (
+                    TrendingBucket(hashtag=hashtag, bucket=bucket, count=count)
+                    for (hashtag, bucket), count in counts.items()
+                ),
+                batch_size=1_000,
+            )
+            self._rescore()
+        return len(counts)
+
+    def reset(self) -> None:
+        """Drop the cached top hashtags of this process"""
+        with self._lock:
+            self._top = None
+
+
+_trending_hashtags: Optional[TrendingHashtags] = None
+
+
+def get_trending_hashtags() -> TrendingHashtags:
+    global _trending_hashtags
+    if _trending_hashtags is None:
+        _trending_hashtags = TrendingHashtags()
+    return _trending_hashtags
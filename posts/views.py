@@ -1,17 +1,30 @@
 from typing import Any
 
-from django.db.models import Q, QuerySet
+from django.conf import settings
+from django.db.models import Prefetch, QuerySet
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExample
 from rest_framework import viewsets
 from rest_framework.decorators import action
-from rest_framework.pagination import PageNumberPagination
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.response import Response
 
+from pagination.pagination import KeysetPagination
 from permissions.permissions import IsOwnerOrReadOnly
-from .models import Post, Comment
-from .serializers import PostSerializer, PostCreateSerializer, CommentSerializer
+from .cache import get_feed_page, get_stats
+from .feeds import home_feed_candidates
+from .models import Comment, Post
+from .search import search_posts
+from .serializers import (
+    PostSerializer,
+    PostCreateSerializer,
+    CommentSerializer,
+    TrendingHashtagSerializer,
+)
+from .hashtags import filter_by_hashtags
+from .images import clear_post_image_variants, schedule_post_image
+from .timeline import home_feed, pulled_followee_ids, visible_posts
+from .trending import get_trending_hashtags
 
 
 class PostViewSet(viewsets.ModelViewSet):
@@ -19,6 +32,7 @@ class PostViewSet(viewsets.ModelViewSet):
 
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticated, IsOwnerOrReadOnly]
+    pagination_class = KeysetPagination
 
     @extend_schema(
         parameters=[
@@ -39,11 +53,19 @@ class PostViewSet(viewsets.ModelViewSet):
                         value="travel,nature",
                     ),
                 ],
-            )
+            ),
+            OpenApiParameter(
+                name="search",
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                description="Full-text search over post content, best matches first.",
+            ),
         ]
     )
     def list(self, request, *args, **kwargs):
-        return super().list(request, *args, **kwargs)
+        return self.cached_feed_response(
+            lambda: super(PostViewSet, self).list(request, *args, **kwargs)
+        )
 
     @extend_schema(description="Create a new post", tags=["posts"])
     def create(self, request, *args, **kwargs):
@@ -65,43 +87,164 @@ class PostViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         return super().destroy(request, *args, **kwargs)
 
+    def filter_by_search(self, queryset) -> Any:
+        search = self.request.query_params.get("search")
+        if search and not self.detail:
+            queryset = search_posts(queryset, search)
+            self.keyset_ordering = ("search_rank", "-id")
+        return queryset
+
     def filter_by_hashtags(self, queryset) -> Any:
         hashtags = self.request.query_params.get("hashtags")
         if hashtags:
-            hashtags = hashtags.split(",")
-            for hashtag in hashtags:
-                queryset = queryset.filter(hashtags__contains=f"#{hashtag}")
+            queryset = filter_by_hashtags(queryset, hashtags.split(","))
         return queryset
 
     @extend_schema(
         description="Retrieve only posts of users are followed by",
         tags=["posts"],
     )
-    @action(detail=False, pagination_class=PageNumberPagination)
+    @action(detail=False)
     def following(self, request) -> Response:
-        queryset = Post.objects.select_related("user").filter(
-            user__in=self.request.user.user_followees.all()
+        def build() -> Response:
+            queryset = self.get_home_feed(include_own=False)
+            queryset = self.with_comment_preview(queryset.select_related("user"))
+            queryset = self.filter_by_hashtags(queryset)
+            queryset = self.filter_by_search(queryset)
+            page = self.paginate_queryset(queryset)
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        return self.cached_feed_response(build)
+
+    def cached_feed_response(self, build) -> Response:
+        user_id = self.request.user.id
+        data = get_feed_page(
+            user_id,
+            self.request.build_absolute_uri(),
+            build=lambda: build().data,
+            pulled_author_ids=lambda: pulled_followee_ids(user_id),
         )
-        queryset = self.filter_by_hashtags(queryset)
-        paginator = self.pagination_class()
-        queryset = paginator.paginate_queryset(queryset, request)
-        serializer = self.get_serializer(queryset, many=True)
-        return paginator.get_paginated_response(serializer.data)
+        return Response(data)
 
-    def get_queryset(self) -> QuerySet:
-        followees = self.request.user.user_followees.all()
-        queryset = Post.objects.select_related("user").filter(
-            Q(user=self.request.user) | Q(user__in=followees)
+    @extend_schema(
+        description="Retrieve hit and miss counters of the feed cache",
+        tags=["posts"],
+        responses={
+            200: {
+                "type": "object",
+                "properties": {
+                    "hits": {"type": "integer"},
+                    "misses": {"type": "integer"},
+                    "hit_ratio": {"type": "number"},
+                },
+            }
+        },
+    )
+    @action(
+        detail=False,
+        url_path="feed-cache/stats",
+        pagination_class=None,
+        permission_classes=[IsAdminUser],
+    )
+    def feed_cache_stats(self, request) -> Response:
+        return Response(get_stats())
+
+    @extend_schema(
+        description="Retrieve all comments of the post by ID",
+        tags=["posts"],
+        responses={200: CommentSerializer(many=True)},
+    )
+    @action(detail=True)
+    def comments(self, request, pk=None) -> Response:
+        post = self.get_object()
+        queryset = Comment.objects.filter(post_id=post.id)
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @extend_schema(
+        description="Retrieve the hashtags used the most in recent posts",
+        tags=["posts"],
+        parameters=[
+            OpenApiParameter(
+                name="limit",
+                type=OpenApiTypes.INT,
+                location=OpenApiParameter.QUERY,
+                description="Number of hashtags to return.",
+            )
+        ],
+        responses={200: TrendingHashtagSerializer(many=True)},
+    )
+    @action(detail=False, url_path="hashtags/trending", pagination_class=None)
+    def trending_hashtags(self, request) -> Response:
+        try:
+            limit = int(request.query_params.get("limit", 10))
+        except ValueError:
+            limit = 10
+        hashtags = [
+            {"hashtag": hashtag, "score": score}
+            for hashtag, score in get_trending_hashtags().top(max(limit, 1))
+        ]
+        serializer = TrendingHashtagSerializer(hashtags, many=True)
+        return Response(serializer.data)
+
+    @staticmethod
+    def with_comment_preview(queryset) -> QuerySet:
+        latest_comments = Comment.objects.order_by("-created_at", "-id")
+        return queryset.prefetch_related(
+            Prefetch(
+                "comments",
+                queryset=latest_comments[: settings.POST_COMMENT_PREVIEW_SIZE],
+                to_attr="latest_comments",
+            )
+        )
+
+    def get_home_feed(self, include_own: bool = True) -> QuerySet:
+        """Narrow plain feed pages to the candidates of the page being read"""
+        user_id = self.request.user.id
+        params = self.request.query_params
+        if (
+            self.action not in ("list", "following")
+            or params.get("hashtags")
+            or params.get("search")
+        ):
+            return home_feed(user_id, include_own=include_own)
+        return home_feed_candidates(
+            user_id,
+            position=self.paginator.decode_cursor(self.request, Post.objects.all()),
+            limit=self.paginator.get_page_size(self.request) + 1,
+            include_own=include_own,
         )
+
+    def get_queryset(self) -> QuerySet:
+        if self.detail:
+            # Posts older than the materialized timeline stay reachable
+            queryset = visible_posts(self.request.user.id)
+        else:
+            queryset = self.get_home_feed()
+        queryset = queryset.select_related("user")
+        queryset = self.with_comment_preview(queryset)
         queryset = self.filter_by_hashtags(queryset)
+        queryset = self.filter_by_search(queryset)
         return queryset
 
     def perform_create(self, serializer) -> None:
-        serializer.save(user=self.request.user)
+        post = serializer.save(user=self.request.user)
+        schedule_post_image(post)
+
+    def perform_update(self, serializer) -> None:
+        previous_image = serializer.instance.image.name
+        post = serializer.save()
+        if post.image.name != previous_image:
+            clear_post_image_variants(post)
+            schedule_post_image(post)
 
     def get_serializer_class(self):
         if self.action == "create":
             return PostCreateSerializer
+        if self.action == "comments":
+            return CommentSerializer
         return PostSerializer
 
     @extend_schema(
@@ -119,8 +262,7 @@ class PostViewSet(viewsets.ModelViewSet):
     )
     def like(self, request, pk=None):
         post = self.get_object()
-        user = request.user
-        post.likes.add(user)
+        post.add_like(request.user)
         serializer = self.get_serializer(post)
         return Response(serializer.data)
 
@@ -139,8 +281,7 @@ class PostViewSet(viewsets.ModelViewSet):
     )
     def unlike(self, request, pk=None):
         post = self.get_object()
-        user = request.user
-        post.likes.remove(user)
+        post.remove_like(request.user)
         serializer = self.get_serializer(post)
         return Response(serializer.data)
 
@@ -53,14 +53,5 @@ class UserAdmin(BaseUserAdmin):
     search_fields = ("email", "first_name", "last_name", "email")
     ordering = ("-is_staff", "id", "email")
 
-    def followers_count(self, obj):
-        return obj.followers.select_related().count()
-
-    def following_count(self, obj):
-        return obj.followees.prefetch_related().count()
-
-    followers_count.short_description = "Followed by you"
-    following_count.short_description = "Follow you"
-
 
 admin.site.register(User, UserAdmin)
@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .revocation import is_revoked
+
+# User fields signed into every token, a token user is built from them alone
+TOKEN_CLAIM_FIELDS = ("is_staff", "is_superuser", "is_active", "token_version")
+
+
+class TokenVersionCache:
+    """
+    Bounded LRU of (token_version, is_active) per user id. Entries expire after
+    `ttl` seconds, so changes made by other processes are seen within that time.
+    """
+
+    def __init__(self, size: int, ttl: float) -> None:
+        self.size = size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[Tuple[int, bool]]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, state = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return state
+
+    def set(self, user_id: int, state: Tuple[int, bool]) -> None:
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, state)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def forget(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+token_versions = TokenVersionCache(
+    settings.TOKEN_VERSION_CACHE_SIZE, settings.TOKEN_VERSION_CACHE_TTL
+)
+
+
+def get_token_state(user_id: int) -> Optional[Tuple[int, bool]]:
+    """Return (token_version, is_active) of the user, None if there is no such user"""
+    state = token_versions.get(user_id)
+    if state is None:
+        state = (
+            get_user_model()
+            .objects.filter(**{api_settings.USER_ID_FIELD: user_id})
+            .values_list("token_version", "is_active")
+            .first()
+        )
+        if state is not None:
+            token_versions.set(user_id, state)
+    return state
+
+
+def check_token_version(token) -> None:
+    """Reject tokens of deleted or inactive users and revoked tokens"""
+    try:
+        user_id = token[api_settings.USER_ID_CLAIM]
+    except KeyError:
+        raise InvalidToken(_("Token contained no recognizable user identification"))
+    state = get_token_state(user_id)
+    if state is None:
+        raise AuthenticationFailed(_("User not found"), code="user_not_found")
+    version, is_active = state
+    if not is_active:
+        raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+    if token.get("token_version", version) != version or is_revoked(token):
+        raise AuthenticationFailed(_("Token has been revoked"), code="token_revoked")
+
+
+class TokenUserAuthentication(JWTAuthentication):
+    """
+    Authenticate without loading the user: the returned User instance holds
+    the signed claims only and loads its remaining fields on first access.
+    Tokens issued without the claims fall back to loading the user.
+    """
+
+    def get_user(self, validated_token):
+        if "token_version" not in validated_token:
+            if is_revoked(validated_token):
+                raise AuthenticationFailed(
+                    _("Token has been revoked"), code="token_revoked"
+                )
+            return super().get_user(validated_token)
+        check_token_version(validated_token)
+        field_names = [api_settings.USER_ID_FIELD, *TOKEN_CLAIM_FIELDS]
+        values = [validated_token[api_settings.USER_ID_CLAIM]]
+        values += [validated_token[field] for field in TOKEN_CLAIM_FIELDS]
+        user = self.user_model.from_db(
+            router.db_for_read(self.user_model), field_names, values
+        )
+        user.load_deferred_together = True
+        return user
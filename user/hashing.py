@@ -0,0 +1,109 @@
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Optional, Tuple
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import (
+    check_password,
+    get_hasher,
+    identify_hasher,
+    make_password,
+)
+from django.utils.translation import gettext as _
+from rest_framework.exceptions import Throttled
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = 0
+_pending_lock = threading.Lock()
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASHING_WORKERS,
+                initializer=django.setup,
+            )
+    return _executor
+
+
+def verify_password(password: str, encoded: Optional[str]) -> Tuple[bool, bool]:
+    """Return whether the password matches the hash and whether to rehash it"""
+    if encoded is None:
+        # Hash anyway so unknown emails take as long as wrong passwords
+        make_password(password)
+        return False, False
+    if not check_password(password, encoded):
+        return False, False
+    preferred = get_hasher("default")
+    hasher = identify_hasher(encoded)
+    return True, (
+        hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+    )
+
+
+@contextmanager
+def admit():
+    """Reserve a slot for one hash operation, reject the request when none is left"""
+    global _pending
+    with _pending_lock:
+        if _pending >= settings.PASSWORD_HASHING_MAX_PENDING:
+            raise Throttled(
+                wait=settings.PASSWORD_HASHING_RETRY_AFTER,
+                detail=_("Too many sign-ins in progress, try again later."),
+            )
+        _pending += 1
+    try:
+        yield
+    finally:
+        with _pending_lock:
+            _pending -= 1
+
+
+async def run_hashing(function: Callable, *args):
+    """
+    Run a hashing function on the worker pool once admitted. Requests beyond
+    the worker count wait in the pool queue without holding the event loop.
+    """
+    with admit():
+        if not settings.PASSWORD_HASHING_WORKERS:
+            return function(*args)
+        return await asyncio.get_running_loop().run_in_executor(
+            get_executor(), function, *args
+        )
+
+
+async def hash_password(password: str) -> str:
+    return await run_hashing(make_password, password)
+
+
+async def authenticate(email: Optional[str], password: Optional[str]):
+    """
+    Return the active user with the given credentials or None, like
+    ModelBackend does but with the password checked on the worker pool
+    """
+    if email is None or password is None:
+        return None
+    User = get_user_model()
+    user = await User.objects.filter(**{User.USERNAME_FIELD: email}).afirst()
+    encoded = user.password if user is not None else None
+    valid, must_update = await run_hashing(verify_password, password, encoded)
+    if not valid or not user.is_active:
+        return None
+    if must_update:
+        try:
+            upgraded = await hash_password(password)
+        except Throttled:
+            # No hashing slot is free, upgrade on a later login instead
+            return user
+        # Updated in place, a save would bump the token version of the user
+        await User.objects.filter(pk=user.pk, password=encoded).aupdate(
+            password=upgraded
+        )
+    return user
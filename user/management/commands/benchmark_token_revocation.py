@@ -0,0 +1,66 @@
+import os
+import sqlite3
+import tempfile
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+
+from user.revocation import BloomFilter
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure memory and false positive rate of the revocation Bloom filter "
+        "and compare its lookups with an indexed query per request in a "
+        "throwaway SQLite database"
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--revoked", type=int, default=100_000)
+        parser.add_argument("--error-rate", type=float, default=0.001)
+        parser.add_argument("--lookups", type=int, default=100_000)
+
+    def handle(self, *args, **options) -> None:
+        revoked = [uuid.uuid4().hex for _ in range(options["revoked"])]
+        valid = [uuid.uuid4().hex for _ in range(options["lookups"])]
+
+        bloom = BloomFilter(options["revoked"], options["error_rate"])
+        for jti in revoked:
+            bloom.add(jti)
+        self.stdout.write(
+            f"Filter: {bloom.size_bytes / 1024:.0f} KiB, {bloom.hash_count} hashes "
+            f"for {options['revoked']} revoked tokens"
+        )
+
+        started = time.perf_counter()
+        false_positives = sum(jti in bloom for jti in valid)
+        bloom_time = (time.perf_counter() - started) / len(valid)
+        self.stdout.write(
+            f"False positives: {false_positives / len(valid):.4%} "
+            f"(target {options['error_rate']:.4%})"
+        )
+
+        with tempfile.TemporaryDirectory() as directory:
+            db = sqlite3.connect(os.path.join(directory, "bench.sqlite3"))
+            db.execute(
+                "CREATE TABLE user_revokedtoken (id INTEGER PRIMARY KEY, jti TEXT UNIQUE)"
+            )
+            db.executemany(
+                "INSERT INTO user_revokedtoken (jti) VALUES (?)",
+                ((jti,) for jti in revoked),
+            )
+            db.commit()
+            started = time.perf_counter()
+            for jti in valid:
+                db.execute(
+                    "SELECT 1 FROM user_revokedtoken WHERE jti = ? LIMIT 1", (jti,)
+                ).fetchone()
+            query_time = (time.perf_counter() - started) / len(valid)
+            db.close()
+
+        self.stdout.write(f"Indexed query: {query_time * 1e6:.2f} us/request")
+        self.stdout.write(f"Bloom filter:  {bloom_time * 1e6:.2f} us/request")
+        self.stdout.write(
+            self.style.SUCCESS(f"Speedup: {query_time / bloom_time:.1f}x")
+        )
@@ -0,0 +1,155 @@
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_date
+
+from posts.cache import invalidate_authors, invalidate_readers
+from userprofile.models import UserProfile
+
+USER_FIELDS = ("first_name", "last_name")
+
+
+def read_rows(path: str, format: str) -> Iterator[Dict[str, str]]:
+    with open(path, newline="", encoding="utf-8") as file:
+        if format == "csv":
+            yield from csv.DictReader(file)
+        else:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+class Command(BaseCommand):
+    help = (
+        "Create users and their profiles from a CSV or JSONL file with email, "
+        "password, first_name, last_name, bio, location and birthdate columns. "
+        "Passwords are hashed on a process pool and rows are inserted in batches. "
+        "Emails which already exist are skipped, so an interrupted run can be "
+        "restarted with the same file."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=("csv", "jsonl"))
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Hashing processes, 0 hashes in this process",
+        )
+
+    def handle(self, *args, **options) -> None:
+        path = options["path"]
+        format = options["format"] or ("csv" if path.endswith(".csv") else "jsonl")
+        batch_size = options["batch_size"]
+        self.created = self.skipped = self.invalid = 0
+        self.started = time.perf_counter()
+
+        rows = read_rows(path, format)
+        pool = (
+            ProcessPoolExecutor(options["workers"], initializer=django.setup)
+            if options["workers"]
+            else None
+        )
+        try:
+            pending = None
+            while rows_read := list(islice(rows, batch_size)):
+                batch = self.new_rows(rows_read, pending[0] if pending else ())
+                if not batch:
+                    continue
+                passwords = [row.get("password") or None for row in batch]
+                if pool is None:
+                    hashes = map(make_password, passwords)
+                else:
+                    chunk_size = max(len(batch) // options["workers"], 1)
+                    hashes = pool.map(make_password, passwords, chunksize=chunk_size)
+                # The next batch is hashed while the previous one is inserted
+                if pending is not None:
+                    self.insert(*pending)
+                pending = (batch, hashes)
+            if pending is not None:
+                self.insert(*pending)
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {self.created} user(s), skipped {self.skipped} existing "
+                f"and {self.invalid} invalid row(s) at {self.rate():.0f} users/s."
+            )
+        )
+
+    def rate(self) -> float:
+        return self.created / max(time.perf_counter() - self.started, 1e-9)
+
+    def new_rows(self, rows: List[dict], pending: Iterable[dict]) -> List[dict]:
+        """
+        Normalize the emails of a batch, drop rows without an email and rows
+        whose email exists or is in the batch waiting to be inserted
+        """
+        User = get_user_model()
+        by_email = {}
+        taken = {row["email"] for row in pending}
+        for row in rows:
+            email = User.objects.normalize_email((row.get("email") or "").strip())
+            if not email:
+                self.invalid += 1
+            elif email in by_email or email in taken:
+                self.skipped += 1
+            else:
+                by_email[email] = {**row, "email": email}
+        existing = set(
+            User.objects.filter(email__in=by_email).values_list("email", flat=True)
+        )
+        self.skipped += len(existing)
+        return [row for email, row in by_email.items() if email not in existing]
+
+    def insert(self, rows: List[dict], hashes) -> None:
+        User = get_user_model()
+        users = [
+            User(
+                email=row["email"],
+                password=password,
+                **{field: row.get(field) or "" for field in USER_FIELDS},
+            )
+            for row, password in zip(rows, hashes)
+        ]
+        with transaction.atomic():
+            User.objects.bulk_create(users)
+            if any(user.pk is None for user in users):
+                ids = dict(
+                    User.objects.filter(
+                        email__in=[user.email for user in users]
+                    ).values_list("email", "id")
+                )
+                for user in users:
+                    user.pk = ids[user.email]
+            UserProfile.objects.bulk_create(
+                UserProfile(
+                    user=user,
+                    bio=row.get("bio") or "",
+                    location=row.get("location") or "",
+                    birthdate=parse_date(row.get("birthdate") or "") or None,
+                )
+                for user, row in zip(users, rows)
+            )
+            # bulk_create sends no post_save, reset feed cache versions like it
+            user_ids = [user.pk for user in users]
+            invalidate_readers(user_ids)
+            invalidate_authors(user_ids)
+        self.created += len(users)
+        self.stdout.write(f"{self.created} created, {self.rate():.0f} users/s")
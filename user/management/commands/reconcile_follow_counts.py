@@ -0,0 +1,63 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from follower.models import Follower
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the stored User.followers_count and User.following_count "
+        "from the follower table in chunks"
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    @staticmethod
+    def count_by(field, user_ids) -> dict:
+        return dict(
+            Follower.objects.filter(**{f"{field}__in": user_ids})
+            .values(field)
+            .annotate(total=Count("id"))
+            .values_list(field, "total")
+        )
+
+    def handle(self, *args, **options) -> None:
+        User = get_user_model()
+        batch_size = options["batch_size"]
+        last_id, checked, repaired = 0, 0, 0
+
+        while True:
+            with transaction.atomic():
+                users = list(
+                    User.objects.filter(id__gt=last_id)
+                    .order_by("id")
+                    .values_list("id", "followers_count", "following_count")[
+                        :batch_size
+                    ]
+                )
+                if not users:
+                    break
+                last_id = users[-1][0]
+                user_ids = [user_id for user_id, _, _ in users]
+                followers = self.count_by("followee_id", user_ids)
+                following = self.count_by("user_id", user_ids)
+                stale = [
+                    User(
+                        id=user_id,
+                        followers_count=followers.get(user_id, 0),
+                        following_count=following.get(user_id, 0),
+                    )
+                    for user_id, followers_count, following_count in users
+                    if (followers_count, following_count)
+                    != (followers.get(user_id, 0), following.get(user_id, 0))
+                ]
+                User.objects.bulk_update(stale, ["followers_count", "following_count"])
+            checked += len(users)
+            repaired += len(stale)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Checked {checked} user(s), repaired {repaired}.")
+        )
@@ -0,0 +1,46 @@
+# Generated by Django 4.2 on 2026-10-18 09:18
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_follows(apps, schema_editor):
+    User = apps.get_model("user", "User")
+    Follower = apps.get_model("follower", "Follower")
+
+    def total(field):
+        return Coalesce(
+            Subquery(
+                Follower.objects.filter(**{field: OuterRef("pk")})
+                .values(field)
+                .annotate(total=Count("id"))
+                .values("total")
+            ),
+            0,
+        )
+
+    User.objects.update(
+        followers_count=total("followee_id"), following_count=total("user_id")
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("user", "0009_user_followees"),
+        ("follower", "0004_alter_follower_followee_alter_follower_user"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="followers_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="following_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_follows, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from django.contrib.auth.models import (
     AbstractUser,
     BaseUserManager,
@@ -5,6 +7,8 @@ from django.contrib.auth.models import (
 from django.db import models
 from django.utils.translation import gettext as _
 
+TOKEN_STATE_FIELDS = ("is_staff", "is_superuser", "is_active", "password")
+
 
 class UserManager(BaseUserManager):
     """Define a model manager for User model with no username field."""
@@ -60,6 +64,11 @@ class User(AbstractUser):
         related_name="user_followees",
     )
 
+    followers_count = models.PositiveIntegerField(default=0, editable=False)
+    following_count = models.PositiveIntegerField(default=0, editable=False)
+    # Bumped when a signed claim or the password changes, revoking issued tokens
+    token_version = models.PositiveIntegerField(default=0, editable=False)
+
     username = None
     email = models.EmailField(_("email address"), unique=True)
 
@@ -68,20 +77,66 @@ class User(AbstractUser):
 
     objects = UserManager()
 
+    # Set on token-backed users, see user.authentication
+    load_deferred_together = False
+
     def __str__(self) -> str:
         return self.email
 
+    def get_token_state(self) -> Optional[tuple]:
+        """Values whose change revokes the tokens of the user, None if deferred"""
+        if self.get_deferred_fields() & set(TOKEN_STATE_FIELDS):
+            return None
+        return tuple(getattr(self, field) for field in TOKEN_STATE_FIELDS)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_token_state = instance.get_token_state()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None) -> None:
+        deferred = self.get_deferred_fields()
+        if self.load_deferred_together and fields and set(fields) <= deferred:
+            fields = deferred
+        super().refresh_from_db(using, fields)
+        if fields and set(fields) & set(TOKEN_STATE_FIELDS):
+            self._loaded_token_state = self.get_token_state()
+
+    def save(self, *args, **kwargs) -> None:
+        loaded = getattr(self, "_loaded_token_state", None)
+        if loaded is not None and loaded != self.get_token_state():
+            self.token_version += 1
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "token_version"}
+        super().save(*args, **kwargs)
+        self._loaded_token_state = self.get_token_state()
+
     def get_full_name(self) -> str:
         return f"{self.first_name} {self.last_name}"
 
-    def like_post(self, post):
-        post.likes.add(self)
+    def like_post(self, post) -> bool:
+        return post.add_like(self)
 
-    def unlike_post(self, post):
-        post.likes.remove(self)
+    def unlike_post(self, post) -> bool:
+        return post.remove_like(self)
 
     def has_liked_post(self, post):
         return post.likes.filter(pk=self.pk).exists()
 
     class Meta:
         ordering = ["is_staff", "id"]
+
+
+class RevokedToken(models.Model):
+    """JWT revoked before its expiry, rows may be pruned once expired"""
+
+    jti = models.CharField(max_length=255, unique=True)
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="revoked_tokens"
+    )
+    expires_at = models.DateTimeField()
+    revoked_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self) -> str:
+        return f"{self.jti} of {self.user_id}"
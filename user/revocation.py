@@ -0,0 +1,141 @@
+import math
+import threading
+import time
+from datetime import timedelta
+from hashlib import blake2b
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .models import RevokedToken
+
+# Revocations committed up to this long after their revoked_at are still seen
+REFRESH_OVERLAP = timedelta(minutes=1)
+
+
+class BloomFilter:
+    """
+    Bit array with k hash positions per key, sized for `capacity` keys at the
+    given false positive rate. Positions come from double hashing of one digest.
+    """
+
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        capacity = max(capacity, 1)
+        self.size = max(
+            8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.capacity = capacity
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self.bits)
+
+    def _positions(self, key: str) -> Iterable[int]:
+        digest = blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, key: str) -> None:
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+
+class RevocationList:
+    """
+    Process-local Bloom filter over the revoked token table. A miss clears the
+    token without a query, only filter hits are checked against the table.
+    """
+
+    def __init__(self) -> None:
+        self.filter: Optional[BloomFilter] = None
+        self.refreshed_at = None
+        self.checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def rebuild(self) -> None:
+        """Load the unexpired revocations into a filter sized for them"""
+        now = timezone.now()
+        jtis = RevokedToken.objects.filter(expires_at__gt=now).values_list(
+            "jti", flat=True
+        )
+        count = jtis.count()
+        bloom = BloomFilter(
+            max(settings.TOKEN_REVOCATION_CAPACITY, count * 2),
+            settings.TOKEN_REVOCATION_ERROR_RATE,
+        )
+        for jti in jtis.iterator(chunk_size=10_000):
+            bloom.add(jti)
+        self.filter, self.refreshed_at = bloom, now
+        self.checked_at = time.monotonic()
+
+    def refresh(self) -> None:
+        """Add revocations made by other processes since the last refresh"""
+        now = timezone.now()
+        for jti in RevokedToken.objects.filter(
+            revoked_at__gte=self.refreshed_at - REFRESH_OVERLAP
+        ).values_list("jti", flat=True):
+            self.filter.add(jti)
+        self.refreshed_at = now
+        self.checked_at = time.monotonic()
+        if self.filter.count > self.filter.capacity:
+            self.rebuild()
+
+    def get_filter(self) -> BloomFilter:
+        with self._lock:
+            if self.filter is None:
+                self.rebuild()
+            elif (
+                time.monotonic() - self.checked_at
+                > settings.TOKEN_REVOCATION_REFRESH_SECONDS
+            ):
+                self.refresh()
+            return self.filter
+
+    def is_revoked(self, jti: str) -> bool:
+        if jti not in self.get_filter():
+            return False
+        return RevokedToken.objects.filter(jti=jti).exists()
+
+    def add(self, jti: str) -> None:
+        self.get_filter().add(jti)
+
+
+_revocation_list = RevocationList()
+
+
+def get_revocation_list() -> RevocationList:
+    return _revocation_list
+
+
+def reset_revocation_list() -> None:
+    global _revocation_list
+    _revocation_list = RevocationList()
+
+
+def is_revoked(token) -> bool:
+    jti = token.get(api_settings.JTI_CLAIM)
+    return jti is not None and _revocation_list.is_revoked(jti)
+
+
+def revoke(token, user_id: int) -> None:
+    """Store the token as revoked until it expires"""
+    jti = token[api_settings.JTI_CLAIM]
+    RevokedToken.objects.get_or_create(
+        jti=jti,
+        defaults={"user_id": user_id, "expires_at": datetime_from_epoch(token["exp"])},
+    )
+    _revocation_list.add(jti)
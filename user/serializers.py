@@ -1,13 +1,115 @@
+from typing import Dict, Iterable, List, Optional, Set
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from rest_framework import serializers
+from django.contrib.auth.models import update_last_login
+from django.db import models
+from django.db.models import Prefetch, prefetch_related_objects
+from drf_spectacular.utils import extend_schema_field
+from rest_framework import exceptions, serializers
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer,
+    TokenVerifySerializer,
+)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken, UntypedToken
 
+from follower.models import Follower
+from follower.relationships import get_relationships
+from user.authentication import TOKEN_CLAIM_FIELDS, check_token_version
 from userprofile.serializers import UserProfileSerializer
 
 
-class UserSerializer(serializers.ModelSerializer):
+def relationships_of(request, user_ids: Iterable[int]) -> Dict[int, int]:
+    """Return relationship bitmaps of the requesting user with the given users"""
+    if request is None or not request.user.is_authenticated:
+        return {}
+    return get_relationships(request.user.id, user_ids)
+
+
+def query_param_set(request, name: str) -> Set[str]:
+    """Comma-separated values of a query parameter of a read request"""
+    if request is None or request.method not in SAFE_METHODS:
+        return set()
+    return {value for value in request.query_params.get(name, "").split(",") if value}
+
+
+def follow_previews(expand: Iterable[str]) -> List[Prefetch]:
+    """Prefetch the latest follows of every user, capped per user by a window"""
+    size = settings.USER_FOLLOW_PREVIEW_SIZE
+    recent = Follower.objects.order_by("-followed_at", "-id")
+    previews = {
+        "following": Prefetch(
+            "following_set",
+            queryset=recent.select_related("followee")[:size],
+            to_attr="following_preview",
+        ),
+        "followers": Prefetch(
+            "followers_set",
+            queryset=recent.select_related("user")[:size],
+            to_attr="followers_preview",
+        ),
+    }
+    return [previews[name] for name in expand if name in previews]
+
+
+class RelationshipMixin:
+    def get_relationship(self, obj) -> int:
+        """Bitmap of 1 (you follow the user) and 2 (the user follows you)"""
+        relationships = self.context.get("relationships")
+        if relationships is None:
+            relationships = relationships_of(self.context.get("request"), [obj.pk])
+        return relationships.get(obj.pk, 0)
+
+
+class UserListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        users = list(data.all() if isinstance(data, models.Manager) else data)
+        expand = query_param_set(self.context.get("request"), "expand")
+        prefetch_related_objects(users, "userprofile", *follow_previews(expand))
+        if "relationship" in self.child.fields:
+            self.context["relationships"] = relationships_of(
+                self.context.get("request"), [user.pk for user in users]
+            )
+        return super().to_representation(users)
+
+
+class SparseFieldsMixin:
+    """
+    Limit the representation to the fields named in `?fields=`, and include the
+    optional `Meta.expandable_fields` only when they are named in `?expand=`
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+        expand = query_param_set(request, "expand")
+        only = query_param_set(request, "fields")
+        for name in list(self.fields):
+            if name in self.Meta.expandable_fields:
+                keep = name in expand
+            else:
+                keep = not only or name in only
+            if not keep:
+                self.fields.pop(name)
+
+
+class UserPreviewSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = get_user_model()
+        fields = ("id", "email")
+
+
+class UserSerializer(SparseFieldsMixin, RelationshipMixin, serializers.ModelSerializer):
+    """User with follow counts, and the latest follows when expanded"""
+
     following = serializers.SerializerMethodField()
     followers = serializers.SerializerMethodField()
     profile = UserProfileSerializer(source="userprofile", read_only=True)
+    relationship = serializers.SerializerMethodField()
 
     class Meta:
         model = get_user_model()
@@ -20,14 +122,32 @@ class UserSerializer(serializers.ModelSerializer):
             "is_staff",
             "following",
             "followers",
+            "following_count",
+            "followers_count",
+            "relationship",
             "profile",
         )
-        read_only_fields = ("is_staff", "following", "followers")
+        expandable_fields = ("following", "followers")
+        list_serializer_class = UserListSerializer
+        read_only_fields = (
+            "is_staff",
+            "following_count",
+            "followers_count",
+        )
         extra_kwargs = {"password": {"write_only": True, "min_length": 5}}
 
     def create(self, validated_data):
-        """Create a new user with encrypted password and return it"""
-        return get_user_model().objects.create_user(**validated_data)
+        """
+        Create a new user with encrypted password and return it, a password
+        hashed beforehand is passed as `encoded_password` and stored as is
+        """
+        encoded_password = validated_data.pop("encoded_password", None)
+        manager = get_user_model().objects
+        if encoded_password is None:
+            return manager.create_user(**validated_data)
+        validated_data["email"] = manager.normalize_email(validated_data["email"])
+        validated_data["password"] = encoded_password
+        return manager.create(**validated_data)
 
     def update(self, instance, validated_data):
         """Update a user, set the password correctly and return it"""
@@ -39,10 +159,141 @@ class UserSerializer(serializers.ModelSerializer):
 
         return user
 
+    @extend_schema_field(UserPreviewSerializer(many=True))
     def get_following(self, obj):
-        """Get a list of users the current user is following"""
-        return obj.followees.all().values_list("email", flat=True)
+        """Latest users the user is following, see follow_previews"""
+        follows = getattr(obj, "following_preview", None)
+        if follows is None:
+            follows = obj.following_set.select_related("followee").order_by(
+                "-followed_at", "-id"
+            )[: settings.USER_FOLLOW_PREVIEW_SIZE]
+        return UserPreviewSerializer(
+            [follow.followee for follow in follows], many=True
+        ).data
 
+    @extend_schema_field(UserPreviewSerializer(many=True))
     def get_followers(self, obj):
-        """Get a list of users following the current user"""
-        return obj.followers.all().values_list("email", flat=True)
+        """Latest users following the user, see follow_previews"""
+        follows = getattr(obj, "followers_preview", None)
+        if follows is None:
+            follows = obj.followers_set.select_related("user").order_by(
+                "-followed_at", "-id"
+            )[: settings.USER_FOLLOW_PREVIEW_SIZE]
+        return UserPreviewSerializer(
+            [follow.user for follow in follows], many=True
+        ).data
+
+
+class UserSummarySerializer(RelationshipMixin, serializers.ModelSerializer):
+    """Fixed-size representation of a user for follower and following lists"""
+
+    avatar = serializers.SerializerMethodField()
+    relationship = serializers.SerializerMethodField()
+
+    class Meta:
+        model = get_user_model()
+        fields = (
+            "id",
+            "email",
+            "first_name",
+            "last_name",
+            "avatar",
+            "followers_count",
+            "following_count",
+            "relationship",
+        )
+
+    def get_avatar(self, obj) -> Optional[str]:
+        profile = getattr(obj, "userprofile", None)
+        if profile is None or not profile.profile_picture:
+            return None
+        request = self.context.get("request")
+        url = profile.profile_picture.url
+        return request.build_absolute_uri(url) if request else url
+
+
+class FollowListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        follows = list(data.all() if isinstance(data, models.Manager) else data)
+        source = self.child.fields["user"].source
+        self.context["relationships"] = relationships_of(
+            self.context.get("request"),
+            [getattr(follow, f"{source}_id") for follow in follows],
+        )
+        return super().to_representation(follows)
+
+
+class FollowerUserSerializer(serializers.ModelSerializer):
+    user = UserSummarySerializer(read_only=True)
+
+    class Meta:
+        model = Follower
+        fields = ("user", "followed_at")
+        list_serializer_class = FollowListSerializer
+
+
+class FollowingUserSerializer(serializers.ModelSerializer):
+    user = UserSummarySerializer(source="followee", read_only=True)
+
+    class Meta:
+        model = Follower
+        fields = ("user", "followed_at")
+        list_serializer_class = FollowListSerializer
+
+
+class TokenClaimsObtainPairSerializer(TokenObtainPairSerializer):
+    """Sign the claims the token-backed user is built from into the tokens"""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        for field in TOKEN_CLAIM_FIELDS:
+            token[field] = getattr(user, field)
+        return token
+
+    def validate(self, attrs):
+        if "authenticated_user" not in self.context:
+            return super().validate(attrs)
+        # The credentials were checked by the view, see user.hashing.authenticate
+        self.user = self.context["authenticated_user"]
+        if not api_settings.USER_AUTHENTICATION_RULE(self.user):
+            raise exceptions.AuthenticationFailed(
+                self.error_messages["no_active_account"], "no_active_account"
+            )
+        refresh = self.get_token(self.user)
+        if api_settings.UPDATE_LAST_LOGIN:
+            update_last_login(None, self.user)
+        return {"refresh": str(refresh), "access": str(refresh.access_token)}
+
+
+class TokenVersionRefreshSerializer(TokenRefreshSerializer):
+    """Refuse to refresh tokens revoked by a token version bump"""
+
+    def validate(self, attrs):
+        check_token_version(self.token_class(attrs["refresh"]))
+        return super().validate(attrs)
+
+
+class TokenVersionVerifySerializer(TokenVerifySerializer):
+    """Report revoked tokens and tokens of a former token version as invalid"""
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        check_token_version(UntypedToken(attrs["token"]))
+        return data
+
+
+class TokenRevokeSerializer(serializers.Serializer):
+    refresh = serializers.CharField(
+        required=False, help_text="Refresh token to revoke along with the access token"
+    )
+
+    def validate_refresh(self, value: str):
+        try:
+            refresh = RefreshToken(value)
+        except TokenError as error:
+            raise serializers.ValidationError(error.args[0])
+        user_id = self.context["request"].user.id
+        if refresh.get(api_settings.USER_ID_CLAIM) != user_id:
+            raise serializers.ValidationError("Token belongs to another user.")
+        return refresh
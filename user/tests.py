@@ -1,9 +1,31 @@
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
+from rest_framework.exceptions import Throttled
 from rest_framework.test import APITestCase
-from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 
-from user.models import User
+from follower.models import Follower
+from pagination.pagination import KeysetPagination
+from user.authentication import token_versions
+from user.models import RevokedToken, User
+from user.revocation import (
+    BloomFilter,
+    get_revocation_list,
+    reset_revocation_list,
+)
 
 
 class UserViewsTestCase(APITestCase):
@@ -55,3 +77,356 @@ class UserViewsTestCase(APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data["results"]), 0)
+
+    def test_follow_lists_reject_tampered_cursor(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        paginator = KeysetPagination()
+        for values in (["abc", 1], [None, None], ["2020-01-01T00:00:00", "zz"]):
+            for name in ("user:user_followers", "user:user_following"):
+                with self.subTest(values=values, url=name):
+                    response = self.client.get(
+                        reverse(name), {"cursor": paginator.encode_cursor(values)}
+                    )
+                    self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_shows_relationships_in_batch(self):
+        fans = [
+            User.objects.create_user(email=f"fan{i}@example.com", password="pass")
+            for i in range(2)
+        ]
+        for fan in fans:
+            Follower.objects.create(user=fan, followee=self.user)
+        Follower.objects.create(user=self.user, followee=fans[0])
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        response = self.client.get(reverse("user:user_followers"))
+        self.assertEqual(
+            {
+                item["user"]["id"]: item["user"]["relationship"]
+                for item in response.data["results"]
+            },
+            {fans[0].id: 3, fans[1].id: 2},
+        )
+
+    @override_settings(TOKEN_REVOCATION_REFRESH_SECONDS=3600)
+    def test_follow_lists_are_paginated_by_followed_at(self):
+        followees = [
+            User.objects.create_user(email=f"star{i}@example.com", password="pass")
+            for i in range(5)
+        ]
+        for followee in followees:
+            Follower.objects.create(user=self.user, followee=followee)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        get_revocation_list().get_filter()
+
+        url, seen, query_counts = reverse("user:user_following"), [], []
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            query_counts.append(len(queries))
+            seen += [item["user"]["id"] for item in response.data["results"]]
+            self.assertNotIn("followers", response.data["results"][0]["user"])
+            url = response.data["next"]
+        self.assertEqual(seen, [followee.id for followee in reversed(followees)])
+        self.assertEqual(len(set(query_counts[:-1])), 1)
+
+    def test_reconcile_follow_counts(self):
+        other = User.objects.create_user(
+            email="other@example.com", password="testpassword"
+        )
+        Follower.objects.create(user=self.user, followee=other)
+        User.objects.update(followers_count=7, following_count=7)
+        out = StringIO()
+        call_command("reconcile_follow_counts", "--batch-size", "1", stdout=out)
+        self.assertIn("repaired 2", out.getvalue())
+        self.user.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.user.followers_count, self.user.following_count), (0, 1))
+        self.assertEqual((other.followers_count, other.following_count), (1, 0))
+
+
+@override_settings(TOKEN_REVOCATION_REFRESH_SECONDS=3600)
+class TokenUserAuthenticationTestCase(APITestCase):
+    def setUp(self) -> None:
+        token_versions.clear()
+        self.user = User.objects.create_user(
+            email="claims@example.com", password="testpassword"
+        )
+        response = self.client.post(
+            reverse("user:token_obtain_pair"),
+            {"email": "claims@example.com", "password": "testpassword"},
+        )
+        self.access = response.data["access"]
+        self.refresh = response.data["refresh"]
+
+    def count_queries(self, token: str) -> int:
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.client.get(reverse("user:user_following"))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("user:user_following"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries)
+
+    def test_claims_skip_user_query(self):
+        legacy = self.count_queries(str(AccessToken.for_user(self.user)))
+        self.assertEqual(self.count_queries(self.access), legacy - 1)
+
+    def test_model_fields_load_on_access(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access}")
+        response = self.client.patch(reverse("user:manage"), {"first_name": "Ann"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["email"], "claims@example.com")
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, "Ann")
+        self.assertEqual(self.user.token_version, 0)
+
+    def test_password_change_revokes_tokens(self):
+        self.user.set_password("newpassword")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(self.user.token_version, 1)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access}")
+        response = self.client.get(reverse("user:manage"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.data["code"], "token_revoked")
+        response = self.client.post(
+            reverse("user:token_refresh"), {"refresh": self.refresh}
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_claim_change_bumps_version_on_partial_save(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.is_staff = True
+        user.save(update_fields=["is_staff"])
+        user.refresh_from_db()
+        self.assertEqual(user.token_version, 1)
+
+
+class TokenRevocationTestCase(APITestCase):
+    def setUp(self) -> None:
+        token_versions.clear()
+        reset_revocation_list()
+        self.user = User.objects.create_user(
+            email="revoke@example.com", password="testpassword"
+        )
+        response = self.client.post(
+            reverse("user:token_obtain_pair"),
+            {"email": "revoke@example.com", "password": "testpassword"},
+        )
+        self.access = response.data["access"]
+        self.refresh = response.data["refresh"]
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access}")
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(1000, 0.01)
+        for i in range(1000):
+            bloom.add(f"revoked-{i}")
+        self.assertTrue(all(f"revoked-{i}" in bloom for i in range(1000)))
+        false_positives = sum(f"valid-{i}" in bloom for i in range(10_000))
+        self.assertLess(false_positives, 300)
+
+    def test_revoke_access_and_refresh_tokens(self):
+        response = self.client.post(
+            reverse("user:token_revoke"), {"refresh": self.refresh}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(RevokedToken.objects.filter(user=self.user).count(), 2)
+
+        response = self.client.get(reverse("user:user_following"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.data["code"], "token_revoked")
+        response = self.client.post(
+            reverse("user:token_refresh"), {"refresh": self.refresh}
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_verify_reports_revoked_tokens(self):
+        url = reverse("user:token_verify")
+        response = self.client.post(url, {"token": self.access})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.post(reverse("user:token_revoke"))
+        response = self.client.post(url, {"token": self.access})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.data["code"], "token_revoked")
+
+    def test_cannot_revoke_refresh_token_of_another_user(self):
+        other = User.objects.create_user(email="other@example.com", password="pass")
+        response = self.client.post(
+            reverse("user:token_revoke"), {"refresh": str(RefreshToken.for_user(other))}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(RevokedToken.objects.exists())
+
+    @override_settings(TOKEN_REVOCATION_REFRESH_SECONDS=3600)
+    def test_valid_token_is_cleared_without_query(self):
+        self.client.get(reverse("user:user_following"))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("user:user_following"))
+        for query in queries.captured_queries:
+            self.assertNotIn("user_revokedtoken", query["sql"])
+
+    @override_settings(TOKEN_REVOCATION_REFRESH_SECONDS=0)
+    def test_revocations_of_other_processes_are_picked_up(self):
+        self.client.get(reverse("user:user_following"))
+        token = AccessToken(self.access)
+        RevokedToken.objects.create(
+            jti=token["jti"],
+            user=self.user,
+            expires_at=timezone.now() + timedelta(hours=1),
+        )
+        response = self.client.get(reverse("user:user_following"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_prune_revoked_tokens(self):
+        RevokedToken.objects.create(
+            jti="expired", user=self.user, expires_at=timezone.now()
+        )
+        out = StringIO()
+        call_command("prune_revoked_tokens", stdout=out)
+        self.assertIn("Deleted 1", out.getvalue())
+
+
+@override_settings(USER_FOLLOW_PREVIEW_SIZE=2)
+class UserSerializerFieldsTestCase(APITestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(
+            email="fields@example.com", password="testpassword"
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def add_follows(self, count: int) -> None:
+        for i in range(count):
+            other = User.objects.create_user(
+                email=f"mutual{count}-{i}@example.com", password="pass"
+            )
+            Follower.objects.create(user=self.user, followee=other)
+            Follower.objects.create(user=other, followee=self.user)
+
+    def get_me(self, params: dict):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("user:manage"), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data, len(queries)
+
+    def test_fields_limit_representation(self):
+        data, _ = self.get_me({"fields": "id,email,followers_count"})
+        self.assertEqual(set(data), {"id", "email", "followers_count"})
+
+    def test_relationship_lists_are_not_included_by_default(self):
+        self.add_follows(1)
+        data, _ = self.get_me({})
+        self.assertNotIn("following", data)
+        self.assertNotIn("followers", data)
+        self.assertEqual((data["following_count"], data["followers_count"]), (1, 1))
+
+    def test_expanded_previews_are_capped_with_fixed_queries(self):
+        self.add_follows(1)
+        _, small = self.get_me({"expand": "following,followers"})
+        self.add_follows(4)
+        data, large = self.get_me({"expand": "following,followers"})
+        self.assertEqual(large, small)
+        self.assertEqual(len(data["following"]), 2)
+        self.assertEqual(data["followers"][0]["email"], "mutual4-3@example.com")
+
+
+class ProvisionUsersTestCase(APITestCase):
+    def setUp(self) -> None:
+        User.objects.create_user(email="existing@example.com", password="pass")
+        file = tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False)
+        self.addCleanup(os.remove, file.name)
+        with file:
+            for row in (
+                {"email": "new@Example.com", "password": "secret", "bio": "Hi"},
+                {"email": "existing@example.com", "password": "other"},
+                {"email": "", "password": "missing"},
+                {"email": "late@example.com", "password": "secret2"},
+                {"email": "new@example.com", "password": "duplicate"},
+            ):
+                file.write(json.dumps(row) + "\n")
+        self.path = file.name
+
+    def provision(self) -> str:
+        out = StringIO()
+        call_command(
+            "provision_users",
+            self.path,
+            "--workers",
+            "0",
+            "--batch-size",
+            "2",
+            stdout=out,
+        )
+        return out.getvalue()
+
+    def test_provision_creates_users_with_profiles(self):
+        output = self.provision()
+        self.assertIn("Created 2 user(s), skipped 2 existing and 1 invalid", output)
+        user = User.objects.get(email="new@example.com")
+        self.assertTrue(user.check_password("secret"))
+        self.assertEqual(user.userprofile.bio, "Hi")
+
+    def test_provision_rerun_skips_created_users(self):
+        self.provision()
+        output = self.provision()
+        self.assertIn("Created 0 user(s), skipped 4 existing", output)
+        self.assertEqual(User.objects.count(), 3)
+
+
+class PasswordHashingTestCase(APITestCase):
+    def login(self, email: str, password: str):
+        return self.client.post(
+            reverse("user:token_obtain_pair"), {"email": email, "password": password}
+        )
+
+    def test_register_and_login(self):
+        response = self.client.post(
+            reverse("user:create"),
+            {"email": "Pool@Example.com", "password": "poolpassword"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(
+            User.objects.get(email="Pool@example.com").check_password("poolpassword")
+        )
+        response = self.login("Pool@example.com", "poolpassword")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("access", response.data)
+
+    def test_wrong_credentials_are_rejected(self):
+        User.objects.create_user(email="pool@example.com", password="poolpassword")
+        for email, password in (
+            ("pool@example.com", "wrongpassword"),
+            ("missing@example.com", "poolpassword"),
+        ):
+            response = self.login(email, password)
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_outdated_hash_is_upgraded_without_revoking_tokens(self):
+        user = User.objects.create(
+            email="pool@example.com",
+            password=make_password("poolpassword", hasher="pbkdf2_sha1"),
+        )
+        response = self.login("pool@example.com", "poolpassword")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        upgraded = User.objects.get(pk=user.pk)
+        self.assertTrue(upgraded.password.startswith("pbkdf2_sha256$"))
+        self.assertEqual(upgraded.token_version, user.token_version)
+
+    def test_upgrade_is_skipped_when_no_hashing_slot_is_free(self):
+        encoded = make_password("poolpassword", hasher="pbkdf2_sha1")
+        user = User.objects.create(email="pool@example.com", password=encoded)
+        with mock.patch("user.hashing.hash_password", side_effect=Throttled()):
+            response = self.login("pool@example.com", "poolpassword")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(User.objects.get(pk=user.pk).password, encoded)
+
+    def test_malformed_credentials_are_rejected(self):
+        for data in ([], {"email": {}, "password": "x"}, {"email": "a@b.com"}):
+            response = self.client.post(
+                reverse("user:token_obtain_pair"), data, format="json"
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(PASSWORD_HASHING_MAX_PENDING=0)
+    def test_sign_ins_beyond_the_hashing_queue_are_rejected(self):
+        response = self.login("pool@example.com", "poolpassword")
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response["Retry-After"], "1")
@@ -1,13 +1,11 @@
 from django.urls import path
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView,
-    TokenVerifyView,
-)
+from rest_framework_simplejwt.views import TokenRefreshView, TokenVerifyView
 
 from user.views import (
     CreateUserView,
     ManageUserView,
+    RevokeTokenView,
+    TokenObtainPairView,
     UserFollowingView,
     UserFollowersView,
 )
@@ -19,6 +17,7 @@ urlpatterns = [
     path("token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path("token/verify/", TokenVerifyView.as_view(), name="token_verify"),
+    path("token/revoke/", RevokeTokenView.as_view(), name="token_revoke"),
     path("me/", ManageUserView.as_view(), name="manage"),
     path("following/", UserFollowingView.as_view(), name="user_following"),
     path("followers/", UserFollowersView.as_view(), name="user_followers"),
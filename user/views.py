@@ -1,19 +1,109 @@
+import asyncio
 from typing import Any
 
-from rest_framework import generics
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, extend_schema
+from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.authentication import JWTAuthentication
-
-from user.serializers import UserSerializer
-
+from rest_framework.response import Response
+from rest_framework_simplejwt import views as jwt_views
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from follower.models import Follower
+from pagination.pagination import KeysetPagination
+from user.authentication import TokenUserAuthentication
+from user.hashing import authenticate, hash_password
+from user.revocation import revoke
+from user.serializers import (
+    UserSerializer,
+    FollowerUserSerializer,
+    FollowingUserSerializer,
+    TokenRevokeSerializer,
+    follow_previews,
+    query_param_set,
+)
+
+
+class AsyncDispatchMixin:
+    """
+    Dispatch requests to async handlers on the event loop, while the
+    authentication, permission and throttling checks run in a thread
+    """
 
-class CreateUserView(generics.CreateAPIView):
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            method = request.method.lower()
+            if method in self.http_method_names:
+                handler = getattr(self, method, self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+class CreateUserView(AsyncDispatchMixin, generics.CreateAPIView):
     """
     Create a new user
     """
 
     serializer_class = UserSerializer
 
+    async def post(self, request, *args, **kwargs) -> Response:
+        serializer = self.get_serializer(data=request.data)
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+        encoded_password = await hash_password(serializer.validated_data["password"])
+
+        def create() -> dict:
+            serializer.save(encoded_password=encoded_password)
+            return serializer.data
+
+        data = await sync_to_async(create)()
+        headers = self.get_success_headers(data)
+        return Response(data, status=status.HTTP_201_CREATED, headers=headers)
+
+
+class TokenObtainPairView(AsyncDispatchMixin, jwt_views.TokenObtainPairView):
+    """
+    Take user credentials and return an access and refresh token pair,
+    the password is checked on the password hashing pool
+    """
+
+    async def post(self, request, *args, **kwargs) -> Response:
+        # Reject malformed payloads with 400 before checking the credentials
+        fields = self.get_serializer()
+        attrs = fields.to_internal_value(request.data)
+        self.authenticated_user = await authenticate(
+            attrs[fields.username_field], attrs["password"]
+        )
+        serializer = self.get_serializer(data=request.data)
+        try:
+            await sync_to_async(serializer.is_valid)(raise_exception=True)
+        except TokenError as error:
+            raise InvalidToken(error.args[0])
+
+        return Response(serializer.validated_data, status=status.HTTP_200_OK)
+
+    def get_serializer_context(self) -> dict:
+        context = super().get_serializer_context()
+        if hasattr(self, "authenticated_user"):
+            context["authenticated_user"] = self.authenticated_user
+        return context
+
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """
@@ -21,34 +111,86 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
     """
 
     serializer_class = UserSerializer
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (TokenUserAuthentication,)
     permission_classes = (IsAuthenticated,)
 
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="fields",
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                description="Comma-separated fields to return, all by default.",
+            ),
+            OpenApiParameter(
+                name="expand",
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.QUERY,
+                description="Comma-separated optional fields to include: following, followers.",
+            ),
+        ]
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
     def get_object(self) -> Any:
-        return self.request.user
+        expand = query_param_set(self.request, "expand")
+        return (
+            get_user_model()
+            .objects.select_related("userprofile")
+            .prefetch_related(*follow_previews(expand))
+            .get(pk=self.request.user.id)
+        )
 
 
 class UserFollowersView(generics.ListAPIView):
     """
-    Retrieve the list of users that the authenticated user is following
+    Retrieve the users following the authenticated user, most recent first
     """
 
-    serializer_class = UserSerializer
-    authentication_classes = (JWTAuthentication,)
+    serializer_class = FollowerUserSerializer
+    authentication_classes = (TokenUserAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = KeysetPagination
+    keyset_ordering = ("-followed_at", "-id")
 
     def get_queryset(self) -> Any:
-        return self.request.user.following.prefetch_related("following", "followers")
+        return Follower.objects.filter(followee_id=self.request.user.id).select_related(
+            "user__userprofile"
+        )
 
 
 class UserFollowingView(generics.ListAPIView):
     """
-    Retrieve the list of users that are following the authenticated user
+    Retrieve the users the authenticated user is following, most recent first
     """
 
-    serializer_class = UserSerializer
-    authentication_classes = (JWTAuthentication,)
+    serializer_class = FollowingUserSerializer
+    authentication_classes = (TokenUserAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = KeysetPagination
+    keyset_ordering = ("-followed_at", "-id")
 
     def get_queryset(self) -> Any:
-        return self.request.user.followers.prefetch_related("following", "followers")
+        return Follower.objects.filter(user_id=self.request.user.id).select_related(
+            "followee__userprofile"
+        )
+
+
+class RevokeTokenView(generics.GenericAPIView):
+    """
+    Revoke the access token of the request and optionally a refresh token
+    """
+
+    serializer_class = TokenRevokeSerializer
+    authentication_classes = (TokenUserAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    @extend_schema(responses={200: None})
+    def post(self, request, *args, **kwargs) -> Response:
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        revoke(request.auth, request.user.id)
+        if "refresh" in serializer.validated_data:
+            revoke(serializer.validated_data["refresh"], request.user.id)
+        return Response({"detail": "Successfully revoked."}, status=status.HTTP_200_OK)